@@ -1,16 +1,27 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import HTTPAuthorizationCredentials
 
 from app.auth.schemas import LoginRequest, LoginResponse
-from app.auth.utils import create_token
+from app.auth.utils import AuthContext, create_token, parse_token, revoke_token, security
 from app.core.config import JWT_ALG, JWT_SECRET, JWT_TTL_SECONDS, USERS
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
 @router.post("/login", response_model=LoginResponse)
-def login(payload: LoginRequest):
+async def login(payload: LoginRequest):
     user = USERS.get(payload.username)
     if not user or user["password"] != payload.password:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     token = create_token(payload.username, user["role"], JWT_SECRET, JWT_ALG, JWT_TTL_SECONDS)
     return LoginResponse(token=token, role=user["role"])
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    _: AuthContext = Depends(parse_token),
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
+    await run_in_threadpool(revoke_token, credentials.credentials)
+    return None
@@ -1,10 +1,16 @@
+import hashlib
+import threading
 import time
-from typing import Set
+from collections import OrderedDict
+from typing import Callable, List, Set
 
 import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from pydantic import BaseModel
+
+from app.core.config import AUTH_TOKEN_CACHE_SIZE, AUTH_TOKEN_CACHE_TTL_SECONDS, JWT_ALG, JWT_SECRET
+from app.core.invalidation import notify_now, register_handler, register_resync
+from app.core.metrics import AUTH_CHECKS, AUTH_VERIFY_SECONDS
 
 ROLE_ADMIN = "admin"
 ROLE_DEVELOPER = "developer"
@@ -15,9 +21,96 @@ ALLOWED_ROLES: Set[str] = {ROLE_ADMIN, ROLE_DEVELOPER, ROLE_VIEWER}
 security = HTTPBearer()
 
 
-class AuthContext(BaseModel):
-    username: str
-    role: str
+class AuthContext:
+    __slots__ = ("username", "role")
+
+    def __init__(self, username: str, role: str):
+        self.username = username
+        self.role = role
+
+    def __repr__(self) -> str:
+        return f"AuthContext(username={self.username!r}, role={self.role!r})"
+
+
+class _TokenCache:
+    # Bounded LRU of verified tokens (context and claims) keyed by digest; entries never outlive the token's `exp`.
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[bytes, tuple[AuthContext, dict, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: bytes, now: float) -> tuple[AuthContext, dict] | None:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            if entry[2] <= now:
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return entry[0], entry[1]
+
+    def put(self, digest: bytes, ctx: AuthContext, claims: dict, expires_at: float) -> None:
+        with self._lock:
+            self._entries[digest] = (ctx, claims, expires_at)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, digest: bytes) -> None:
+        with self._lock:
+            self._entries.pop(digest, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_token_cache = _TokenCache(AUTH_TOKEN_CACHE_SIZE, AUTH_TOKEN_CACHE_TTL_SECONDS)
+_revoked: dict[bytes, float] = {}
+_revoked_lock = threading.Lock()
+_revocation_checks: List[Callable[[dict], bool]] = []
+
+
+def token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+def register_revocation_check(check: Callable[[dict], bool]) -> None:
+    """Register a predicate on verified claims; returning True rejects the token.
+
+    Checks run on every request, cache hits included, so a check whose answer changes (a user logged out
+    everywhere, a disabled account) takes effect at once. Keep them to in-memory lookups.
+    """
+    _revocation_checks.append(check)
+
+
+def revoke_digest(digest: bytes, expires_at: float) -> None:
+    now = time.time()
+    with _revoked_lock:
+        _revoked[digest] = expires_at
+        for stale in [key for key, exp in _revoked.items() if exp <= now]:
+            del _revoked[stale]
+    _token_cache.discard(digest)
+
+
+def revoke_token(token: str) -> bytes:
+    """Revoke in this process and tell the other workers (blocking: one NOTIFY on Postgres)."""
+    try:
+        exp = jwt.decode(token, options={"verify_signature": False}).get("exp")
+    except jwt.PyJWTError:
+        exp = None
+    digest = token_digest(token)
+    expires_at = float(exp) if exp else time.time() + AUTH_TOKEN_CACHE_TTL_SECONDS
+    revoke_digest(digest, expires_at)
+    notify_now("revoke", digest.hex(), expires_at)
+    return digest
+
+
+register_handler("revoke", lambda digest, expires_at: revoke_digest(bytes.fromhex(digest), expires_at))
+# Revocations missed while disconnected are gone; at least make every token be checked again.
+register_resync(_token_cache.clear)
 
 
 def create_token(username: str, role: str, secret: str, alg: str, ttl_seconds: int) -> str:
@@ -31,25 +124,59 @@ def create_token(username: str, role: str, secret: str, alg: str, ttl_seconds: i
     return jwt.encode(payload, secret, algorithm=alg)
 
 
-def parse_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> AuthContext:
+async def parse_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> AuthContext:
     token = credentials.credentials
-    try:
-        from app.core.config import JWT_ALG, JWT_SECRET
+    digest = token_digest(token)
+    now = time.time()
+    cached = _token_cache.get(digest, now)
+    if cached is not None:
+        ctx, claims = cached
+        if _revocation_checks and any(check(claims) for check in _revocation_checks):
+            _token_cache.discard(digest)
+            AUTH_CHECKS.inc("rejected")
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked")
+        AUTH_CHECKS.inc("cache_hit")
+        return ctx
+    if digest in _revoked:
+        AUTH_CHECKS.inc("rejected")
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked")
 
+    started = time.perf_counter()
+    try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
     except jwt.PyJWTError:
+        AUTH_CHECKS.inc("rejected")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    finally:
+        AUTH_VERIFY_SECONDS.observe(time.perf_counter() - started)
 
     role = payload.get("role")
     if role not in ALLOWED_ROLES:
+        AUTH_CHECKS.inc("rejected")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid role")
-
-    return AuthContext(username=payload.get("sub", ""), role=role)
+    if any(check(payload) for check in _revocation_checks):
+        AUTH_CHECKS.inc("rejected")
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked")
+
+    ctx = AuthContext(payload.get("sub", ""), role)
+    expires_at = now + AUTH_TOKEN_CACHE_TTL_SECONDS
+    if payload.get("exp"):
+        expires_at = min(expires_at, float(payload["exp"]))
+    _token_cache.put(digest, ctx, payload, expires_at)
+    # A revocation may have raced the decode above; never leave a revoked token cached.
+    if digest in _revoked:
+        _token_cache.discard(digest)
+        AUTH_CHECKS.inc("rejected")
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked")
+    AUTH_CHECKS.inc("verified")
+    return ctx
 
 
 def require_roles(*roles: str):
-    def _check(ctx: AuthContext = Depends(parse_token)) -> AuthContext:
-        if ctx.role not in roles:
+    allowed = frozenset(roles)
+
+    async def _check(ctx: AuthContext = Depends(parse_token)) -> AuthContext:
+        if ctx.role not in allowed:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
         return ctx
 
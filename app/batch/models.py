@@ -0,0 +1,14 @@
+from sqlalchemy import Column, DateTime, Integer, String, func
+
+from app.db import Base
+
+
+class BatchModel(Base):
+    __tablename__ = "action_batches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    action = Column(String, nullable=False)
+    environment = Column(String, nullable=True)
+    requested_by = Column(String, nullable=False, default="")
+    total = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
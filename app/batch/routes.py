@@ -0,0 +1,211 @@
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.auth.utils import ROLE_ADMIN, ROLE_DEVELOPER, ROLE_VIEWER, AuthContext, require_roles
+from app.batch.models import BatchModel
+from app.batch.schemas import (
+    BatchActionRequest,
+    BatchActionResponse,
+    BatchItemStatus,
+    BatchSkippedService,
+    BatchStatusResponse,
+)
+from app.core.config import BATCH_MAX_SERVICES, DEPLOY_WORKFLOWS_ENABLED, PROVISION_WORKFLOWS_ENABLED
+from app.core.deps import get_db, run_db
+from app.deploy.models import DeploymentModel
+from app.deploy.service import deployment_event, enabled_environment, queue_deployment, running_deployments
+from app.events.hub import notify_service_events, publish_service_event
+from app.idempotency.service import IdempotencyKey, idempotency_key
+from app.overview.service import latest_deployment_statuses
+from app.provisioning.models import ProvisionRequestModel
+from app.provisioning.service import (
+    action_title,
+    queue_request,
+    running_requests,
+    status_event,
+    tenant_started_detail,
+)
+from app.provisioning.tenants import set_tenant_statuses, tenant_registry
+from app.services.models import ServiceModel
+from app.workflows.admission import admit
+from app.workflows.outbox import dispatcher, enqueue_workflow
+
+router = APIRouter(prefix="/batches", tags=["batches"])
+
+_PENDING_STATUSES = ("queued", "in_progress")
+
+
+def _select_services(db: Session, payload: BatchActionRequest) -> list[ServiceModel]:
+    if not (payload.service_ids or payload.tenant or payload.owner_team):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Provide service_ids or a tenant/owner_team selector"
+        )
+    query = db.query(ServiceModel)
+    if payload.service_ids:
+        query = query.filter(ServiceModel.id.in_(set(payload.service_ids)))
+    if payload.tenant:
+        query = query.filter(ServiceModel.tenant == payload.tenant)
+    if payload.owner_team:
+        query = query.filter(ServiceModel.owner_team == payload.owner_team)
+    # Locked in id order, like single actions lock their service, so runs already in flight are seen reliably.
+    services = query.order_by(ServiceModel.id.asc()).limit(BATCH_MAX_SERVICES + 1).with_for_update().all()
+    if len(services) > BATCH_MAX_SERVICES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Batch selects more than {BATCH_MAX_SERVICES} services",
+        )
+    return services
+
+
+def _running_reason(action: str, running) -> str:
+    kind = "Deployment" if action == "deploy" else action_title(running.action)
+    return f"{kind} {running.id} is already {running.status.replace('_', ' ')}"
+
+
+def _create_batch(
+    db: Session, payload: BatchActionRequest, ctx: AuthContext, idempotency: IdempotencyKey | None = None
+) -> BatchActionResponse | Response:
+    if idempotency is not None:
+        replay = idempotency.claim(db)
+        if replay is not None:
+            return replay
+    services = _select_services(db, payload)
+    found = {service.id for service in services}
+    skipped = [
+        BatchSkippedService(service_id=service_id, reason="Service not found")
+        for service_id in dict.fromkeys(payload.service_ids or [])
+        if service_id not in found
+    ]
+    if not services:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No services matched the batch selector")
+
+    batch = BatchModel(action=payload.action, environment=payload.environment, requested_by=ctx.username)
+    db.add(batch)
+    db.flush()
+
+    if payload.action == "deploy":
+        kind, configured = "deploy", DEPLOY_WORKFLOWS_ENABLED
+        targets = []
+        for service in services:
+            env = enabled_environment(service, payload.environment)
+            if env is None:
+                skipped.append(
+                    BatchSkippedService(
+                        service_id=service.id,
+                        reason=f"Environment '{payload.environment}' is not enabled for this service",
+                    )
+                )
+                continue
+            targets.append((service, env))
+        running = running_deployments(db, {(service.id, env) for service, env in targets})
+        skipped.extend(
+            BatchSkippedService(service_id=service.id, reason=_running_reason("deploy", running[(service.id, env)]))
+            for service, env in targets
+            if (service.id, env) in running
+        )
+        targets = [(service, env) for service, env in targets if (service.id, env) not in running]
+        # A token per deployment from its tenant's bucket and from the user's; the whole batch or nothing.
+        admit(db, ctx, [service for service, _ in targets])
+        previous = latest_deployment_statuses(db, {(service.id, env) for service, env in targets})
+        rows = [
+            queue_deployment(db, service, env, previous.get((service.id, env), (None, None))[1], batch_id=batch.id)
+            for service, env in targets
+        ]
+    else:
+        kind, configured = "provision", PROVISION_WORKFLOWS_ENABLED
+        running = running_requests(db, [service.id for service in services])
+        skipped.extend(
+            BatchSkippedService(service_id=service.id, reason=_running_reason(payload.action, running[service.id]))
+            for service in services
+            if service.id in running
+        )
+        services = [service for service in services if service.id not in running]
+        admit(db, ctx, services)
+        tenants = tenant_registry.ensure_many(db, {service.tenant for service in services})
+        rows = [queue_request(db, service, payload.action, batch_id=batch.id) for service in services]
+        detail = tenant_started_detail(payload.action)
+        set_tenant_statuses(db, ((tenant.id, "in_progress", detail) for tenant in tenants.values()))
+
+    batch.total = len(rows)
+    db.flush()
+    if configured:
+        # Executions start from the outbox once this commits, capped by the dispatcher's concurrency.
+        for row in rows:
+            enqueue_workflow(db, kind, row.id)
+    if kind == "deploy":
+        events = [deployment_event(db, row) for row in rows]
+    else:
+        events = [status_event(service) for service in services]
+    response = BatchActionResponse(
+        batch_id=batch.id,
+        action=payload.action,
+        environment=payload.environment,
+        status="queued",
+        queued=len(rows),
+        skipped=skipped,
+    )
+    notify_service_events(db, events)
+    if idempotency is not None:
+        idempotency.record(db, status.HTTP_202_ACCEPTED, response)
+    db.commit()
+    for event in events:
+        publish_service_event(*event)
+    return response
+
+
+@router.post("", response_model=BatchActionResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_batch(
+    payload: BatchActionRequest,
+    ctx: AuthContext = Depends(require_roles(ROLE_ADMIN, ROLE_DEVELOPER)),
+    idempotency: IdempotencyKey | None = Depends(idempotency_key),
+    db: Session = Depends(get_db),
+):
+    response = await run_db(db, _create_batch, payload, ctx, idempotency)
+    dispatcher.wake()
+    return response
+
+
+def _batch_status(db: Session, batch_id: int, include_items: bool) -> BatchStatusResponse:
+    batch = db.get(BatchModel, batch_id)
+    if not batch:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Batch not found")
+    model = DeploymentModel if batch.action == "deploy" else ProvisionRequestModel
+    counts = dict(
+        db.query(model.status, func.count(model.id)).filter(model.batch_id == batch_id).group_by(model.status).all()
+    )
+    pending = sum(counts.get(name, 0) for name in _PENDING_STATUSES)
+    items = None
+    if include_items:
+        items = [
+            BatchItemStatus(
+                id=row.id,
+                service_id=row.service_id,
+                status=row.status,
+                detail=row.detail,
+                execution_arn=row.execution_arn,
+            )
+            for row in db.query(model).filter(model.batch_id == batch_id).order_by(model.id.asc())
+        ]
+    return BatchStatusResponse(
+        batch_id=batch.id,
+        action=batch.action,
+        environment=batch.environment,
+        requested_by=batch.requested_by,
+        created_at=batch.created_at,
+        total=batch.total,
+        completed=batch.total - pending,
+        done=pending == 0,
+        counts=counts,
+        items=items,
+    )
+
+
+@router.get("/{batch_id}", response_model=BatchStatusResponse)
+async def batch_status(
+    batch_id: int,
+    items: bool = False,
+    _: str = Depends(require_roles(ROLE_ADMIN, ROLE_DEVELOPER, ROLE_VIEWER)),
+    db: Session = Depends(get_db),
+):
+    return await run_db(db, _batch_status, batch_id, items)
@@ -0,0 +1,47 @@
+from datetime import datetime
+from typing import Dict, List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+
+class BatchActionRequest(BaseModel):
+    action: Literal["provision", "deprovision", "deploy"]
+    service_ids: Optional[List[int]] = None
+    tenant: Optional[str] = None
+    owner_team: Optional[str] = None
+    environment: Optional[str] = Field(None, description="Deploy only; defaults to each service's first environment")
+
+
+class BatchSkippedService(BaseModel):
+    service_id: int
+    reason: str
+
+
+class BatchActionResponse(BaseModel):
+    batch_id: int
+    action: str
+    environment: Optional[str] = None
+    status: str
+    queued: int
+    skipped: List[BatchSkippedService] = Field(default_factory=list)
+
+
+class BatchItemStatus(BaseModel):
+    id: int
+    service_id: int
+    status: str
+    detail: str
+    execution_arn: Optional[str] = None
+
+
+class BatchStatusResponse(BaseModel):
+    batch_id: int
+    action: str
+    environment: Optional[str] = None
+    requested_by: str
+    created_at: Optional[datetime] = None
+    total: int
+    completed: int
+    done: bool
+    counts: Dict[str, int]
+    items: Optional[List[BatchItemStatus]] = None
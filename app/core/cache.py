@@ -0,0 +1,216 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Iterable
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core.config import (
+    DB_READ_STICKY_SECONDS,
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_TTL_SECONDS,
+)
+from app.core.invalidation import notify, register_handler, register_resync
+
+SERVICES_TAG = "services"
+OVERVIEW_TAG = "overview"
+
+
+def service_tag(service_id: int) -> str:
+    return f"service:{service_id}"
+
+
+def deploy_tag(service_id: int) -> str:
+    return f"deploy:{service_id}"
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "headers", "tags", "expires_at")
+
+    def __init__(self, body: bytes, headers: dict, tags: tuple[str, ...], expires_at: float):
+        self.body = body
+        self.etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        self.headers = headers
+        self.tags = tags
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    # Serialized GET bodies keyed by path + query, indexed by tag so writers can drop exactly what they touched.
+    # Other workers' writes arrive as "tags" invalidations; the TTL bounds staleness if one is ever missed.
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._by_tag: dict[str, set[str]] = {}
+        # When each tag was last invalidated, for invalidated_since; pruned as it grows.
+        self._invalidated_at: dict[str, float] = {}
+        self._cleared_at = float("-inf")
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._not_modified = 0
+        self._invalidations = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: str) -> CachedResponse | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def put(self, key: str, entry: CachedResponse, generation: int) -> None:
+        with self._lock:
+            # An invalidation ran while the body was being built from the database; it may predate that write.
+            if generation != self._generation:
+                return
+            self._drop(key)
+            self._entries[key] = entry
+            for tag in entry.tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, *tags: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._generation += 1
+            self._invalidations += 1
+            for tag in tags:
+                self._invalidated_at[tag] = now
+                for key in list(self._by_tag.get(tag, ())):
+                    self._drop(key)
+            if len(self._invalidated_at) > self.max_entries:
+                cutoff = now - self.ttl_seconds
+                self._invalidated_at = {tag: at for tag, at in self._invalidated_at.items() if at > cutoff}
+
+    def invalidated_since(self, tags: Iterable[str], seconds: float) -> bool:
+        """Whether any of `tags` was invalidated, or the cache cleared, in the last `seconds` (up to the TTL)."""
+        cutoff = time.monotonic() - seconds
+        with self._lock:
+            return self._cleared_at > cutoff or any(self._invalidated_at.get(tag, cutoff) > cutoff for tag in tags)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._cleared_at = time.monotonic()
+            self._entries.clear()
+            self._by_tag.clear()
+
+    def record_not_modified(self) -> None:
+        with self._lock:
+            self._not_modified += 1
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": RESPONSE_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "not_modified": self._not_modified,
+                "invalidations": self._invalidations,
+            }
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS)
+register_handler("tags", response_cache.invalidate)
+register_resync(response_cache.clear)
+
+
+def _service_tags(service_id: int, listings: bool) -> list[str]:
+    tags = [service_tag(service_id), deploy_tag(service_id)]
+    if listings:
+        tags.append(SERVICES_TAG)
+    return tags
+
+
+def invalidate_service(service_id: int, listings: bool = True) -> None:
+    response_cache.invalidate(*_service_tags(service_id, listings))
+
+
+def notify_tags(db, *tags: str) -> None:
+    """Have the other workers drop `tags` once `db` commits; callers still invalidate their own cache."""
+    # A few hundred per message keeps each one well inside a NOTIFY payload.
+    for start in range(0, len(tags), 200):
+        notify(db, "tags", *tags[start : start + 200])
+
+
+def notify_service(db, service_id: int, listings: bool = True) -> None:
+    notify_tags(db, *_service_tags(service_id, listings))
+
+
+def _cache_key(request: Request) -> str:
+    query = "&".join(sorted(request.url.query.split("&"))) if request.url.query else ""
+    return f"{request.url.path}?{query}"
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {value.strip().removeprefix("W/") for value in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+async def cached_json(
+    request: Request,
+    tags: Iterable[str],
+    build: Callable[[], Awaitable[tuple[Any, dict]]],
+) -> Response:
+    """Serve a JSON GET from the response cache, building and storing it on a miss.
+
+    `build` returns the response content and any extra headers; content that is already encoded (bytes, see
+    app.core.serialization.dumps) is used as the body as is. Clients that send a matching `If-None-Match` get a
+    304 without a body.
+    """
+    entry = None
+    key = _cache_key(request)
+    if RESPONSE_CACHE_ENABLED:
+        entry = response_cache.get(key)
+    if entry is None:
+        generation = response_cache.generation
+        content, headers = await build()
+        body = content if isinstance(content, bytes) else JSONResponse(content=jsonable_encoder(content)).body
+        entry = CachedResponse(body, headers, tuple(tags), time.monotonic() + RESPONSE_CACHE_TTL_SECONDS)
+        # A replica that has not replayed a recent write yet would pin its old state in the cache until the TTL.
+        replica_may_lag = getattr(request.state, "read_replica", False) and response_cache.invalidated_since(
+            entry.tags, DB_READ_STICKY_SECONDS
+        )
+        if RESPONSE_CACHE_ENABLED and not replica_may_lag:
+            response_cache.put(key, entry, generation)
+
+    headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request, entry.etag):
+        response_cache.record_not_modified()
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
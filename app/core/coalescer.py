@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import threading
+from typing import Callable, Hashable
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.metrics import gauge_callback
+
+logger = logging.getLogger(__name__)
+
+_coalescers: list["WriteBehindCoalescer"] = []
+
+
+class WriteBehindCoalescer:
+    """Buffers keyed updates and applies only the latest one per key every `window` seconds.
+
+    Updates held in the buffer are lost if the process dies before the next flush, so this
+    is only meant for state that is re-sent or reconciled anyway (workflow status callbacks).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        apply: Callable[[list], None],
+        window: float,
+        merge: Callable[[object, object], object] | None = None,
+    ):
+        self.name = name
+        self.window = window
+        self._apply = apply
+        self._merge = merge
+        self._pending: dict[Hashable, object] = {}
+        self._lock = threading.Lock()
+        self._task: asyncio.Task | None = None
+        self._received = 0
+        self._coalesced = 0
+        self._flushed = 0
+        self._requeued = 0
+        _coalescers.append(self)
+
+    @property
+    def active(self) -> bool:
+        return self._task is not None
+
+    def submit(self, key: Hashable, item) -> None:
+        with self._lock:
+            self._received += 1
+            previous = self._pending.pop(key, None)
+            if previous is not None:
+                self._coalesced += 1
+                if self._merge is not None:
+                    item = self._merge(previous, item)
+            self._pending[key] = item
+
+    async def flush(self) -> int:
+        """Apply the buffered updates. If that fails they go back in the buffer for the next flush."""
+        with self._lock:
+            batch = self._pending
+            self._pending = {}
+        if not batch:
+            return 0
+        try:
+            await run_in_threadpool(self._apply, list(batch.values()))
+        except Exception:
+            logger.exception("Flushing %s failed; keeping %d updates for the next flush", self.name, len(batch))
+            self._requeue(batch)
+            return 0
+        with self._lock:
+            self._flushed += len(batch)
+        return len(batch)
+
+    def _requeue(self, batch: dict) -> None:
+        # Updates submitted while the batch was being applied are newer, so they merge on top of it.
+        with self._lock:
+            self._requeued += len(batch)
+            for key, item in self._pending.items():
+                previous = batch.pop(key, None)
+                if previous is not None and self._merge is not None:
+                    item = self._merge(previous, item)
+                batch[key] = item
+            self._pending = batch
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.window)
+            await self.flush()
+
+    def start(self) -> None:
+        if self.window <= 0 or self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "window_seconds": self.window,
+                "pending": len(self._pending),
+                "received": self._received,
+                "coalesced": self._coalesced,
+                "flushed": self._flushed,
+                "requeued": self._requeued,
+            }
+
+
+gauge_callback(
+    "idp_coalescer_pending",
+    "Updates buffered for the next write-behind flush",
+    ("coalescer",),
+    lambda: [((coalescer.name,), coalescer.stats()["pending"]) for coalescer in _coalescers],
+)
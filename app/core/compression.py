@@ -0,0 +1,142 @@
+import gzip
+import threading
+from collections import OrderedDict
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.core.config import (
+    COMPRESSION_BROTLI_QUALITY,
+    COMPRESSION_CACHE_ENTRIES,
+    COMPRESSION_GZIP_LEVEL,
+    COMPRESSION_MIN_BYTES,
+)
+
+try:
+    import brotli
+except ImportError:  # optional; without it only gzip is offered
+    brotli = None
+
+# In order of preference when the client accepts several equally.
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+_COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+}
+
+
+def negotiate(accept_encoding: str, available=ENCODINGS) -> str | None:
+    """The preferred encoding among `available` that the Accept-Encoding header allows, or None for identity."""
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name.strip().lower()] = weight
+    candidates = [encoding for encoding in available if encoding in weights or "*" in weights]
+    if not candidates:
+        return None
+    best = max(candidates, key=lambda encoding: weights.get(encoding, weights.get("*", 0.0)))
+    return best if weights.get(best, weights.get("*", 0.0)) > 0 else None
+
+
+def compress(body: bytes, encoding: str, best: bool = False) -> bytes:
+    """`best` spends more CPU for a smaller result, for content compressed once and served many times."""
+    if encoding == "br":
+        return brotli.compress(body, quality=11 if best else COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=9 if best else COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def _compressible(media_type: str) -> bool:
+    media_type = media_type.split(";", 1)[0].strip().lower()
+    return media_type.startswith("text/") or media_type in _COMPRESSIBLE_TYPES
+
+
+class CompressionMiddleware:
+    """Compresses whole response bodies of at least `minimum_size` bytes with the client's preferred encoding.
+
+    Streamed responses (SSE, the NDJSON export) and responses that already carry a Content-Encoding, such as the
+    precompressed frontend, pass through untouched. Bodies with a strong ETag (the response cache's) are
+    compressed once per ETag and encoding; the ETag sent with them is made weak, as the bytes differ.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES, cache_entries: int = COMPRESSION_CACHE_ENTRIES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache_entries = cache_entries
+        self._cache: OrderedDict[tuple[str, str], bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+            pending, start = start, None
+            headers = MutableHeaders(scope=pending)
+            body = message.get("body", b"")
+            if (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or pending["status"] < 200
+                or pending["status"] in (204, 304)
+                or "content-encoding" in headers
+                or not _compressible(headers.get("content-type", ""))
+            ):
+                await send(pending)
+                await send(message)
+                return
+            etag = headers.get("etag")
+            compressed = self._compress(body, encoding, etag)
+            if len(compressed) >= len(body):
+                await send(pending)
+                await send(message)
+                return
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            await send(pending)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _compress(self, body: bytes, encoding: str, etag: str | None) -> bytes:
+        if not etag or etag.startswith("W/") or self.cache_entries <= 0:
+            return compress(body, encoding)
+        key = (etag, encoding)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+        compressed = compress(body, encoding)
+        with self._lock:
+            self._cache[key] = compressed
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return compressed
@@ -1,12 +1,40 @@
 import os
 
+
+def _rate_table(value: str) -> dict[str, tuple[float, float]]:
+    # "key=per_minute/burst,..." -> {key: (tokens per second, burst)}; "*" is the fallback key.
+    table = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        key, _, rate = item.partition("=")
+        per_minute, _, burst = rate.partition("/")
+        table[key.strip()] = (float(per_minute) / 60, float(burst or per_minute))
+    return table
+
+
 APP_NAME = "IDP Portal / API Gateway"
 JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret")
 JWT_ALG = "HS256"
 JWT_TTL_SECONDS = 8 * 60 * 60
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+AUTH_TOKEN_CACHE_TTL_SECONDS = float(os.getenv("AUTH_TOKEN_CACHE_TTL_SECONDS", "300"))
 
 STEP_FUNCTION_ARN = os.getenv("STEP_FUNCTION_ARN")
 DEPLOY_STEP_FUNCTION_ARN = os.getenv("DEPLOY_STEP_FUNCTION_ARN", STEP_FUNCTION_ARN)
+# "stepfunctions" starts workflows on the state machines above; "local" runs them in this process instead
+# (app.workflows.local), for dev, CI and installs without AWS. Without a backend, actions stay queued.
+WORKFLOW_BACKEND = os.getenv("WORKFLOW_BACKEND", "stepfunctions")
+PROVISION_WORKFLOWS_ENABLED = WORKFLOW_BACKEND == "local" or bool(STEP_FUNCTION_ARN)
+DEPLOY_WORKFLOWS_ENABLED = WORKFLOW_BACKEND == "local" or bool(DEPLOY_STEP_FUNCTION_ARN)
+# Local backend: "stub" completes runs after WORKFLOW_LOCAL_STUB_SECONDS; "script" runs the provisioner/deployer
+# scripts, which call back to WORKFLOW_LOCAL_API_URL. Runs of one tenant execute one at a time.
+WORKFLOW_LOCAL_RUNNER = os.getenv("WORKFLOW_LOCAL_RUNNER", "stub")
+WORKFLOW_LOCAL_CONCURRENCY = int(os.getenv("WORKFLOW_LOCAL_CONCURRENCY", "4"))
+WORKFLOW_LOCAL_MAX_QUEUED = int(os.getenv("WORKFLOW_LOCAL_MAX_QUEUED", "1000"))
+WORKFLOW_LOCAL_TIMEOUT_SECONDS = float(os.getenv("WORKFLOW_LOCAL_TIMEOUT_SECONDS", "1800"))
+WORKFLOW_LOCAL_STUB_SECONDS = float(os.getenv("WORKFLOW_LOCAL_STUB_SECONDS", "2"))
+WORKFLOW_LOCAL_PROVISION_SCRIPT = os.getenv("WORKFLOW_LOCAL_PROVISION_SCRIPT", "infra/provisioner/provision.sh")
+WORKFLOW_LOCAL_DEPLOY_SCRIPT = os.getenv("WORKFLOW_LOCAL_DEPLOY_SCRIPT", "infra/deployer/deploy.sh")
+WORKFLOW_LOCAL_API_URL = os.getenv("WORKFLOW_LOCAL_API_URL", "http://127.0.0.1:8000")
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 DEFAULT_BUCKET_PREFIX = os.getenv("TENANT_BUCKET_PREFIX", "idp-tenant")
 CALLBACK_TOKEN = os.getenv("PROVISIONING_CALLBACK_TOKEN", "dev-callback-token")
@@ -15,6 +43,95 @@ OBSERVABILITY_GRAFANA_URL = os.getenv("OBSERVABILITY_GRAFANA_URL", "")
 OBSERVABILITY_GRAFANA_DASHBOARD_UID = os.getenv("OBSERVABILITY_GRAFANA_DASHBOARD_UID", "idp-service-observability")
 OBSERVABILITY_GRAFANA_ORG_ID = os.getenv("OBSERVABILITY_GRAFANA_ORG_ID", "1")
 
+SERVICES_PAGE_SIZE_DEFAULT = int(os.getenv("SERVICES_PAGE_SIZE_DEFAULT", "100"))
+SERVICES_PAGE_SIZE_MAX = int(os.getenv("SERVICES_PAGE_SIZE_MAX", "1000"))
+SERVICES_BULK_CHUNK_SIZE = int(os.getenv("SERVICES_BULK_CHUNK_SIZE", "500"))
+SERVICES_BULK_MAX_ERRORS = int(os.getenv("SERVICES_BULK_MAX_ERRORS", "1000"))
+SERVICES_EXPORT_BATCH_SIZE = int(os.getenv("SERVICES_EXPORT_BATCH_SIZE", "1000"))
+SERVICES_SEARCH_PAGE_SIZE_DEFAULT = int(os.getenv("SERVICES_SEARCH_PAGE_SIZE_DEFAULT", "20"))
+# Deepest rank reachable by paging; ranked results have no stable keyset, so pages are offsets.
+SERVICES_SEARCH_MAX_RESULTS = int(os.getenv("SERVICES_SEARCH_MAX_RESULTS", "1000"))
+# Minimum pg_trgm word similarity for a fuzzy (non-substring) match.
+SERVICES_SEARCH_SIMILARITY = float(os.getenv("SERVICES_SEARCH_SIMILARITY", "0.5"))
+# How long the in-process search index (non-Postgres databases) trusts itself before reloading.
+SERVICES_SEARCH_INDEX_TTL_SECONDS = float(os.getenv("SERVICES_SEARCH_INDEX_TTL_SECONDS", "60"))
+HISTORY_PAGE_SIZE_DEFAULT = int(os.getenv("HISTORY_PAGE_SIZE_DEFAULT", "50"))
+HISTORY_PAGE_SIZE_MAX = int(os.getenv("HISTORY_PAGE_SIZE_MAX", "500"))
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in {"1", "true", "yes"}
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+# With DB_READ_URL: how long a client reads from the primary after its own write, and how long after an
+# invalidation replica reads stay out of the response cache. Should exceed the replica's usual lag.
+DB_READ_STICKY_SECONDS = float(os.getenv("DB_READ_STICKY_SECONDS", "5"))
+
+# gzip/brotli for API responses at least this large; brotli needs the optional `Brotli` package.
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() in {"1", "true", "yes"}
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+# Compressed bodies kept per (ETag, encoding), so cached GETs are not compressed again on every hit.
+COMPRESSION_CACHE_ENTRIES = int(os.getenv("COMPRESSION_CACHE_ENTRIES", "256"))
+# Frontend files with a content hash in their name (app.3f2a9c1b.js) are cached by browsers for this long;
+# the rest are revalidated against their ETag on every load.
+STATIC_MAX_AGE_SECONDS = int(os.getenv("STATIC_MAX_AGE_SECONDS", "86400"))
+
+WORKFLOW_CONNECT_TIMEOUT_SECONDS = float(os.getenv("WORKFLOW_CONNECT_TIMEOUT_SECONDS", "2"))
+WORKFLOW_READ_TIMEOUT_SECONDS = float(os.getenv("WORKFLOW_READ_TIMEOUT_SECONDS", "5"))
+WORKFLOW_MAX_ATTEMPTS = int(os.getenv("WORKFLOW_MAX_ATTEMPTS", "3"))
+WORKFLOW_MAX_POOL_CONNECTIONS = int(os.getenv("WORKFLOW_MAX_POOL_CONNECTIONS", "20"))
+WORKFLOW_BREAKER_FAILURE_THRESHOLD = int(os.getenv("WORKFLOW_BREAKER_FAILURE_THRESHOLD", "5"))
+WORKFLOW_BREAKER_RESET_SECONDS = float(os.getenv("WORKFLOW_BREAKER_RESET_SECONDS", "30"))
+
+OUTBOX_DISPATCHER_ENABLED = os.getenv("OUTBOX_DISPATCHER_ENABLED", "true").lower() in {"1", "true", "yes"}
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "2"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "10"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "60"))
+OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "2"))
+
+BATCH_MAX_SERVICES = int(os.getenv("BATCH_MAX_SERVICES", "1000"))
+CALLBACK_BATCH_MAX = int(os.getenv("CALLBACK_BATCH_MAX", "1000"))
+CALLBACK_COALESCE_SECONDS = float(os.getenv("CALLBACK_COALESCE_SECONDS", "0"))
+# A deploy/provision that finds the same run queued or in progress joins it, unless that run is older than this
+# (a run stuck without callbacks must not block new ones forever); 0 disables joining.
+ACTION_COALESCE_SECONDS = float(os.getenv("ACTION_COALESCE_SECONDS", "3600"))
+# Token buckets in front of actions that start workflows: one per user (rates by role) and one per tenant (rates by
+# the tier of the service acted on). "memory" keeps them per worker; "postgres" shares them through the database.
+ACTION_RATE_LIMIT_ENABLED = os.getenv("ACTION_RATE_LIMIT_ENABLED", "true").lower() in {"1", "true", "yes"}
+ACTION_RATE_LIMIT_BACKEND = os.getenv("ACTION_RATE_LIMIT_BACKEND", "memory")
+ACTION_RATE_LIMIT_USER = _rate_table(os.getenv("ACTION_RATE_LIMIT_USER", "admin=120/30,*=30/10"))
+ACTION_RATE_LIMIT_TENANT = _rate_table(os.getenv("ACTION_RATE_LIMIT_TENANT", "gold=120/30,silver=60/20,*=30/10"))
+# Queued plus running workflows across all tenants; new runs are refused above it. 0 disables the cap.
+WORKFLOW_MAX_IN_FLIGHT = int(os.getenv("WORKFLOW_MAX_IN_FLIGHT", "0"))
+WORKFLOW_IN_FLIGHT_RETRY_AFTER_SECONDS = int(os.getenv("WORKFLOW_IN_FLIGHT_RETRY_AFTER_SECONDS", "10"))
+IDEMPOTENCY_KEY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_PURGE_SECONDS = float(os.getenv("IDEMPOTENCY_PURGE_SECONDS", "3600"))
+
+RECONCILER_ENABLED = os.getenv("RECONCILER_ENABLED", "true").lower() in {"1", "true", "yes"}
+RECONCILER_INTERVAL_SECONDS = float(os.getenv("RECONCILER_INTERVAL_SECONDS", "10"))
+RECONCILER_BATCH_SIZE = int(os.getenv("RECONCILER_BATCH_SIZE", "100"))
+RECONCILER_CONCURRENCY = int(os.getenv("RECONCILER_CONCURRENCY", "8"))
+RECONCILER_MAX_BACKOFF_SECONDS = float(os.getenv("RECONCILER_MAX_BACKOFF_SECONDS", "300"))
+
+# Full rebuild of the incrementally maintained overview counters; 0 disables it.
+OVERVIEW_RESYNC_SECONDS = float(os.getenv("OVERVIEW_RESYNC_SECONDS", "900"))
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in {"1", "true", "yes"}
+# Standard OTel variables; OTLP export (metrics and trace spans) is on when an endpoint is set.
+OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "")
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "idp-portal")
+
+# Cross-worker cache invalidation over Postgres LISTEN/NOTIFY; a no-op on other databases.
+INVALIDATION_ENABLED = os.getenv("INVALIDATION_ENABLED", "true").lower() in {"1", "true", "yes"}
+INVALIDATION_CHANNEL = os.getenv("INVALIDATION_CHANNEL", "idp_invalidation")
+INVALIDATION_KEEPALIVE_SECONDS = float(os.getenv("INVALIDATION_KEEPALIVE_SECONDS", "30"))
+INVALIDATION_RECONNECT_MAX_SECONDS = float(os.getenv("INVALIDATION_RECONNECT_MAX_SECONDS", "30"))
+
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))
+
 USERS = {
     "admin": {"password": "admin", "role": "admin"},
     "dev": {"password": "dev", "role": "developer"},
@@ -1,9 +1,88 @@
-from app.db import SessionLocal
+import math
 
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.datastructures import MutableHeaders
 
-def get_db():
+from app.core.config import DB_READ_STICKY_SECONDS
+from app.db import DB_ASYNC, AsyncReadSessionLocal, AsyncSessionLocal, ReadSessionLocal, SessionLocal
+
+# Set after a client's own write; while present its reads go to the primary.
+READ_PRIMARY_COOKIE = "idp_read_primary"
+
+
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+get_db = get_async_db if DB_ASYNC else get_sync_db
+
+
+def _read_from_replica(request: Request) -> bool:
+    if READ_PRIMARY_COOKIE in request.cookies:
+        return False
+    request.state.read_replica = True
+    return True
+
+
+def get_sync_read_db(request: Request):
+    if ReadSessionLocal is None or not _read_from_replica(request):
+        yield from get_sync_db()
+        return
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request):
+    factory = AsyncSessionLocal
+    if AsyncReadSessionLocal is not None and _read_from_replica(request):
+        factory = AsyncReadSessionLocal
+    async with factory() as db:
+        yield db
+
+
+# For read-only routes: the replica when DB_READ_URL is set, otherwise (or right after the client's own write)
+# the same session as get_db. Never write through it.
+get_read_db = get_async_read_db if DB_ASYNC else get_sync_read_db
+
+
+async def run_db(db, fn, *args, **kwargs):
+    # Route logic is written against a sync Session: in async mode it runs on the event loop through
+    # AsyncSession.run_sync, otherwise it is pushed to the threadpool like a plain `def` endpoint.
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+
+class ReadYourWritesMiddleware:
+    """Pins a client to the primary for DB_READ_STICKY_SECONDS after each successful write it makes, so it reads
+    its own writes even before the replica has replayed them. A cookie, so it holds across workers."""
+
+    def __init__(self, app, sticky_seconds: float = DB_READ_STICKY_SECONDS):
+        self.app = app
+        self.cookie = f"{READ_PRIMARY_COOKIE}=1; Max-Age={max(math.ceil(sticky_seconds), 1)}; Path=/; HttpOnly; SameSite=Lax"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_marked(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                MutableHeaders(scope=message).append("Set-Cookie", self.cookie)
+            await send(message)
+
+        await self.app(scope, receive, send_marked)
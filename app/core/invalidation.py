@@ -0,0 +1,230 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+import uuid
+from typing import Callable
+
+from sqlalchemy import event, func
+from sqlalchemy import select as sql_select
+from sqlalchemy.orm import Session
+
+from app.core.config import (
+    INVALIDATION_CHANNEL,
+    INVALIDATION_ENABLED,
+    INVALIDATION_KEEPALIVE_SECONDS,
+    INVALIDATION_RECONNECT_MAX_SECONDS,
+)
+from app.core.metrics import INVALIDATION_LAG_SECONDS, INVALIDATION_MESSAGES, INVALIDATION_RECONNECTS, gauge_callback
+from app.db import engine
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = "pending_invalidations"
+# NOTIFY payloads must stay under 8000 bytes; leave room for the envelope.
+_MAX_PAYLOAD_BYTES = 7500
+_RESYNC = "resync"
+
+# Tells this process's own messages apart when they come back on its listener.
+ORIGIN = uuid.uuid4().hex
+
+_handlers: dict[str, Callable] = {}
+_resync_callbacks: list[Callable[[], None]] = []
+
+
+def register_handler(kind: str, handler: Callable) -> None:
+    """Apply messages of `kind` sent by other workers; `handler` gets the arguments given to `notify`."""
+    _handlers[kind] = handler
+
+
+def register_resync(callback: Callable[[], None]) -> None:
+    """Drop process-local state that may have missed messages (the listener was disconnected)."""
+    _resync_callbacks.append(callback)
+
+
+def resync() -> None:
+    for callback in _resync_callbacks:
+        try:
+            callback()
+        except Exception:
+            logger.exception("Invalidation resync callback failed")
+
+
+def notify(db, kind: str, *args) -> None:
+    """Tell the other workers about a write in `db`'s transaction; sent with NOTIFY only if it commits.
+
+    The writer still updates its own process as before: its messages are ignored when they come back.
+    """
+    db.info.setdefault(_PENDING_KEY, []).append([kind, *args])
+
+
+def notify_now(kind: str, *args) -> bool:
+    """Send one message outside any transaction, for process-local writes such as token revocation.
+
+    Returns False when there is no one to tell (not on Postgres, or disabled).
+    """
+    if not _enabled():
+        return False
+    with engine.connect() as conn:
+        for payload in _payloads([[kind, *args]]):
+            conn.execute(sql_select(func.pg_notify(INVALIDATION_CHANNEL, payload)))
+        conn.commit()
+    return True
+
+
+def _enabled() -> bool:
+    return INVALIDATION_ENABLED and engine.dialect.name == "postgresql"
+
+
+def _payloads(messages: list) -> list[str]:
+    envelope = f'{{"o":"{ORIGIN}","t":{time.time():.6f},"m":['
+    payloads, chunk, size = [], [], len(envelope) + 2
+    for message in messages:
+        encoded = json.dumps(message, separators=(",", ":"), default=str)
+        if len(encoded.encode()) + len(envelope) + 2 > _MAX_PAYLOAD_BYTES:
+            # Too big for one notification (a long status detail); receivers drop everything instead.
+            encoded = json.dumps([_RESYNC])
+        if chunk and size + len(encoded.encode()) + 1 > _MAX_PAYLOAD_BYTES:
+            payloads.append(envelope + ",".join(chunk) + "]}")
+            chunk, size = [], len(envelope) + 2
+        chunk.append(encoded)
+        size += len(encoded.encode()) + 1
+    if chunk:
+        payloads.append(envelope + ",".join(chunk) + "]}")
+    return payloads
+
+
+@event.listens_for(Session, "before_commit")
+def _send_invalidations(session) -> None:
+    messages = session.info.get(_PENDING_KEY)
+    if not messages or not INVALIDATION_ENABLED or session.get_bind().dialect.name != "postgresql":
+        return
+    # NOTIFY is transactional: delivered when this commit succeeds, never after a rollback.
+    for payload in _payloads(messages):
+        session.execute(sql_select(func.pg_notify(INVALIDATION_CHANNEL, payload)))
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidations(session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _apply(payload: str) -> None:
+    try:
+        envelope = json.loads(payload)
+    except ValueError:
+        logger.warning("Ignoring malformed invalidation payload")
+        return
+    if envelope.get("o") == ORIGIN:
+        return
+    INVALIDATION_LAG_SECONDS.observe(max(time.time() - envelope.get("t", 0), 0.0))
+    for kind, *args in envelope.get("m", ()):
+        INVALIDATION_MESSAGES.inc(kind)
+        if kind == _RESYNC:
+            resync()
+            continue
+        handler = _handlers.get(kind)
+        if handler is None:
+            continue
+        try:
+            handler(*args)
+        except Exception:
+            logger.exception("Invalidation handler for %s failed", kind)
+
+
+class InvalidationListener:
+    """LISTENs on a dedicated connection (outside the pool) and applies other workers' messages.
+
+    Notifications sent while it is disconnected are lost, so every reconnect starts with a resync.
+    """
+
+    def __init__(
+        self,
+        channel: str = INVALIDATION_CHANNEL,
+        keepalive: float = INVALIDATION_KEEPALIVE_SECONDS,
+        max_backoff: float = INVALIDATION_RECONNECT_MAX_SECONDS,
+    ):
+        self.channel = channel
+        self.keepalive = keepalive
+        self.max_backoff = max_backoff
+        self.connected = False
+        self._connections = 0
+        self._stop = threading.Event()
+        self._task: asyncio.Task | None = None
+
+    def _connect(self):
+        cargs, cparams = engine.dialect.create_connect_args(engine.url)
+        conn = engine.dialect.connect(*cargs, **cparams)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+        return conn
+
+    def listen(self) -> None:
+        """Blocks until stopped; raises when the connection fails."""
+        conn = self._connect()
+        try:
+            self.connected = True
+            if self._connections:
+                resync()
+            self._connections += 1
+            idle_since = time.monotonic()
+            while not self._stop.is_set():
+                readable, _, _ = select.select([conn], [], [], 1.0)
+                if readable:
+                    conn.poll()
+                    while conn.notifies:
+                        _apply(conn.notifies.pop(0).payload)
+                    idle_since = time.monotonic()
+                elif time.monotonic() - idle_since >= self.keepalive:
+                    # A dead peer only shows up when we write to it.
+                    with conn.cursor() as cursor:
+                        cursor.execute("SELECT 1")
+                    idle_since = time.monotonic()
+        finally:
+            self.connected = False
+            conn.close()
+
+    async def run(self) -> None:
+        delay = 1.0
+        while not self._stop.is_set():
+            connections = self._connections
+            try:
+                await asyncio.to_thread(self.listen)
+            except Exception as exc:
+                INVALIDATION_RECONNECTS.inc()
+                logger.warning("Invalidation listener disconnected: %s", exc)
+            if self._stop.is_set():
+                break
+            delay = 1.0 if self._connections > connections else min(delay * 2, self.max_backoff)
+            await asyncio.sleep(delay)
+
+    def start(self) -> None:
+        if not _enabled() or self._task is not None:
+            return
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        # The listening thread notices within a second; cancelling only stops waiting for it.
+        self._stop.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+invalidation_listener = InvalidationListener()
+gauge_callback(
+    "idp_invalidation_listener_connected",
+    "1 while this worker is listening for other workers' invalidations",
+    (),
+    lambda: [((), 1.0 if invalidation_listener.connected else 0.0)],
+)
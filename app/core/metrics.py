@@ -0,0 +1,385 @@
+import functools
+import importlib.util
+import logging
+import time
+from contextlib import nullcontext
+from typing import Callable, Iterable
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from prometheus_client import Counter as PromCounter
+from prometheus_client import Gauge as PromGauge
+from prometheus_client import Histogram as PromHistogram
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.routing import Match, Mount
+
+from app.core.config import METRICS_ENABLED, OTEL_EXPORTER_OTLP_ENDPOINT, OTEL_SERVICE_NAME
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+_instruments: list = []
+_gauge_callbacks: list = []
+_tracer = None
+
+
+class _Instrument:
+    # A Prometheus metric, mirrored into an OTel instrument once OTLP export is set up.
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._otel = None
+        _instruments.append(self)
+
+    def _attributes(self, labels: tuple) -> dict:
+        return dict(zip(self.labelnames, labels))
+
+
+class Histogram(_Instrument):
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+        self._prom = PromHistogram(name, documentation, labelnames, buckets=buckets)
+
+    def observe(self, value: float, *labels: str) -> None:
+        (self._prom.labels(*labels) if labels else self._prom).observe(value)
+        if self._otel is not None:
+            self._otel.record(value, self._attributes(labels))
+
+    def _bind(self, meter) -> None:
+        self._otel = meter.create_histogram(
+            self.name, unit="s", description=self.documentation, explicit_bucket_boundaries_advisory=self.buckets
+        )
+
+
+class Counter(_Instrument):
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._prom = PromCounter(name, documentation, labelnames)
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        (self._prom.labels(*labels) if labels else self._prom).inc(amount)
+        if self._otel is not None:
+            self._otel.add(amount, self._attributes(labels))
+
+    def _bind(self, meter) -> None:
+        self._otel = meter.create_counter(self.name, description=self.documentation)
+
+
+class Gauge(_Instrument):
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._prom = PromGauge(name, documentation, labelnames)
+
+    def add(self, amount: float, *labels: str) -> None:
+        (self._prom.labels(*labels) if labels else self._prom).inc(amount)
+        if self._otel is not None:
+            self._otel.add(amount, self._attributes(labels))
+
+    def _bind(self, meter) -> None:
+        self._otel = meter.create_up_down_counter(self.name, description=self.documentation)
+
+
+class _CallbackCollector:
+    # Gauges computed at scrape time from process state (pool sizes, breaker state, queue depths).
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...], callback: Callable):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.callback = callback
+
+    def collect(self):
+        family = GaugeMetricFamily(self.name, self.documentation, labels=self.labelnames)
+        for labels, value in self._samples():
+            family.add_metric(list(labels), value)
+        yield family
+
+    def describe(self):
+        return [GaugeMetricFamily(self.name, self.documentation, labels=self.labelnames)]
+
+    def _samples(self) -> list:
+        try:
+            return list(self.callback())
+        except Exception:
+            logger.exception("Metric callback %s failed", self.name)
+            return []
+
+    def observe(self, _options):
+        from opentelemetry.metrics import Observation
+
+        return [Observation(value, dict(zip(self.labelnames, labels))) for labels, value in self._samples()]
+
+
+def gauge_callback(
+    name: str, documentation: str, labelnames: tuple[str, ...], callback: Callable[[], Iterable[tuple[tuple, float]]]
+) -> None:
+    """Register a gauge whose samples are `(label values, value)` pairs produced by `callback` on each scrape."""
+    collector = _CallbackCollector(name, documentation, labelnames, callback)
+    REGISTRY.register(collector)
+    _gauge_callbacks.append(collector)
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "idp_http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status")
+)
+HTTP_IN_FLIGHT = Gauge("idp_http_requests_in_flight", "HTTP requests currently being served", ("method", "route"))
+DB_STATEMENT_SECONDS = Histogram(
+    "idp_db_statement_duration_seconds", "Database statement execution time", ("engine", "operation"), DB_BUCKETS
+)
+DB_STATEMENT_ERRORS = Counter("idp_db_statement_errors_total", "Database statements that raised", ("engine",))
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "idp_db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ("engine",), DB_BUCKETS
+)
+DB_POOL_TIMEOUTS = Counter("idp_db_pool_timeouts_total", "Pool checkouts that timed out", ("engine",))
+AUTH_CHECKS = Counter("idp_auth_token_checks_total", "Bearer token checks by outcome", ("result",))
+AUTH_VERIFY_SECONDS = Histogram("idp_auth_verify_duration_seconds", "JWT signature verification time", (), DB_BUCKETS)
+WORKFLOW_CALL_SECONDS = Histogram(
+    "idp_workflow_call_duration_seconds", "Step Functions API call latency", ("operation", "outcome")
+)
+WORKFLOW_CALLS_REJECTED = Counter(
+    "idp_workflow_calls_rejected_total", "Step Functions calls refused by the open circuit breaker", ("operation",)
+)
+CALLBACKS_RECEIVED = Counter(
+    "idp_callbacks_received_total", "Workflow status callbacks received", ("kind", "endpoint")
+)
+CALLBACK_ERRORS = Counter("idp_callback_errors_total", "Workflow status callbacks that could not be applied", ("kind",))
+INVALIDATION_LAG_SECONDS = Histogram(
+    "idp_invalidation_lag_seconds", "Time from a writer's commit to another worker applying its invalidation"
+)
+INVALIDATION_MESSAGES = Counter(
+    "idp_invalidation_messages_total", "Invalidation messages applied from other workers", ("kind",)
+)
+ACTIONS_REJECTED = Counter(
+    "idp_actions_rejected_total", "Workflow-triggering actions refused by admission control", ("reason",)
+)
+INVALIDATION_RECONNECTS = Counter(
+    "idp_invalidation_reconnects_total", "Invalidation listener connections lost or refused"
+)
+
+
+# Raw paths carry ids, so the (method, path) -> route label cache is bounded.
+_ROUTE_LABEL_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=_ROUTE_LABEL_CACHE_SIZE)
+def _match_route(app, method: str, root_path: str, path: str) -> str:
+    scope = {"type": "http", "method": method, "root_path": root_path, "path": path}
+    partial = None
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.name if isinstance(route, Mount) else route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    return partial or "unmatched"
+
+
+def _route_label(scope) -> str:
+    # Route templates, not raw paths, so label cardinality stays bounded. Matching scans every route, so repeat
+    # requests for a path reuse the result.
+    app = scope.get("app")
+    if app is None:
+        return "unmatched"
+    return _match_route(app, scope["method"], scope.get("root_path", ""), scope["path"])
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        route = _route_label(scope)
+        response_status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                response_status[0] = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.add(1, method, route)
+        started = time.perf_counter()
+        try:
+            with span(f"{method} {route}", server=True, **{"http.method": method, "http.route": route}):
+                await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.add(-1, method, route)
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method, route, str(response_status[0]))
+
+
+def render_latest() -> tuple[bytes, str]:
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class MeteredQueuePool(QueuePool):
+    engine_label = "sync"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            DB_POOL_TIMEOUTS.inc(self.engine_label)
+            raise
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started, self.engine_label)
+
+
+class MeteredAsyncQueuePool(MeteredQueuePool, AsyncAdaptedQueuePool):
+    engine_label = "async"
+
+
+class MeteredReadQueuePool(MeteredQueuePool):
+    engine_label = "read"
+
+
+class MeteredAsyncReadQueuePool(MeteredAsyncQueuePool):
+    engine_label = "async_read"
+
+
+_engines: dict = {}
+_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+_TIMINGS_KEY = "metrics_statement_starts"
+
+
+def _operation(statement: str) -> str:
+    head = statement.lstrip()[:8].split(None, 1)
+    word = head[0].upper() if head else ""
+    return word if word in _OPERATIONS else "OTHER"
+
+
+def instrument_engine(engine, label: str) -> None:
+    """Time every statement on `engine` and expose its pool occupancy."""
+    _engines[label] = engine
+    if not METRICS_ENABLED:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, _cursor, statement, _parameters, _context, _executemany):
+        operation = _operation(statement)
+        current = start_span(f"db {operation}", **{"db.operation": operation}) if _tracer is not None else None
+        conn.info.setdefault(_TIMINGS_KEY, []).append((time.perf_counter(), operation, current))
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, _cursor, _statement, _parameters, _context, _executemany):
+        started, operation, current = conn.info[_TIMINGS_KEY].pop()
+        DB_STATEMENT_SECONDS.observe(time.perf_counter() - started, label, operation)
+        if current is not None:
+            current.end()
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        DB_STATEMENT_ERRORS.inc(label)
+        starts = context.connection.info.get(_TIMINGS_KEY) if context.connection is not None else None
+        if starts:
+            _started, _operation_name, current = starts.pop()
+            if current is not None:
+                current.end()
+
+
+def pool_stats() -> dict:
+    """Occupancy and limits of every instrumented engine's connection pool, by engine label."""
+    stats = {}
+    for label, engine in _engines.items():
+        pool = engine.pool
+        if not isinstance(pool, QueuePool):
+            continue
+        stats[label] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+            "recycle": pool._recycle,
+            "pre_ping": pool._pre_ping,
+        }
+    return stats
+
+
+def _pool_samples():
+    samples = []
+    for label, stats in pool_stats().items():
+        samples += [((label, state), stats[state]) for state in ("size", "checked_out", "checked_in", "overflow")]
+    return samples
+
+
+gauge_callback("idp_db_pool_connections", "Pooled database connections by state", ("engine", "state"), _pool_samples)
+
+
+def start_span(name: str, server: bool = False, **attributes):
+    from opentelemetry.trace import SpanKind
+
+    kind = SpanKind.SERVER if server else SpanKind.INTERNAL
+    return _tracer.start_span(name, kind=kind, attributes=attributes)
+
+
+def span(name: str, server: bool = False, **attributes):
+    """Context manager for a trace span; a no-op unless OTLP export is configured."""
+    if _tracer is None:
+        return nullcontext()
+    from opentelemetry.trace import SpanKind
+
+    kind = SpanKind.SERVER if server else SpanKind.INTERNAL
+    return _tracer.start_as_current_span(name, kind=kind, attributes=attributes)
+
+
+def otlp_available() -> bool:
+    try:
+        return importlib.util.find_spec("opentelemetry.exporter.otlp.proto.http") is not None
+    except ModuleNotFoundError:
+        return False
+
+
+def setup_otlp() -> bool:
+    """Push the same metrics, plus request/DB/workflow spans, to the OTLP endpoint if one is configured."""
+    global _tracer
+    if not (METRICS_ENABLED and OTEL_EXPORTER_OTLP_ENDPOINT) or _tracer is not None:
+        return False
+    if not otlp_available():
+        logger.warning("OTEL_EXPORTER_OTLP_ENDPOINT is set but the OpenTelemetry SDK is not installed")
+        return False
+    from opentelemetry import metrics as otel_metrics
+    from opentelemetry import trace
+    from opentelemetry.exporter.otlp.proto.http.metric_exporter import OTLPMetricExporter
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    resource = Resource.create({"service.name": OTEL_SERVICE_NAME})
+    meter_provider = MeterProvider(resource=resource, metric_readers=[PeriodicExportingMetricReader(OTLPMetricExporter())])
+    otel_metrics.set_meter_provider(meter_provider)
+    tracer_provider = TracerProvider(resource=resource)
+    tracer_provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(tracer_provider)
+
+    meter = otel_metrics.get_meter("idp-portal")
+    for instrument in _instruments:
+        instrument._bind(meter)
+    for collector in _gauge_callbacks:
+        meter.create_observable_gauge(collector.name, callbacks=[collector.observe], description=collector.documentation)
+    _tracer = trace.get_tracer("idp-portal")
+    return True
+
+
+def shutdown_otlp() -> None:
+    if _tracer is None:
+        return
+    from opentelemetry import metrics as otel_metrics
+    from opentelemetry import trace
+
+    for provider in (trace.get_tracer_provider(), otel_metrics.get_meter_provider()):
+        shutdown = getattr(provider, "shutdown", None)
+        if shutdown is not None:
+            shutdown()
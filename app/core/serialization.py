@@ -0,0 +1,18 @@
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """Encode plain JSON data (dicts, lists, str, int, bool, None) to the bytes JSONResponse would send.
+
+    Byte-for-byte the same as Starlette's rendering (compact separators, UTF-8, no ASCII escaping), so it can
+    replace `JSONResponse(jsonable_encoder(...))` for content that is already JSON-native.
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
@@ -0,0 +1,92 @@
+import hashlib
+import mimetypes
+import re
+from pathlib import Path
+
+from starlette.datastructures import Headers
+from starlette.responses import PlainTextResponse, Response
+
+from app.core.compression import ENCODINGS, compress, negotiate
+from app.core.config import STATIC_MAX_AGE_SECONDS
+
+
+class StaticAsset:
+    __slots__ = ("headers", "variants", "encodings", "etags")
+
+    def __init__(self, body: bytes, media_type: str, cache_control: str):
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        # encoding ("identity" for none) -> (body, ETag); each encoding gets its own strong ETag.
+        self.variants = {"identity": (body, f'"{digest}"')}
+        for encoding in ENCODINGS:
+            encoded = compress(body, encoding, best=True)
+            if len(encoded) < len(body):
+                self.variants[encoding] = (encoded, f'"{digest}-{encoding}"')
+        self.encodings = tuple(encoding for encoding in self.variants if encoding != "identity")
+        self.etags = {etag for _, etag in self.variants.values()}
+        self.headers = {"Content-Type": media_type, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+
+
+# A content hash in the file name (app.3f2a9c1b.js, chunk-0e1f2a3b4c.css): the URL changes whenever the file does.
+_HASHED_NAME = re.compile(r"[.-][0-9a-f]{8,}\.[A-Za-z0-9]+$")
+
+
+def _media_type(path: Path) -> str:
+    media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    if media_type.startswith("text/") or media_type == "application/javascript":
+        media_type += "; charset=utf-8"
+    return media_type
+
+
+class PrecompressedStaticFiles:
+    """Serves a directory from memory, read and compressed once at startup, like StaticFiles(html=True).
+
+    Responses carry content-hashed ETags (If-None-Match gets a 304). Files whose name carries a content hash are
+    cached for STATIC_MAX_AGE_SECONDS; everything else (HTML included) keeps its URL across deploys, so browsers
+    revalidate it on every load.
+    """
+
+    def __init__(self, directory: str, max_age: int = STATIC_MAX_AGE_SECONDS):
+        root = Path(directory)
+        self._assets: dict[str, StaticAsset] = {}
+        for path in sorted(root.rglob("*")):
+            if not path.is_file():
+                continue
+            media_type = _media_type(path)
+            cache_control = f"public, max-age={max_age}, immutable" if _HASHED_NAME.search(path.name) else "no-cache"
+            self._assets[path.relative_to(root).as_posix()] = StaticAsset(path.read_bytes(), media_type, cache_control)
+
+    def _lookup(self, path: str) -> StaticAsset | None:
+        path = path.lstrip("/")
+        if not path or path.endswith("/"):
+            path += "index.html"
+        return self._assets.get(path) or self._assets.get(f"{path}/index.html")
+
+    async def __call__(self, scope, receive, send):
+        if scope["method"] not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})
+            await response(scope, receive, send)
+            return
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path) :]
+        asset = self._lookup(path)
+        if asset is None:
+            await PlainTextResponse("Not Found", status_code=404)(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = negotiate(request_headers.get("accept-encoding", ""), asset.encodings) or "identity"
+        body, etag = asset.variants[encoding]
+        headers = {**asset.headers, "ETag": etag}
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and (
+            "*" in if_none_match
+            or asset.etags & {value.strip().removeprefix("W/") for value in if_none_match.split(",")}
+        ):
+            await Response(status_code=304, headers=headers)(scope, receive, send)
+            return
+        headers["Content-Length"] = str(len(body))
+        await Response(b"" if scope["method"] == "HEAD" else body, headers=headers)(scope, receive, send)
@@ -1,16 +1,39 @@
-from sqlalchemy import Column, DateTime, Integer, String, func
+from sqlalchemy import Column, DateTime, Index, Integer, String, func, text
 
 from app.db import Base
 
 
 class DeploymentModel(Base):
     __tablename__ = "deployments"
+    # Partial index over in-flight rows keeps the reconciler's scan proportional to running workflows.
+    __table_args__ = (
+        Index(
+            "ix_deployments_pending",
+            "id",
+            postgresql_where=text("status IN ('queued', 'in_progress') AND execution_arn IS NOT NULL"),
+        ),
+        # Serves per-service history pages and the latest-deployment lookup (service_id, id DESC); the
+        # included filter columns let environment/status/time filters run off the index.
+        Index(
+            "ix_deployments_service_id_id",
+            "service_id",
+            "id",
+            postgresql_include=["environment", "status", "created_at"],
+        ),
+        # Counts workflows in flight for the admission cap.
+        Index(
+            "ix_deployments_running",
+            "status",
+            postgresql_where=text("status IN ('queued', 'in_progress')"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    service_id = Column(Integer, nullable=False, index=True)
+    service_id = Column(Integer, nullable=False)
     environment = Column(String, nullable=False, default="dev")
     status = Column(String, nullable=False, default="queued")
     detail = Column(String, nullable=False, default="")
     execution_arn = Column(String, nullable=True)
+    batch_id = Column(Integer, nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -1,185 +1,367 @@
-import json
+import logging
+from datetime import datetime
+from types import SimpleNamespace
+from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from app.auth.utils import ROLE_ADMIN, ROLE_DEVELOPER, ROLE_VIEWER, require_roles
-from app.core.config import AWS_REGION, DEPLOYMENT_CALLBACK_TOKEN, DEPLOY_STEP_FUNCTION_ARN
-from app.core.deps import get_db
+from app.auth.utils import ROLE_ADMIN, ROLE_DEVELOPER, ROLE_VIEWER, AuthContext, require_roles
+from app.core.cache import cached_json, deploy_tag, service_tag
+from app.core.coalescer import WriteBehindCoalescer
+from app.core.config import (
+    CALLBACK_BATCH_MAX,
+    CALLBACK_COALESCE_SECONDS,
+    DEPLOYMENT_CALLBACK_TOKEN,
+    DEPLOY_WORKFLOWS_ENABLED,
+    HISTORY_PAGE_SIZE_DEFAULT,
+    HISTORY_PAGE_SIZE_MAX,
+)
+from app.core.deps import get_db, get_read_db, run_db
+from app.core.metrics import CALLBACK_ERRORS, CALLBACKS_RECEIVED
+from app.core.serialization import dumps
+from app.db import SessionLocal, bulk_update_by_pk
 from app.deploy.models import DeploymentModel
-from app.deploy.schemas import DeployCallback, DeployRequest, DeployResponse, DeployStatusResponse
+from app.deploy.schemas import DeployCallback, DeploymentRecord, DeployRequest, DeployResponse, DeployStatusResponse
+from app.deploy.service import deployment_event, enabled_environment, queue_deployment, running_deployments
+from app.events.hub import deploy_status_event, notify_service_events, publish_service_event
+from app.idempotency.service import IdempotencyKey, idempotency_key
+from app.overview.service import latest_deployment_statuses, overview_delta
 from app.services.models import ServiceModel
+from app.services.routes import NEXT_CURSOR_HEADER
+from app.workflows.admission import admit
+from app.workflows.outbox import dispatcher, enqueue_workflow
+from app.workflows.schemas import CallbackBatchResult, CallbackError, keep_execution_arn
 
-try:
-    import boto3
-except Exception:  # pragma: no cover - optional dependency for Step Functions
-    boto3 = None
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/services", tags=["deploy"])
 
 
-def _ensure_service(db: Session, service_id: int) -> ServiceModel:
-    service = db.get(ServiceModel, service_id)
+def _ensure_service(db: Session, service_id: int, lock: bool = False) -> ServiceModel:
+    service = db.get(ServiceModel, service_id, with_for_update=lock)
     if not service:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Service not found")
     return service
 
 
 def _resolve_environment(service: ServiceModel, requested_env: str | None) -> str:
-    envs = service.environments or []
-    if requested_env:
-        if requested_env not in envs:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Environment '{requested_env}' is not enabled for this service")
-        return requested_env
-    return envs[0] if envs else "dev"
-
-
-def _start_deploy_execution(service: ServiceModel, deployment: DeploymentModel) -> str | None:
-    if not DEPLOY_STEP_FUNCTION_ARN:
-        return None
-    if not boto3:
-        raise RuntimeError("boto3 not installed")
-    client = boto3.client("stepfunctions", region_name=AWS_REGION)
-    execution_input = {
-        "deployment_id": deployment.id,
-        "service": {
-            "id": service.id,
-            "name": service.name,
-            "tenant": service.tenant,
-            "observability_enabled": service.observability_enabled,
-            "repo_url": service.repo_url,
-            "owner_team": service.owner_team,
-            "runtime": service.runtime,
-            "tier": service.tier,
-        },
-        "environment": deployment.environment,
-    }
-    resp = client.start_execution(stateMachineArn=DEPLOY_STEP_FUNCTION_ARN, input=json.dumps(execution_input))
-    return resp.get("executionArn")
-
-
-def _sync_deployment_status_from_step_functions(deployment: DeploymentModel, db: Session) -> None:
-    if deployment.status not in {"queued", "in_progress"}:
-        return
-    if not deployment.execution_arn or not boto3:
-        return
-    try:
-        client = boto3.client("stepfunctions", region_name=AWS_REGION)
-        resp = client.describe_execution(executionArn=deployment.execution_arn)
-    except Exception:
-        return
-
-    sf_status = resp.get("status", "")
-    if sf_status == "RUNNING":
-        return
-    if sf_status == "SUCCEEDED":
-        deployment.status = "succeeded"
-        if deployment.detail in {"Deployment request queued", "Deployment started via Step Functions"}:
-            deployment.detail = "Deployment succeeded"
-    elif sf_status in {"FAILED", "TIMED_OUT", "ABORTED"}:
-        deployment.status = "failed"
-        failure_detail = resp.get("error") or sf_status
-        cause = resp.get("cause")
-        if cause:
-            failure_detail = f"{failure_detail}: {cause}"
-        deployment.detail = f"Deployment failed: {failure_detail}"
-    db.commit()
+    env = enabled_environment(service, requested_env)
+    if env is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Environment '{requested_env}' is not enabled for this service")
+    return env
 
 
-@router.post("/{service_id}/actions/deploy", response_model=DeployResponse)
-def deploy(
+def _queue_deployment(
+    db: Session,
     service_id: int,
-    payload: DeployRequest | None = None,
-    _: str = Depends(require_roles(ROLE_ADMIN, ROLE_DEVELOPER)),
-    db: Session = Depends(get_db),
-):
-    service = _ensure_service(db, service_id)
-    requested_env = payload.environment if payload else None
+    requested_env: str | None,
+    ctx: AuthContext,
+    idempotency: IdempotencyKey | None = None,
+) -> DeployResponse | Response:
+    if idempotency is not None:
+        replay = idempotency.claim(db)
+        if replay is not None:
+            return replay
+    # The row lock serializes deploys of one service, so two of them cannot both miss each other's run.
+    service = _ensure_service(db, service_id, lock=True)
     env = _resolve_environment(service, requested_env)
 
-    deployment = DeploymentModel(
-        service_id=service_id,
-        environment=env,
-        status="queued",
-        detail="Deployment request queued",
-    )
-    db.add(deployment)
-    db.commit()
-    db.refresh(deployment)
-
-    try:
-        execution_arn = _start_deploy_execution(service, deployment)
-        if execution_arn:
-            deployment.execution_arn = execution_arn
-            deployment.status = "in_progress"
-            deployment.detail = "Deployment started via Step Functions"
-        else:
-            deployment.detail = "Deployment queued (Step Functions not configured)"
-        db.commit()
-    except Exception as exc:  # pragma: no cover - integration path
-        deployment.status = "failed"
-        deployment.detail = f"Deployment failed to start: {exc}"
-        db.commit()
-        return DeployResponse(
+    running = running_deployments(db, [(service_id, env)]).get((service_id, env))
+    event = None
+    if running is not None:
+        response = DeployResponse(
+            deployment_id=running.id,
+            service_id=service_id,
+            environment=env,
+            action="deploy",
+            status=running.status,
+            detail=running.detail,
+            execution_arn=running.execution_arn,
+            coalesced=True,
+        )
+    else:
+        admit(db, ctx, [service])
+        previous = latest_deployment_statuses(db, [(service_id, env)]).get((service_id, env))
+        deployment = queue_deployment(db, service, env, previous[1] if previous else None)
+        db.flush()
+        if DEPLOY_WORKFLOWS_ENABLED:
+            # The execution is started by the outbox dispatcher once this transaction commits.
+            enqueue_workflow(db, "deploy", deployment.id)
+        response = DeployResponse(
             deployment_id=deployment.id,
             service_id=service_id,
             environment=env,
             action="deploy",
-            status="failed",
-            detail="Failed to start deployment workflow",
+            status="queued",
+            detail=deployment.detail,
         )
+        event = deployment_event(db, deployment)
+        notify_service_events(db, [event])
+    if idempotency is not None:
+        idempotency.record(db, status.HTTP_202_ACCEPTED, response)
+    db.commit()
+    if event is not None:
+        publish_service_event(*event)
+    return response
+
 
-    return DeployResponse(
-        deployment_id=deployment.id,
-        service_id=service_id,
-        environment=env,
-        action="deploy",
-        status=deployment.status,
-        detail=deployment.detail,
-        execution_arn=deployment.execution_arn,
+@router.post("/{service_id}/actions/deploy", response_model=DeployResponse, status_code=status.HTTP_202_ACCEPTED)
+async def deploy(
+    service_id: int,
+    payload: DeployRequest | None = None,
+    ctx: AuthContext = Depends(require_roles(ROLE_ADMIN, ROLE_DEVELOPER)),
+    idempotency: IdempotencyKey | None = Depends(idempotency_key),
+    db: Session = Depends(get_db),
+):
+    requested_env = payload.environment if payload else None
+    response = await run_db(db, _queue_deployment, service_id, requested_env, ctx, idempotency)
+    dispatcher.wake()
+    return response
+
+
+_STATUS_COLUMNS = (
+    DeploymentModel.id,
+    DeploymentModel.environment,
+    DeploymentModel.status,
+    DeploymentModel.detail,
+    DeploymentModel.execution_arn,
+)
+
+
+def _load_deploy_status(db: Session, service_id: int) -> bytes:
+    # One indexed lookup on the happy path; the service is only checked when there is no deployment to show.
+    deployment = db.execute(
+        select(*_STATUS_COLUMNS)
+        .where(DeploymentModel.service_id == service_id)
+        .order_by(DeploymentModel.id.desc())
+        .limit(1)
+    ).first()
+    if deployment is None:
+        _ensure_service(db, service_id)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No deployment found for service")
+    # Same keys, order and bytes as DeployStatusResponse.
+    return dumps(
+        {
+            "deployment_id": deployment.id,
+            "service_id": service_id,
+            "environment": deployment.environment,
+            "status": deployment.status,
+            "detail": deployment.detail,
+            "execution_arn": deployment.execution_arn,
+        }
     )
 
 
 @router.get("/{service_id}/actions/deploy/status", response_model=DeployStatusResponse)
-def deploy_status(
+async def deploy_status(
     service_id: int,
+    request: Request,
     _: str = Depends(require_roles(ROLE_ADMIN, ROLE_DEVELOPER, ROLE_VIEWER)),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
+    # Pure read: Step Functions state is folded in by the background reconciler (app.workflows.reconciler).
+    async def build():
+        return await run_db(db, _load_deploy_status, service_id), {}
+
+    return await cached_json(request, (service_tag(service_id), deploy_tag(service_id)), build)
+
+
+def _deployment_history(
+    db: Session,
+    service_id: int,
+    filters: dict,
+    created_after: datetime | None,
+    created_before: datetime | None,
+    cursor: int | None,
+    limit: int,
+) -> tuple[list[DeploymentRecord], int | None]:
     _ensure_service(db, service_id)
-    deployment = (
-        db.query(DeploymentModel)
-        .filter(DeploymentModel.service_id == service_id)
-        .order_by(DeploymentModel.id.desc())
-        .first()
-    )
-    if not deployment:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No deployment found for service")
-    _sync_deployment_status_from_step_functions(deployment, db)
-    db.refresh(deployment)
-    return DeployStatusResponse(
-        deployment_id=deployment.id,
-        service_id=deployment.service_id,
-        environment=deployment.environment,
-        status=deployment.status,
-        detail=deployment.detail,
-        execution_arn=deployment.execution_arn,
+    query = db.query(DeploymentModel).filter(DeploymentModel.service_id == service_id)
+    for column, value in filters.items():
+        if value is not None:
+            query = query.filter(getattr(DeploymentModel, column) == value)
+    if created_after is not None:
+        query = query.filter(DeploymentModel.created_at >= created_after)
+    if created_before is not None:
+        query = query.filter(DeploymentModel.created_at < created_before)
+    if cursor is not None:
+        query = query.filter(DeploymentModel.id < cursor)
+
+    rows = query.order_by(DeploymentModel.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1].id
+    items = [
+        DeploymentRecord(
+            deployment_id=row.id,
+            service_id=row.service_id,
+            environment=row.environment,
+            status=row.status,
+            detail=row.detail,
+            execution_arn=row.execution_arn,
+            batch_id=row.batch_id,
+            created_at=row.created_at,
+            updated_at=row.updated_at,
+        )
+        for row in rows
+    ]
+    return items, next_cursor
+
+
+@router.get("/{service_id}/deployments", response_model=List[DeploymentRecord])
+async def deployment_history(
+    service_id: int,
+    request: Request,
+    limit: int = Query(HISTORY_PAGE_SIZE_DEFAULT, ge=1, le=HISTORY_PAGE_SIZE_MAX),
+    cursor: int | None = Query(None, ge=0, description="Return deployments with id lower than this value"),
+    environment: str | None = None,
+    status_filter: str | None = Query(None, alias="status"),
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    _: str = Depends(require_roles(ROLE_ADMIN, ROLE_DEVELOPER, ROLE_VIEWER)),
+    db: Session = Depends(get_read_db),
+):
+    filters = {"environment": environment, "status": status_filter}
+
+    async def build():
+        items, next_cursor = await run_db(
+            db, _deployment_history, service_id, filters, created_after, created_before, cursor, limit
+        )
+        return items, {NEXT_CURSOR_HEADER: str(next_cursor)} if next_cursor is not None else {}
+
+    return await cached_json(request, (service_tag(service_id), deploy_tag(service_id)), build)
+
+
+def _count_deployment_statuses(db: Session, current: dict, updates: dict[int, dict]) -> None:
+    # Only a callback for an environment's latest deployment moves the overview counters.
+    latest = latest_deployment_statuses(
+        db, {(current[deployment_id].service_id, current[deployment_id].environment) for deployment_id in updates}
     )
+    delta = overview_delta(db)
+    for deployment_id, values in updates.items():
+        row = current[deployment_id]
+        newest = latest.get((row.service_id, row.environment))
+        if row.tenant is not None and newest and newest[0] == deployment_id:
+            delta.deployment(row.tenant, row.owner_team, row.environment, row.status, values["status"])
 
 
-@router.post("/deployments/callback")
-def deployment_callback(payload: DeployCallback, request: Request, db: Session = Depends(get_db)):
+def _apply_deployment_callbacks(db: Session, payloads: list[DeployCallback]) -> CallbackBatchResult:
+    result = CallbackBatchResult()
+    current = {
+        row.id: row
+        for row in db.query(
+            DeploymentModel.id,
+            DeploymentModel.service_id,
+            DeploymentModel.environment,
+            DeploymentModel.status,
+            DeploymentModel.execution_arn,
+            ServiceModel.tenant,
+            ServiceModel.owner_team,
+        )
+        .outerjoin(ServiceModel, ServiceModel.id == DeploymentModel.service_id)
+        .filter(DeploymentModel.id.in_({p.deployment_id for p in payloads}))
+    }
+
+    # Keyed by deployment so later updates to the same row replace earlier ones.
+    updates: dict[int, dict] = {}
+    for index, payload in enumerate(payloads):
+        if payload.deployment_id not in current:
+            result.errors.append(CallbackError(index=index, error="Deployment not found"))
+            continue
+        values = {"id": payload.deployment_id, "status": payload.status, "detail": payload.detail}
+        if payload.execution_arn:
+            values["execution_arn"] = payload.execution_arn
+        updates[payload.deployment_id] = {**updates.get(payload.deployment_id, {}), **values}
+        result.applied += 1
+
+    bulk_update_by_pk(db, DeploymentModel, updates.values())
+    _count_deployment_statuses(db, current, updates)
+    events = []
+    for deployment_id, values in updates.items():
+        row = current[deployment_id]
+        deployment = SimpleNamespace(
+            id=deployment_id,
+            service_id=row.service_id,
+            environment=row.environment,
+            status=values["status"],
+            detail=values["detail"],
+            execution_arn=values.get("execution_arn", row.execution_arn),
+        )
+        events.append((row.service_id, row.tenant or "", deploy_status_event(deployment)))
+    notify_service_events(db, events)
+    db.commit()
+    for event in events:
+        publish_service_event(*event)
+    if result.errors:
+        CALLBACK_ERRORS.inc("deployment", amount=len(result.errors))
+    return result
+
+
+def _apply_deployment_callback(db: Session, payload: DeployCallback) -> None:
+    result = _apply_deployment_callbacks(db, [payload])
+    if result.errors:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=result.errors[0].error)
+
+
+def _flush_deployment_callbacks(payloads: list[DeployCallback]) -> None:
+    with SessionLocal() as db:
+        result = _apply_deployment_callbacks(db, payloads)
+    for error in result.errors:
+        logger.warning("Dropped deployment callback for deployment %s: %s", payloads[error.index].deployment_id, error.error)
+
+
+deployment_callbacks = WriteBehindCoalescer(
+    "deployment_callbacks", _flush_deployment_callbacks, CALLBACK_COALESCE_SECONDS, merge=keep_execution_arn
+)
+
+
+def report_deployment_result(payload: DeployCallback) -> None:
+    """Apply a result reported from inside this process (the local workflow backend) like an HTTP callback."""
+    CALLBACKS_RECEIVED.inc("deployment", "local")
+    if deployment_callbacks.active:
+        deployment_callbacks.submit(payload.deployment_id, payload)
+    else:
+        _flush_deployment_callbacks([payload])
+
+
+def _check_callback_token(request: Request) -> None:
     token = request.headers.get("X-Callback-Token")
     if token != DEPLOYMENT_CALLBACK_TOKEN:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid callback token")
 
-    deployment = db.get(DeploymentModel, payload.deployment_id)
-    if not deployment:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Deployment not found")
 
-    deployment.status = payload.status
-    deployment.detail = payload.detail
-    if payload.execution_arn:
-        deployment.execution_arn = payload.execution_arn
-    db.commit()
+@router.post("/deployments/callback")
+async def deployment_callback(
+    payload: DeployCallback, request: Request, response: Response, db: Session = Depends(get_db)
+):
+    _check_callback_token(request)
+    CALLBACKS_RECEIVED.inc("deployment", "single")
+    if deployment_callbacks.active:
+        deployment_callbacks.submit(payload.deployment_id, payload)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {"status": "accepted"}
+
+    await run_db(db, _apply_deployment_callback, payload)
     return {"status": "ok"}
+
+
+@router.post("/deployments/callbacks:batch", response_model=CallbackBatchResult)
+async def deployment_callbacks_batch(
+    payloads: List[DeployCallback], request: Request, response: Response, db: Session = Depends(get_db)
+):
+    _check_callback_token(request)
+    if len(payloads) > CALLBACK_BATCH_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {CALLBACK_BATCH_MAX} callbacks per batch",
+        )
+    CALLBACKS_RECEIVED.inc("deployment", "batch", amount=len(payloads))
+    if deployment_callbacks.active:
+        for payload in payloads:
+            deployment_callbacks.submit(payload.deployment_id, payload)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return CallbackBatchResult(applied=len(payloads))
+    return await run_db(db, _apply_deployment_callbacks, payloads)
@@ -1,6 +1,7 @@
+from datetime import datetime
 from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class DeployRequest(BaseModel):
@@ -15,6 +16,9 @@ class DeployResponse(BaseModel):
     status: str
     detail: str
     execution_arn: Optional[str] = None
+    coalesced: bool = Field(
+        False, description="True when the request joined a deployment already queued or in progress"
+    )
 
 
 class DeployStatusResponse(BaseModel):
@@ -26,6 +30,18 @@ class DeployStatusResponse(BaseModel):
     execution_arn: Optional[str] = None
 
 
+class DeploymentRecord(BaseModel):
+    deployment_id: int
+    service_id: int
+    environment: str
+    status: str
+    detail: str
+    execution_arn: Optional[str] = None
+    batch_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
 class DeployCallback(BaseModel):
     deployment_id: int
     status: str
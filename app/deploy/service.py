@@ -0,0 +1,110 @@
+from typing import Iterable, Optional
+
+from sqlalchemy import func, select, tuple_
+
+from app.core.config import DEPLOY_WORKFLOWS_ENABLED
+from app.deploy.models import DeploymentModel
+from app.events.hub import deploy_status_event
+from app.overview.service import latest_deployment_statuses, overview_delta
+from app.services.models import ServiceModel
+from app.workflows.backends import workflow_backend
+from app.workflows.coalesce import RUNNING_STATUSES, coalesce_cutoff, is_joinable
+
+DEPLOY_STARTED_DETAIL = f"Deployment started via {workflow_backend.label}"
+
+
+def enabled_environment(service: ServiceModel, requested_env: Optional[str]) -> Optional[str]:
+    envs = service.environments or []
+    if requested_env:
+        return requested_env if requested_env in envs else None
+    return envs[0] if envs else "dev"
+
+
+def running_deployments(db, keys: Iterable[tuple[int, str]]) -> dict[tuple[int, str], DeploymentModel]:
+    """(service_id, environment) -> its latest deployment, for those still queued or in progress and recent
+    enough that a new deploy joins them instead of starting another run."""
+    keys = list(keys)
+    cutoff = coalesce_cutoff()
+    if not keys or cutoff is None:
+        return {}
+    latest = (
+        select(func.max(DeploymentModel.id))
+        .where(tuple_(DeploymentModel.service_id, DeploymentModel.environment).in_(keys))
+        .group_by(DeploymentModel.service_id, DeploymentModel.environment)
+    )
+    rows = db.scalars(
+        select(DeploymentModel).where(DeploymentModel.id.in_(latest), DeploymentModel.status.in_(RUNNING_STATUSES))
+    )
+    return {(row.service_id, row.environment): row for row in rows if is_joinable(row.created_at, cutoff)}
+
+
+def queue_deployment(
+    db, service: ServiceModel, environment: str, previous_status: Optional[str], batch_id: Optional[int] = None
+) -> DeploymentModel:
+    # previous_status: the environment's latest deployment status (latest_deployment_statuses), which this replaces.
+    detail = "Deployment request queued"
+    if not DEPLOY_WORKFLOWS_ENABLED:
+        detail = "Deployment queued (Step Functions not configured)"
+    overview_delta(db).deployment(service.tenant, service.owner_team, environment, previous_status, "queued")
+    deployment = DeploymentModel(
+        service_id=service.id,
+        environment=environment,
+        status="queued",
+        detail=detail,
+        batch_id=batch_id,
+    )
+    db.add(deployment)
+    return deployment
+
+
+def build_deploy_input(service: ServiceModel, deployment: DeploymentModel) -> dict:
+    return {
+        "deployment_id": deployment.id,
+        "service": {
+            "id": service.id,
+            "name": service.name,
+            "tenant": service.tenant,
+            "observability_enabled": service.observability_enabled,
+            "repo_url": service.repo_url,
+            "owner_team": service.owner_team,
+            "runtime": service.runtime,
+            "tier": service.tier,
+        },
+        "environment": deployment.environment,
+    }
+
+
+def start_deploy_execution(execution_input: dict, name: Optional[str] = None) -> Optional[str]:
+    # Blocking call (AWS, or the local executor's lock): run it off the event loop.
+    return workflow_backend.start("deploy", execution_input, name=name)
+
+
+def record_deployment_status(db, service: Optional[ServiceModel], deployment: DeploymentModel, status: str) -> None:
+    # Call before assigning the new status. Only an environment's latest deployment counts on the overview.
+    if service is None or deployment.status == status:
+        return
+    key = (deployment.service_id, deployment.environment)
+    latest = latest_deployment_statuses(db, [key]).get(key)
+    if latest and latest[0] == deployment.id:
+        overview_delta(db).deployment(service.tenant, service.owner_team, deployment.environment, deployment.status, status)
+
+
+def deployment_event(db, deployment: DeploymentModel) -> tuple[int, str, dict]:
+    # Captured before commit so publishing does not trigger a refresh of expired attributes.
+    service = db.get(ServiceModel, deployment.service_id)
+    return deployment.service_id, service.tenant if service else "", deploy_status_event(deployment)
+
+
+def mark_deployment_started(db, deployment: DeploymentModel, execution_arn: str) -> tuple[int, str, dict]:
+    record_deployment_status(db, db.get(ServiceModel, deployment.service_id), deployment, "in_progress")
+    deployment.execution_arn = execution_arn
+    deployment.status = "in_progress"
+    deployment.detail = DEPLOY_STARTED_DETAIL
+    return deployment_event(db, deployment)
+
+
+def mark_deployment_failed(db, deployment: DeploymentModel, error: Exception | str) -> tuple[int, str, dict]:
+    record_deployment_status(db, db.get(ServiceModel, deployment.service_id), deployment, "failed")
+    deployment.status = "failed"
+    deployment.detail = f"Deployment failed to start: {error}"
+    return deployment_event(db, deployment)
@@ -0,0 +1,123 @@
+import asyncio
+import threading
+from collections import defaultdict
+from typing import Iterable
+
+from app.core.cache import deploy_tag, invalidate_service, response_cache
+from app.core.config import EVENTS_QUEUE_SIZE
+from app.core.invalidation import notify, register_handler
+from app.core.metrics import gauge_callback
+
+
+class Subscription:
+    __slots__ = ("topics", "queue", "loop", "dropped")
+
+    def __init__(self, topics: tuple[str, ...], loop: asyncio.AbstractEventLoop, queue_size: int):
+        self.topics = topics
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+    def offer(self, event: dict) -> None:
+        # Status streams only care about the newest state, so a slow consumer loses its oldest events.
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+
+class EventHub:
+    def __init__(self, queue_size: int = EVENTS_QUEUE_SIZE):
+        self._queue_size = queue_size
+        self._subscribers: dict[str, set[Subscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, *topics: str) -> Subscription:
+        subscription = Subscription(topics, asyncio.get_running_loop(), self._queue_size)
+        with self._lock:
+            for topic in topics:
+                self._subscribers[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._subscribers.get(topic)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    def publish(self, topics: Iterable[str], event: dict) -> None:
+        # Safe to call from threadpool workers and from the event loop thread alike.
+        with self._lock:
+            targets = set()
+            for topic in topics:
+                targets.update(self._subscribers.get(topic, ()))
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # Subscriber's loop is closed; it is cleaned up when its stream ends.
+                pass
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len({sub for subs in self._subscribers.values() for sub in subs})
+
+
+def service_topic(service_id: int) -> str:
+    return f"service:{service_id}"
+
+
+def tenant_topic(tenant: str) -> str:
+    return f"tenant:{tenant}"
+
+
+hub = EventHub()
+gauge_callback("idp_event_subscribers", "Open server-sent event streams", (), lambda: [((), hub.subscriber_count())])
+
+
+def publish_service_event(service_id: int, tenant: str, event: dict) -> None:
+    # Every status writer publishes right after its commit, so cached reads of that service are dropped here too.
+    if event.get("type") == "deploy_status":
+        response_cache.invalidate(deploy_tag(service_id))
+    else:
+        invalidate_service(service_id)
+    hub.publish((service_topic(service_id), tenant_topic(tenant)), event)
+
+
+def notify_service_events(db, events: Iterable[tuple[int, str, dict]]) -> None:
+    """Have the other workers publish `events` (and drop the cached reads they affect) once `db` commits."""
+    for event in events:
+        if event:
+            notify(db, "event", *event)
+
+
+# Streams connected to other workers see this worker's status changes, and the other way round.
+register_handler("event", publish_service_event)
+
+
+def provision_status_event(service) -> dict:
+    return {
+        "type": "provision_status",
+        "service_id": service.id,
+        "status": service.provision_status,
+        "detail": service.provision_detail,
+    }
+
+
+def deploy_status_event(deployment) -> dict:
+    return {
+        "type": "deploy_status",
+        "deployment_id": deployment.id,
+        "service_id": deployment.service_id,
+        "environment": deployment.environment,
+        "status": deployment.status,
+        "detail": deployment.detail,
+        "execution_arn": deployment.execution_arn,
+    }
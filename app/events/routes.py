@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.auth.utils import ROLE_ADMIN, ROLE_DEVELOPER, ROLE_VIEWER, require_roles
+from app.core.config import EVENTS_KEEPALIVE_SECONDS
+from app.core.deps import get_db, run_db
+from app.deploy.models import DeploymentModel
+from app.events.hub import (
+    Subscription,
+    deploy_status_event,
+    hub,
+    provision_status_event,
+    service_topic,
+    tenant_topic,
+)
+from app.services.models import ServiceModel
+
+router = APIRouter(tags=["events"])
+
+_SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def _format_event(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+def _service_snapshot(db: Session, service_id: int) -> list[dict]:
+    service = db.get(ServiceModel, service_id)
+    if not service:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Service not found")
+    events = [provision_status_event(service)]
+    deployment = (
+        db.query(DeploymentModel)
+        .filter(DeploymentModel.service_id == service_id)
+        .order_by(DeploymentModel.id.desc())
+        .first()
+    )
+    if deployment:
+        events.append(deploy_status_event(deployment))
+    return events
+
+
+async def _stream(subscription: Subscription, initial: list[dict]):
+    try:
+        for event in initial:
+            yield _format_event(event)
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), timeout=EVENTS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield _format_event(event)
+    finally:
+        hub.unsubscribe(subscription)
+
+
+@router.get("/services/{service_id}/events")
+async def service_events(
+    service_id: int,
+    _: str = Depends(require_roles(ROLE_ADMIN, ROLE_DEVELOPER, ROLE_VIEWER)),
+    db: Session = Depends(get_db),
+):
+    # Subscribe before taking the snapshot so no change between the two is lost.
+    subscription = hub.subscribe(service_topic(service_id))
+    try:
+        initial = await run_db(db, _service_snapshot, service_id)
+    except Exception:
+        hub.unsubscribe(subscription)
+        raise
+    return StreamingResponse(_stream(subscription, initial), media_type="text/event-stream", headers=_SSE_HEADERS)
+
+
+@router.get("/tenants/{tenant}/events")
+async def tenant_events(
+    tenant: str,
+    _: str = Depends(require_roles(ROLE_ADMIN, ROLE_DEVELOPER, ROLE_VIEWER)),
+):
+    subscription = hub.subscribe(tenant_topic(tenant))
+    return StreamingResponse(_stream(subscription, []), media_type="text/event-stream", headers=_SSE_HEADERS)
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, DateTime, Integer, String, Text
+
+from app.db import Base
+
+
+class IdempotencyKeyModel(Base):
+    """The response to an action request sent with an Idempotency-Key, replayed to retries with the same key."""
+
+    __tablename__ = "idempotency_keys"
+
+    # Keys are scoped per user, so two users can never see each other's responses.
+    principal = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    # Hash of method, path and body: reusing a key for a different request is an error, not a replay.
+    fingerprint = Column(String, nullable=False)
+    status_code = Column(Integer, nullable=True)
+    body = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,155 @@
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, select, update
+
+from app.auth.utils import AuthContext, parse_token
+from app.core.config import IDEMPOTENCY_KEY_TTL_SECONDS, IDEMPOTENCY_PURGE_SECONDS
+from app.core.serialization import dumps
+from app.db import SessionLocal, dialect_insert
+from app.idempotency.models import IdempotencyKeyModel
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+_MAX_KEY_LENGTH = 255
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class IdempotencyKey:
+    """One request's key. Claimed and recorded inside the action's own transaction, so a request that fails
+    leaves no trace and a concurrent retry with the same key waits for the first one and replays its response."""
+
+    __slots__ = ("principal", "key", "fingerprint")
+
+    def __init__(self, principal: str, key: str, fingerprint: str):
+        self.principal = principal
+        self.key = key
+        self.fingerprint = fingerprint
+
+    def _where(self):
+        return IdempotencyKeyModel.principal == self.principal, IdempotencyKeyModel.key == self.key
+
+    def claim(self, db) -> Optional[Response]:
+        """Reserve the key; returns the stored response instead when this request is a retry."""
+        now = _utcnow()
+        expires_at = now + timedelta(seconds=IDEMPOTENCY_KEY_TTL_SECONDS)
+        stmt = dialect_insert(db, IdempotencyKeyModel).values(
+            principal=self.principal, key=self.key, fingerprint=self.fingerprint, created_at=now, expires_at=expires_at
+        )
+        # On Postgres a concurrent request holding the same key makes this wait until that one commits or rolls back.
+        stmt = stmt.on_conflict_do_nothing(index_elements=["principal", "key"]).returning(IdempotencyKeyModel.key)
+        if db.execute(stmt).first() is not None:
+            return None
+
+        stored = db.execute(
+            select(
+                IdempotencyKeyModel.fingerprint,
+                IdempotencyKeyModel.status_code,
+                IdempotencyKeyModel.body,
+                IdempotencyKeyModel.expires_at,
+            ).where(*self._where())
+        ).first()
+        if stored is not None and _as_utc(stored.expires_at) <= now:
+            taken = db.execute(
+                update(IdempotencyKeyModel)
+                .where(*self._where(), IdempotencyKeyModel.expires_at == stored.expires_at)
+                .values(
+                    fingerprint=self.fingerprint, status_code=None, body=None, created_at=now, expires_at=expires_at
+                )
+            )
+            if taken.rowcount:
+                return None
+        if stored is None or stored.status_code is None or _as_utc(stored.expires_at) <= now:
+            # Purged or taken over by another request between our statements.
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT, detail="A request with this Idempotency-Key is in progress"
+            )
+        if stored.fingerprint != self.fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used for a different request",
+            )
+        return Response(
+            content=stored.body,
+            status_code=stored.status_code,
+            media_type="application/json",
+            headers={REPLAYED_HEADER: "true"},
+        )
+
+    def record(self, db, status_code: int, content) -> None:
+        """Store the response; call right before the commit that makes the action's writes visible."""
+        db.execute(
+            update(IdempotencyKeyModel)
+            .where(*self._where())
+            .values(status_code=status_code, body=dumps(jsonable_encoder(content)).decode())
+        )
+
+
+async def idempotency_key(request: Request, ctx: AuthContext = Depends(parse_token)) -> Optional[IdempotencyKey]:
+    """Dependency for action endpoints: the request's Idempotency-Key, or None when it sent none."""
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is None:
+        return None
+    if not key or len(key) > _MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{IDEMPOTENCY_HEADER} must be 1 to {_MAX_KEY_LENGTH} characters",
+        )
+    digest = hashlib.sha256(f"{request.method} {request.url.path}\n".encode())
+    digest.update(await request.body())
+    return IdempotencyKey(ctx.username, key, digest.hexdigest())
+
+
+def purge_expired_keys() -> int:
+    with SessionLocal() as db:
+        deleted = db.execute(delete(IdempotencyKeyModel).where(IdempotencyKeyModel.expires_at < _utcnow())).rowcount
+        db.commit()
+    return deleted
+
+
+class IdempotencyPurge:
+    # Expired keys are also taken over on reuse; this only keeps the table from growing with keys never sent again.
+    def __init__(self, interval: float = IDEMPOTENCY_PURGE_SECONDS):
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await run_in_threadpool(purge_expired_keys)
+            except Exception:
+                logger.exception("Idempotency key purge failed")
+
+    def start(self) -> None:
+        if self.interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+idempotency_purge = IdempotencyPurge()
@@ -1,40 +1,123 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+import time
+
+from fastapi import Depends, FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
-from app.core.config import APP_NAME
-from app.db import Base, engine, ensure_runtime_schema
+from app.auth.utils import ROLE_ADMIN, require_roles
+from app.core.compression import CompressionMiddleware
+from app.core.config import APP_NAME, COMPRESSION_ENABLED, DEPLOY_STEP_FUNCTION_ARN, METRICS_ENABLED, STEP_FUNCTION_ARN
+from app.core.deps import ReadYourWritesMiddleware
+from app.core.invalidation import invalidation_listener
+from app.core.metrics import MetricsMiddleware, pool_stats, render_latest, setup_otlp, shutdown_otlp
+from app.core.static import PrecompressedStaticFiles
+from app.db import DB_READ_URL, engine
+from app.migrations import migrate
 from app.auth.routes import router as auth_router
 from app.services.routes import router as services_router
-from app.provisioning.routes import router as provisioning_router
-from app.deploy.routes import router as deploy_router
+from app.provisioning.routes import provisioning_callbacks, router as provisioning_router
+from app.deploy.routes import deployment_callbacks, router as deploy_router
+from app.batch.routes import router as batch_router
+from app.events.routes import router as events_router
+from app.overview.routes import router as overview_router
+from app.overview.service import overview_resync
+from app.idempotency.service import idempotency_purge
+from app.workflows import client as workflow_client
+from app.workflows.backends import workflow_backend
+from app.workflows.outbox import dispatcher
+from app.workflows.reconciler import reconciler
+from app.workflows.routes import router as workflows_router
+
+# uvicorn's logger is the one configured to print at INFO, next to "Application startup complete".
+startup_logger = logging.getLogger("uvicorn.error")
 
 app = FastAPI(title=APP_NAME)
 
+if COMPRESSION_ENABLED:
+    # Added first, so it runs innermost: request latency metrics include the compression time.
+    app.add_middleware(CompressionMiddleware)
+if DB_READ_URL:
+    app.add_middleware(ReadYourWritesMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Idempotent-Replayed", "Retry-After"],
 )
+# Outermost, so the measured latency includes CORS handling and every other middleware.
+app.add_middleware(MetricsMiddleware)
 
 
 @app.on_event("startup")
-def on_startup() -> None:
-    Base.metadata.create_all(bind=engine)
-    ensure_runtime_schema()
+async def on_startup() -> None:
+    started = time.perf_counter()
+    migration = await asyncio.to_thread(migrate, engine)
+    workers_started = time.perf_counter()
+    setup_otlp()
+    invalidation_listener.start()
+    dispatcher.start()
+    reconciler.start()
+    provisioning_callbacks.start()
+    deployment_callbacks.start()
+    overview_resync.start()
+    idempotency_purge.start()
+    if STEP_FUNCTION_ARN or DEPLOY_STEP_FUNCTION_ARN:
+        asyncio.get_running_loop().run_in_executor(None, workflow_client.warm_up)
+    finished = time.perf_counter()
+    startup_logger.info(
+        "Startup: schema v%s (%s) in %.0f ms, workers in %.0f ms, %.2f s CPU since process start",
+        migration.version_after,
+        ", ".join(migration.applied) or "up to date",
+        migration.seconds * 1000,
+        (finished - workers_started) * 1000,
+        time.process_time(),
+    )
+
+
+@app.on_event("shutdown")
+async def stop_background_workers() -> None:
+    await idempotency_purge.stop()
+    await overview_resync.stop()
+    # Before the callback coalescers, which then flush the results of the runs it interrupts.
+    await workflow_backend.stop()
+    await deployment_callbacks.stop()
+    await provisioning_callbacks.stop()
+    await reconciler.stop()
+    await dispatcher.stop()
+    await invalidation_listener.stop()
+    shutdown_otlp()
 
 
 @app.get("/health")
-def health():
+async def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/db/stats")
+async def db_stats(_: str = Depends(require_roles(ROLE_ADMIN))):
+    return {"replica": bool(DB_READ_URL), "pools": pool_stats()}
+
+
 app.include_router(auth_router)
 app.include_router(services_router)
 app.include_router(provisioning_router)
 app.include_router(deploy_router)
+app.include_router(batch_router)
+app.include_router(events_router)
+app.include_router(overview_router)
+app.include_router(workflows_router)
 
-# Serve frontend
-app.mount("/", StaticFiles(directory="frontend", html=True), name="frontend")
+# Serve frontend, compressed once here rather than on every request
+app.mount("/", PrecompressedStaticFiles(directory="frontend"), name="frontend")
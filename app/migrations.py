@@ -0,0 +1,280 @@
+import importlib
+import logging
+import time
+from collections import namedtuple
+from dataclasses import dataclass, field
+from typing import Callable
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, insert, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+
+from app.db import Base
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary, fixed key for pg_advisory_xact_lock so concurrently booting workers migrate one at a time.
+MIGRATION_LOCK_KEY = 0x1D9_5C4E
+
+_MODEL_MODULES = (
+    "app.services.models",
+    "app.provisioning.models",
+    "app.deploy.models",
+    "app.workflows.models",
+    "app.batch.models",
+    "app.overview.models",
+    "app.idempotency.models",
+)
+
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now(), nullable=False),
+)
+
+
+def _load_models() -> None:
+    for module in _MODEL_MODULES:
+        importlib.import_module(module)
+
+
+def _create_extensions(conn: Connection) -> None:
+    # Model indexes use pg_trgm operator classes, so the extension has to exist before they are created.
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+
+def _create_tables(conn: Connection) -> None:
+    _load_models()
+    _create_extensions(conn)
+    Base.metadata.create_all(bind=conn)
+
+
+# Tables of the releases before versioned migrations; later tables are created by the migration introducing them.
+_PRE_VERSIONED_TABLES = (
+    "services",
+    "tenants",
+    "provision_requests",
+    "deployments",
+    "workflow_outbox",
+    "action_batches",
+)
+
+
+def _create_pre_versioned_tables(conn: Connection) -> None:
+    _load_models()
+    Base.metadata.create_all(bind=conn, tables=[Base.metadata.tables[name] for name in _PRE_VERSIONED_TABLES])
+
+
+# Columns added to tables after their first release, for databases created before versioned migrations.
+_LEGACY_COLUMNS = (
+    ("services", "observability_enabled", "BOOLEAN NOT NULL DEFAULT false"),
+    ("deployments", "batch_id", "INTEGER"),
+    ("provision_requests", "batch_id", "INTEGER"),
+    ("tenants", "version", "INTEGER NOT NULL DEFAULT 0"),
+)
+
+
+def _add_columns(conn: Connection, columns) -> None:
+    inspector = inspect(conn)
+    for table_name, column, ddl in columns:
+        if column not in {col["name"] for col in inspector.get_columns(table_name)}:
+            conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column} {ddl}"))
+
+
+def _add_legacy_columns(conn: Connection) -> None:
+    _add_columns(conn, _LEGACY_COLUMNS)
+
+
+# Spelled out per migration rather than diffed against the models, so a migration builds the same indexes whatever
+# code runs it. `using`, `include` and `where` only apply on Postgres, as in the models.
+_Index = namedtuple(
+    "_Index", "name table columns unique using include where postgres_only", defaults=(False, "", "", "", False)
+)
+
+_PRE_VERSIONED_INDEXES = (
+    _Index("ix_services_id", "services", "id"),
+    _Index("ix_services_tenant", "services", "tenant"),
+    _Index("ix_services_tenant_id", "services", "tenant, id"),
+    _Index("ix_services_owner_team_id", "services", "owner_team, id"),
+    _Index("ix_services_runtime_id", "services", "runtime, id"),
+    _Index("ix_services_tier_id", "services", "tier, id"),
+    _Index("ix_services_provision_status_id", "services", "provision_status, id"),
+    _Index("ix_tenants_id", "tenants", "id"),
+    _Index("ix_tenants_name", "tenants", "name", unique=True),
+    _Index("ix_provision_requests_id", "provision_requests", "id"),
+    _Index("ix_provision_requests_tenant", "provision_requests", "tenant"),
+    _Index("ix_provision_requests_batch_id", "provision_requests", "batch_id"),
+    _Index("ix_provision_requests_latest", "provision_requests", "service_id, tenant, action, id"),
+    _Index(
+        "ix_provision_requests_service_id_id",
+        "provision_requests",
+        "service_id, id",
+        include="action, status, created_at",
+    ),
+    _Index(
+        "ix_provision_requests_pending",
+        "provision_requests",
+        "id",
+        where="status IN ('queued', 'in_progress') AND execution_arn IS NOT NULL",
+    ),
+    _Index("ix_deployments_id", "deployments", "id"),
+    _Index("ix_deployments_batch_id", "deployments", "batch_id"),
+    _Index("ix_deployments_service_id_id", "deployments", "service_id, id", include="environment, status, created_at"),
+    _Index(
+        "ix_deployments_pending",
+        "deployments",
+        "id",
+        where="status IN ('queued', 'in_progress') AND execution_arn IS NOT NULL",
+    ),
+    _Index("ix_workflow_outbox_id", "workflow_outbox", "id"),
+    _Index("ix_workflow_outbox_due", "workflow_outbox", "next_attempt_at, id", where="status = 'pending'"),
+    _Index("ix_action_batches_id", "action_batches", "id"),
+)
+
+_SEARCH_INDEXES = (
+    _Index(
+        "ix_services_search_trgm",
+        "services",
+        "lower(name || ' ' || owner_team || ' ' || tenant || ' ' || repo_url) gist_trgm_ops",
+        using="gist",
+        postgres_only=True,
+    ),
+)
+
+_RUNNING_WORKFLOW_INDEXES = (
+    _Index("ix_deployments_running", "deployments", "status", where="status IN ('queued', 'in_progress')"),
+    _Index(
+        "ix_provision_requests_running", "provision_requests", "status", where="status IN ('queued', 'in_progress')"
+    ),
+)
+
+
+def _create_indexes(conn: Connection, indexes) -> None:
+    postgres = conn.dialect.name == "postgresql"
+    for index in indexes:
+        if index.postgres_only and not postgres:
+            continue
+        ddl = f"CREATE {'UNIQUE ' if index.unique else ''}INDEX IF NOT EXISTS {index.name} ON {index.table}"
+        if postgres and index.using:
+            ddl += f" USING {index.using}"
+        ddl += f" ({index.columns})"
+        if postgres and index.include:
+            ddl += f" INCLUDE ({index.include})"
+        if postgres and index.where:
+            ddl += f" WHERE {index.where}"
+        conn.execute(text(ddl))
+
+
+def _create_pre_versioned_indexes(conn: Connection) -> None:
+    _create_indexes(conn, _PRE_VERSIONED_INDEXES)
+
+
+def _create_search_index(conn: Connection) -> None:
+    _create_extensions(conn)
+    _create_indexes(conn, _SEARCH_INDEXES)
+
+
+def _create_overview_counts(conn: Connection) -> None:
+    from app.overview.models import OverviewCountModel
+    from app.overview.service import rebuild_overview
+
+    OverviewCountModel.__table__.create(bind=conn, checkfirst=True)
+    rebuild_overview(conn)
+
+
+def _create_idempotency_keys(conn: Connection) -> None:
+    from app.idempotency.models import IdempotencyKeyModel
+
+    IdempotencyKeyModel.__table__.create(bind=conn, checkfirst=True)
+
+
+def _create_admission_tables(conn: Connection) -> None:
+    from app.workflows.models import RateLimitBucketModel
+
+    RateLimitBucketModel.__table__.create(bind=conn, checkfirst=True)
+    _create_indexes(conn, _RUNNING_WORKFLOW_INDEXES)
+
+
+def _add_status_versions(conn: Connection) -> None:
+    _add_columns(
+        conn,
+        (
+            ("services", "version", "INTEGER NOT NULL DEFAULT 0"),
+            ("provision_requests", "version", "INTEGER NOT NULL DEFAULT 0"),
+        ),
+    )
+
+
+# Append only: (version, name, apply). Each runs once per database, in order, inside the migration transaction.
+# A fresh database gets the current models from create_all and is stamped at LATEST_VERSION, so migrations
+# only ever run against databases that already hold the schema of the version before them.
+MIGRATIONS: tuple[tuple[int, str, Callable[[Connection], None]], ...] = (
+    (1, "create tables", _create_pre_versioned_tables),
+    (2, "add columns from pre-versioned releases", _add_legacy_columns),
+    (3, "create indexes from pre-versioned releases", _create_pre_versioned_indexes),
+    (4, "create and backfill overview_counts", _create_overview_counts),
+    (5, "create trigram search index on services", _create_search_index),
+    (6, "create idempotency_keys", _create_idempotency_keys),
+    (7, "create rate_limit_buckets and in-flight workflow indexes", _create_admission_tables),
+    (8, "add version to services and provision_requests", _add_status_versions),
+)
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+@dataclass
+class MigrationReport:
+    version_before: int
+    version_after: int
+    applied: list[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+
+def _current_version(conn: Connection) -> int:
+    return conn.execute(select(func.coalesce(func.max(schema_version.c.version), 0))).scalar_one()
+
+
+def _fast_path_version(engine: Engine) -> int:
+    with engine.connect() as conn:
+        try:
+            return _current_version(conn)
+        except DBAPIError:
+            # No schema_version table yet: a fresh database or one from before versioned migrations.
+            return 0
+
+
+def migrate(engine: Engine) -> MigrationReport:
+    """Bring the schema to LATEST_VERSION. An up-to-date database costs a single SELECT."""
+    started = time.perf_counter()
+    version = _fast_path_version(engine)
+    report = MigrationReport(version, version)
+    if version >= LATEST_VERSION:
+        report.seconds = time.perf_counter() - started
+        return report
+
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # Held until commit; workers that lose the race find the work done when they re-read the version.
+            conn.execute(select(func.pg_advisory_xact_lock(MIGRATION_LOCK_KEY)))
+            # Backfills and index builds may outlast DB_STATEMENT_TIMEOUT_MS, which is meant for requests.
+            conn.execute(text("SET LOCAL statement_timeout = 0"))
+        schema_version.create(bind=conn, checkfirst=True)
+        report.version_before = version = _current_version(conn)
+        if version == 0 and not inspect(conn).has_table("services"):
+            _create_tables(conn)
+            conn.execute(insert(schema_version), [{"version": number, "name": name} for number, name, _ in MIGRATIONS])
+            report.applied.append("create schema")
+            version = LATEST_VERSION
+        for number, name, apply in MIGRATIONS:
+            if number <= version:
+                continue
+            logger.info("Applying migration %s: %s", number, name)
+            apply(conn)
+            conn.execute(insert(schema_version).values(version=number, name=name))
+            report.applied.append(f"{number} {name}")
+            version = number
+    report.version_after = version
+    report.seconds = time.perf_counter() - started
+    return report
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String
+
+from app.db import Base
+
+
+class OverviewCountModel(Base):
+    """Service counts per (tenant, owner_team) and bucket, kept current by the writers that change them.
+
+    metric is "provision" (bucket = provision_status), "observability" (bucket = enabled/disabled) or
+    "deploy" (bucket = status of the latest deployment for `environment`); environment is "" otherwise.
+    """
+
+    __tablename__ = "overview_counts"
+
+    tenant = Column(String, primary_key=True)
+    owner_team = Column(String, primary_key=True)
+    metric = Column(String, primary_key=True)
+    environment = Column(String, primary_key=True, default="")
+    bucket = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,97 @@
+from fastapi import APIRouter, Depends, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.auth.utils import ROLE_ADMIN, ROLE_DEVELOPER, ROLE_VIEWER, require_roles
+from app.core.cache import OVERVIEW_TAG, cached_json
+from app.core.deps import get_db, run_db
+from app.core.serialization import dumps
+from app.overview.models import OverviewCountModel
+from app.overview.schemas import OverviewResponse
+from app.overview.service import resync_overview
+
+router = APIRouter(prefix="/overview", tags=["overview"])
+
+
+def _rollup(name: str) -> dict:
+    # Same keys and order as OverviewRollup.
+    return {
+        "name": name,
+        "services": 0,
+        "provision_status": {},
+        "deployments": {},
+        "observability": {"enabled": 0, "disabled": 0, "coverage": 0.0},
+    }
+
+
+def _add(rollup: dict, metric: str, environment: str, bucket: str, count: int) -> None:
+    if metric == "provision":
+        rollup["services"] += count
+        rollup["provision_status"][bucket] = rollup["provision_status"].get(bucket, 0) + count
+    elif metric == "observability":
+        rollup["observability"][bucket] += count
+    else:
+        statuses = rollup["deployments"].setdefault(environment, {})
+        statuses[bucket] = statuses.get(bucket, 0) + count
+
+
+def _finish(rollup: dict) -> dict:
+    if rollup["services"]:
+        rollup["observability"]["coverage"] = round(rollup["observability"]["enabled"] / rollup["services"], 4)
+    return rollup
+
+
+def _grouped(db: Session, column, tenant: str | None) -> list[tuple]:
+    # Reads the summary table only: rows scale with tenants x teams x statuses, not with services.
+    total = func.sum(OverviewCountModel.count)
+    stmt = (
+        select(column, OverviewCountModel.metric, OverviewCountModel.environment, OverviewCountModel.bucket, total)
+        .group_by(column, OverviewCountModel.metric, OverviewCountModel.environment, OverviewCountModel.bucket)
+        .having(total != 0)
+        .order_by(column)
+    )
+    if tenant is not None:
+        stmt = stmt.where(OverviewCountModel.tenant == tenant)
+    return db.execute(stmt).all()
+
+
+def _load_overview(db: Session, tenant: str | None) -> bytes:
+    totals = _rollup("all")
+    tenants: dict[str, dict] = {}
+    for name, metric, environment, bucket, count in _grouped(db, OverviewCountModel.tenant, tenant):
+        _add(tenants.setdefault(name, _rollup(name)), metric, environment, bucket, count)
+        _add(totals, metric, environment, bucket, count)
+    teams: dict[str, dict] = {}
+    for name, metric, environment, bucket, count in _grouped(db, OverviewCountModel.owner_team, tenant):
+        _add(teams.setdefault(name, _rollup(name)), metric, environment, bucket, count)
+    return dumps(
+        {
+            "totals": _finish(totals),
+            "tenants": [_finish(rollup) for rollup in tenants.values()],
+            "teams": [_finish(rollup) for rollup in teams.values()],
+        }
+    )
+
+
+@router.get("", response_model=OverviewResponse)
+async def overview(
+    request: Request,
+    tenant: str | None = None,
+    _: str = Depends(require_roles(ROLE_ADMIN, ROLE_DEVELOPER, ROLE_VIEWER)),
+    db: Session = Depends(get_db),
+):
+    """Service counts by provision status, latest deployment status per environment and observability
+    coverage, rolled up per tenant and per owner team."""
+
+    async def build():
+        return await run_db(db, _load_overview, tenant), {}
+
+    return await cached_json(request, (OVERVIEW_TAG,), build)
+
+
+@router.post(":resync")
+async def resync(_: str = Depends(require_roles(ROLE_ADMIN))):
+    """Rebuild the summary from services and deployments, discarding any drift."""
+    rebuilt = await run_in_threadpool(resync_overview)
+    return {"status": "ok" if rebuilt else "busy"}
@@ -0,0 +1,25 @@
+from typing import Dict, List
+
+from pydantic import BaseModel, Field
+
+
+class ObservabilityCoverage(BaseModel):
+    enabled: int = 0
+    disabled: int = 0
+    coverage: float = Field(0.0, description="Fraction of services with observability enabled")
+
+
+class OverviewRollup(BaseModel):
+    name: str
+    services: int = 0
+    provision_status: Dict[str, int] = Field(default_factory=dict)
+    deployments: Dict[str, Dict[str, int]] = Field(
+        default_factory=dict, description="environment -> status of each service's latest deployment -> services"
+    )
+    observability: ObservabilityCoverage = Field(default_factory=ObservabilityCoverage)
+
+
+class OverviewResponse(BaseModel):
+    totals: OverviewRollup
+    tenants: List[OverviewRollup]
+    teams: List[OverviewRollup]
@@ -0,0 +1,216 @@
+import asyncio
+import logging
+from collections import Counter
+from typing import Iterable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import case, delete, event, func, insert, literal_column, select, tuple_, union_all
+from sqlalchemy.orm import Session
+
+from app.core.cache import OVERVIEW_TAG, notify_tags, response_cache
+from app.core.config import OVERVIEW_RESYNC_SECONDS
+from app.db import SessionLocal, dialect_insert
+from app.deploy.models import DeploymentModel
+from app.overview.models import OverviewCountModel
+from app.services.models import ServiceModel
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = "pending_overview"
+_KEY_COLUMNS = ("tenant", "owner_team", "metric", "environment", "bucket")
+# Arbitrary application-wide key for pg_try_advisory_xact_lock so concurrent resyncs don't collide.
+_RESYNC_LOCK_KEY = 0x1D9_0C70
+
+
+class OverviewDelta:
+    """Counter changes made by one transaction; written as upserts right before it commits."""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+
+    def _add(self, tenant: str, owner_team: str, metric: str, environment: str, bucket: str, amount: int) -> None:
+        self.counts[(tenant, owner_team, metric, environment, bucket)] += amount
+
+    def provision(self, tenant: str, owner_team: str, old: str, new: str) -> None:
+        if old != new:
+            self._add(tenant, owner_team, "provision", "", old, -1)
+            self._add(tenant, owner_team, "provision", "", new, 1)
+
+    def deployment(self, tenant: str, owner_team: str, environment: str, old: Optional[str], new: str) -> None:
+        # `old` is the status of the environment's previous latest deployment, None for its first one.
+        if old == new:
+            return
+        if old is not None:
+            self._add(tenant, owner_team, "deploy", environment, old, -1)
+        self._add(tenant, owner_team, "deploy", environment, new, 1)
+
+    def service(
+        self,
+        tenant: str,
+        owner_team: str,
+        provision_status: str,
+        observability_enabled: bool,
+        deployments: Optional[dict[str, str]] = None,
+        sign: int = 1,
+    ) -> None:
+        """Add (sign=1) or remove (sign=-1) everything one service contributes."""
+        self._add(tenant, owner_team, "provision", "", provision_status, sign)
+        self._add(tenant, owner_team, "observability", "", "enabled" if observability_enabled else "disabled", sign)
+        for environment, status in (deployments or {}).items():
+            self._add(tenant, owner_team, "deploy", environment, status, sign)
+
+
+def overview_delta(db) -> OverviewDelta:
+    delta = db.info.get(_PENDING_KEY)
+    if delta is None:
+        delta = db.info[_PENDING_KEY] = OverviewDelta()
+        notify_tags(db, OVERVIEW_TAG)
+    return delta
+
+
+def _write_delta(db, delta: OverviewDelta) -> None:
+    # Sorted so concurrent writers take the counter row locks in the same order.
+    rows = [dict(zip(_KEY_COLUMNS, key), count=amount) for key, amount in sorted(delta.counts.items()) if amount]
+    if not rows:
+        return
+    stmt = dialect_insert(db, OverviewCountModel)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(_KEY_COLUMNS), set_={"count": OverviewCountModel.count + stmt.excluded.count}
+    )
+    db.execute(stmt, rows)
+
+
+@event.listens_for(Session, "before_commit")
+def _flush_overview_delta(session) -> None:
+    delta = session.info.get(_PENDING_KEY)
+    if delta is not None:
+        # Row writes first, counters last: the same lock order as action paths that lock the service row up front.
+        session.flush()
+        _write_delta(session, delta)
+
+
+@event.listens_for(Session, "after_commit")
+def _overview_committed(session) -> None:
+    delta = session.info.pop(_PENDING_KEY, None)
+    if delta is not None and any(delta.counts.values()):
+        response_cache.invalidate(OVERVIEW_TAG)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_overview_delta(session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def latest_deployment_statuses(db, keys: Iterable[tuple[int, str]]) -> dict[tuple[int, str], tuple[int, str]]:
+    """(service_id, environment) -> (id, status) of the newest deployment to that environment."""
+    keys = list(keys)
+    if not keys:
+        return {}
+    latest = (
+        select(func.max(DeploymentModel.id))
+        .where(tuple_(DeploymentModel.service_id, DeploymentModel.environment).in_(keys))
+        .group_by(DeploymentModel.service_id, DeploymentModel.environment)
+    )
+    rows = db.execute(
+        select(DeploymentModel.id, DeploymentModel.service_id, DeploymentModel.environment, DeploymentModel.status)
+        .where(DeploymentModel.id.in_(latest))
+    )
+    return {(row.service_id, row.environment): (row.id, row.status) for row in rows}
+
+
+def latest_deployments(db, service_ids: Iterable[int]) -> dict[int, dict[str, str]]:
+    """service_id -> {environment: status of its newest deployment there}."""
+    service_ids = list(service_ids)
+    if not service_ids:
+        return {}
+    latest = (
+        select(func.max(DeploymentModel.id))
+        .where(DeploymentModel.service_id.in_(service_ids))
+        .group_by(DeploymentModel.service_id, DeploymentModel.environment)
+    )
+    found: dict[int, dict[str, str]] = {}
+    rows = db.execute(
+        select(DeploymentModel.service_id, DeploymentModel.environment, DeploymentModel.status)
+        .where(DeploymentModel.id.in_(latest))
+    )
+    for service_id, environment, status in rows:
+        found.setdefault(service_id, {})[environment] = status
+    return found
+
+
+def rebuild_overview(db) -> None:
+    """Recompute every counter from services and deployments. O(services); the incremental path is O(1)."""
+    service, deployment = ServiceModel, DeploymentModel
+    blank = literal_column("''")
+    provision = select(
+        service.tenant, service.owner_team, literal_column("'provision'"), blank, service.provision_status, func.count()
+    ).group_by(service.tenant, service.owner_team, service.provision_status)
+    observability = select(
+        service.tenant,
+        service.owner_team,
+        literal_column("'observability'"),
+        blank,
+        case((service.observability_enabled, literal_column("'enabled'")), else_=literal_column("'disabled'")),
+        func.count(),
+    ).group_by(service.tenant, service.owner_team, service.observability_enabled)
+    latest = select(func.max(deployment.id)).group_by(deployment.service_id, deployment.environment)
+    deploy = (
+        select(
+            service.tenant, service.owner_team, literal_column("'deploy'"), deployment.environment, deployment.status, func.count()
+        )
+        .select_from(deployment)
+        .join(service, service.id == deployment.service_id)
+        .where(deployment.id.in_(latest))
+        .group_by(service.tenant, service.owner_team, deployment.environment, deployment.status)
+    )
+    db.execute(delete(OverviewCountModel))
+    db.execute(
+        insert(OverviewCountModel).from_select([*_KEY_COLUMNS, "count"], union_all(provision, observability, deploy))
+    )
+
+
+def resync_overview() -> bool:
+    """Rebuild the counters in one transaction; returns False when another worker is already doing it."""
+    with SessionLocal() as db:
+        if db.get_bind().dialect.name == "postgresql":
+            if not db.execute(select(func.pg_try_advisory_xact_lock(_RESYNC_LOCK_KEY))).scalar():
+                return False
+        rebuild_overview(db)
+        notify_tags(db, OVERVIEW_TAG)
+        db.commit()
+    response_cache.invalidate(OVERVIEW_TAG)
+    return True
+
+
+class OverviewResync:
+    # Incremental updates can drift under races the writers don't lock against (two deploys to the same
+    # environment at once); a periodic rebuild bounds how long any drift lives.
+    def __init__(self, interval: float = OVERVIEW_RESYNC_SECONDS):
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await run_in_threadpool(resync_overview)
+            except Exception:
+                logger.exception("Overview resync failed")
+
+    def start(self) -> None:
+        if self.interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+overview_resync = OverviewResync()
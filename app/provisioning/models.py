@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, Integer, String, func
+from sqlalchemy import Column, DateTime, Index, Integer, String, func, text
 
 from app.db import Base
 
@@ -13,17 +13,45 @@ class TenantModel(Base):
     namespace = Column(String, nullable=True)
     rds_schema = Column(String, nullable=True)
     s3_bucket = Column(String, nullable=True)
+    # Bumped on every status write; conditional updates compare against it.
+    version = Column(Integer, nullable=False, default=0, server_default="0")
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
 
 class ProvisionRequestModel(Base):
     __tablename__ = "provision_requests"
+    # Partial index over in-flight rows keeps the reconciler's scan proportional to running workflows.
+    __table_args__ = (
+        Index(
+            "ix_provision_requests_pending",
+            "id",
+            postgresql_where=text("status IN ('queued', 'in_progress') AND execution_arn IS NOT NULL"),
+        ),
+        # Callbacks without a request_id resolve the latest request for (service, tenant, action).
+        Index("ix_provision_requests_latest", "service_id", "tenant", "action", "id"),
+        # Per-service history pages, newest first, filtered by action/status/time.
+        Index(
+            "ix_provision_requests_service_id_id",
+            "service_id",
+            "id",
+            postgresql_include=["action", "status", "created_at"],
+        ),
+        # Counts workflows in flight for the admission cap.
+        Index(
+            "ix_provision_requests_running",
+            "status",
+            postgresql_where=text("status IN ('queued', 'in_progress')"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    service_id = Column(Integer, nullable=False, index=True)
+    service_id = Column(Integer, nullable=False)
     tenant = Column(String, nullable=False, index=True)
     action = Column(String, nullable=False)
     status = Column(String, nullable=False, default="queued")
     detail = Column(String, nullable=False, default="")
     execution_arn = Column(String, nullable=True)
+    batch_id = Column(Integer, nullable=True, index=True)
+    # Bumped on every status write; callbacks and the outbox update conditionally on it (see app.db).
+    version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,146 +1,397 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+import logging
+from datetime import datetime
+from types import SimpleNamespace
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import func, select, tuple_
 from sqlalchemy.orm import Session
 
-from app.auth.utils import ROLE_ADMIN, ROLE_DEVELOPER, ROLE_VIEWER, require_roles
-from app.core.config import CALLBACK_TOKEN, STEP_FUNCTION_ARN
-from app.core.deps import get_db
-from app.provisioning.models import ProvisionRequestModel, TenantModel
-from app.provisioning.schemas import ActionResponse, ProvisionCallback, StatusResponse
-from app.provisioning.service import get_or_create_tenant, start_step_function_execution
+from app.auth.utils import ROLE_ADMIN, ROLE_DEVELOPER, ROLE_VIEWER, AuthContext, require_roles
+from app.core.cache import cached_json, service_tag
+from app.core.coalescer import WriteBehindCoalescer
+from app.core.config import (
+    CALLBACK_BATCH_MAX,
+    CALLBACK_COALESCE_SECONDS,
+    CALLBACK_TOKEN,
+    HISTORY_PAGE_SIZE_DEFAULT,
+    HISTORY_PAGE_SIZE_MAX,
+    PROVISION_WORKFLOWS_ENABLED,
+)
+from app.core.deps import get_db, get_read_db, run_db
+from app.core.metrics import CALLBACK_ERRORS, CALLBACKS_RECEIVED
+from app.core.serialization import dumps
+from app.db import SessionLocal, versioned_update_by_pk
+from app.idempotency.service import IdempotencyKey, idempotency_key
+from app.events.hub import notify_service_events, provision_status_event, publish_service_event
+from app.overview.service import overview_delta
+from app.provisioning.models import ProvisionRequestModel
+from app.provisioning.schemas import ActionResponse, ProvisionCallback, ProvisionRequestRecord, StatusResponse
+from app.provisioning.service import (
+    action_title,
+    queue_request,
+    running_requests,
+    status_event,
+    tenant_started_detail,
+)
+from app.provisioning.tenants import set_tenant_status, set_tenant_statuses, tenant_registry
 from app.services.models import ServiceModel
+from app.services.routes import NEXT_CURSOR_HEADER
+from app.workflows.admission import admit
+from app.workflows.outbox import dispatcher, enqueue_workflow
+from app.workflows.schemas import CallbackBatchResult, CallbackError, keep_execution_arn
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["provisioning"])
 
 
-def _ensure_service(db: Session, service_id: int) -> ServiceModel:
-    service = db.get(ServiceModel, service_id)
+def _ensure_service(db: Session, service_id: int, lock: bool = False) -> ServiceModel:
+    service = db.get(ServiceModel, service_id, with_for_update=lock)
     if not service:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Service not found")
     return service
 
 
-def _start_provisioning_action(service: ServiceModel, tenant: TenantModel, action: str, db: Session) -> ActionResponse:
-    action_title = "Provisioning" if action == "provision" else "Deprovisioning"
-    service.provision_status = "in_progress"
-    service.provision_detail = f"{action_title} started"
-    tenant.status = "in_progress"
-    tenant.detail = f"{action_title} started"
-
-    request = ProvisionRequestModel(
-        service_id=service.id,
-        tenant=service.tenant,
-        action=action,
-        status="queued",
-        detail=f"{action_title} request queued",
-    )
-    db.add(request)
-    db.commit()
-
-    detail = f"{action_title} queued"
-    req_status = "queued"
-    if STEP_FUNCTION_ARN:
-        try:
-            request.execution_arn = start_step_function_execution(service, tenant, action=action)
-            detail = f"{action_title} started via Step Functions"
-            req_status = "in_progress"
-        except Exception as exc:  # pragma: no cover - integration path
-            service.provision_status = "failed"
-            service.provision_detail = f"{action_title} failed to start: {exc}"
-            tenant.status = "failed"
-            tenant.detail = f"{action_title} failed to start"
-            request.status = "failed"
-            request.detail = "Step Functions start failed"
-            db.commit()
-            return ActionResponse(
-                service_id=service.id,
-                action=action,
-                status="failed",
-                detail=f"Failed to start {action} workflow",
-            )
+def _start_provisioning_action(
+    db: Session, service_id: int, action: str, ctx: AuthContext, idempotency: IdempotencyKey | None = None
+) -> ActionResponse | Response:
+    if idempotency is not None:
+        replay = idempotency.claim(db)
+        if replay is not None:
+            return replay
+    # The row lock serializes actions on one service, so two of them cannot both miss each other's run.
+    service = _ensure_service(db, service_id, lock=True)
+    running = running_requests(db, [service_id]).get(service_id)
+    event = None
+    if running is None:
+        admit(db, ctx, [service])
+        tenant = tenant_registry.ensure(db, service.tenant)
+        request = queue_request(db, service, action)
+        set_tenant_status(db, tenant.id, "in_progress", tenant_started_detail(action))
+        if PROVISION_WORKFLOWS_ENABLED:
+            # The execution is started by the outbox dispatcher once this transaction commits.
+            db.flush()
+            enqueue_workflow(db, "provision", request.id)
+        response = ActionResponse(service_id=service_id, action=action, status="queued", detail=request.detail)
+        event = status_event(service)
+        notify_service_events(db, [event])
+    elif running.action == action:
+        response = ActionResponse(
+            service_id=service_id, action=action, status=running.status, detail=running.detail, coalesced=True
+        )
     else:
-        detail = f"{action_title} queued (Step Functions not configured)"
-
-    service.provision_status = "in_progress"
-    service.provision_detail = detail
-    request.status = req_status
-    request.detail = detail
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"{action_title(running.action)} is already {running.status.replace('_', ' ')} for this service",
+        )
+    if idempotency is not None:
+        idempotency.record(db, status.HTTP_202_ACCEPTED, response)
     db.commit()
-    return ActionResponse(service_id=service.id, action=action, status=req_status, detail=detail)
+    if event is not None:
+        publish_service_event(*event)
+    return response
 
 
-@router.post("/services/{service_id}/actions/provision", response_model=ActionResponse)
-def provision_env(
+@router.post(
+    "/services/{service_id}/actions/provision", response_model=ActionResponse, status_code=status.HTTP_202_ACCEPTED
+)
+async def provision_env(
     service_id: int,
-    _: str = Depends(require_roles(ROLE_ADMIN, ROLE_DEVELOPER)),
+    ctx: AuthContext = Depends(require_roles(ROLE_ADMIN, ROLE_DEVELOPER)),
+    idempotency: IdempotencyKey | None = Depends(idempotency_key),
     db: Session = Depends(get_db),
 ):
-    service = _ensure_service(db, service_id)
-    tenant = get_or_create_tenant(db, service.tenant)
-    return _start_provisioning_action(service, tenant, "provision", db)
+    response = await run_db(db, _start_provisioning_action, service_id, "provision", ctx, idempotency)
+    dispatcher.wake()
+    return response
 
 
-@router.post("/services/{service_id}/actions/deprovision", response_model=ActionResponse)
-def deprovision_env(
+@router.post(
+    "/services/{service_id}/actions/deprovision", response_model=ActionResponse, status_code=status.HTTP_202_ACCEPTED
+)
+async def deprovision_env(
     service_id: int,
-    _: str = Depends(require_roles(ROLE_ADMIN, ROLE_DEVELOPER)),
+    ctx: AuthContext = Depends(require_roles(ROLE_ADMIN, ROLE_DEVELOPER)),
+    idempotency: IdempotencyKey | None = Depends(idempotency_key),
     db: Session = Depends(get_db),
 ):
-    service = _ensure_service(db, service_id)
-    tenant = get_or_create_tenant(db, service.tenant)
-    return _start_provisioning_action(service, tenant, "deprovision", db)
+    response = await run_db(db, _start_provisioning_action, service_id, "deprovision", ctx, idempotency)
+    dispatcher.wake()
+    return response
+
+
+def _view_status(db: Session, service_id: int, environment: str | None) -> bytes:
+    service = db.execute(
+        select(ServiceModel.provision_status, ServiceModel.provision_detail).where(ServiceModel.id == service_id)
+    ).first()
+    if service is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Service not found")
+    env_detail = environment or "default"
+    # Same keys, order and bytes as StatusResponse.
+    return dumps(
+        {
+            "service_id": service_id,
+            "environment": environment,
+            "status": service.provision_status,
+            "detail": service.provision_detail or f"Service healthy in {env_detail}",
+        }
+    )
 
 
 @router.get("/services/{service_id}/actions/status", response_model=StatusResponse)
-def view_status(
+async def view_status(
     service_id: int,
+    request: Request,
     environment: str | None = None,
     _: str = Depends(require_roles(ROLE_ADMIN, ROLE_DEVELOPER, ROLE_VIEWER)),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
-    service = _ensure_service(db, service_id)
-    env_detail = environment or "default"
-    return StatusResponse(
-        service_id=service_id,
-        environment=environment,
-        status=service.provision_status,
-        detail=service.provision_detail or f"Service healthy in {env_detail}",
+    async def build():
+        return await run_db(db, _view_status, service_id, environment), {}
+
+    return await cached_json(request, (service_tag(service_id),), build)
+
+
+def _provision_history(
+    db: Session,
+    service_id: int,
+    filters: dict,
+    created_after: datetime | None,
+    created_before: datetime | None,
+    cursor: int | None,
+    limit: int,
+) -> tuple[list[ProvisionRequestRecord], int | None]:
+    _ensure_service(db, service_id)
+    query = db.query(ProvisionRequestModel).filter(ProvisionRequestModel.service_id == service_id)
+    for column, value in filters.items():
+        if value is not None:
+            query = query.filter(getattr(ProvisionRequestModel, column) == value)
+    if created_after is not None:
+        query = query.filter(ProvisionRequestModel.created_at >= created_after)
+    if created_before is not None:
+        query = query.filter(ProvisionRequestModel.created_at < created_before)
+    if cursor is not None:
+        query = query.filter(ProvisionRequestModel.id < cursor)
+
+    rows = query.order_by(ProvisionRequestModel.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1].id
+    items = [
+        ProvisionRequestRecord(
+            request_id=row.id,
+            service_id=row.service_id,
+            tenant=row.tenant,
+            action=row.action,
+            status=row.status,
+            detail=row.detail,
+            execution_arn=row.execution_arn,
+            batch_id=row.batch_id,
+            created_at=row.created_at,
+        )
+        for row in rows
+    ]
+    return items, next_cursor
+
+
+@router.get("/services/{service_id}/provision-requests", response_model=List[ProvisionRequestRecord])
+async def provision_history(
+    service_id: int,
+    request: Request,
+    limit: int = Query(HISTORY_PAGE_SIZE_DEFAULT, ge=1, le=HISTORY_PAGE_SIZE_MAX),
+    cursor: int | None = Query(None, ge=0, description="Return requests with id lower than this value"),
+    action: str | None = None,
+    status_filter: str | None = Query(None, alias="status"),
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    _: str = Depends(require_roles(ROLE_ADMIN, ROLE_DEVELOPER, ROLE_VIEWER)),
+    db: Session = Depends(get_read_db),
+):
+    filters = {"action": action, "status": status_filter}
+
+    async def build():
+        items, next_cursor = await run_db(
+            db, _provision_history, service_id, filters, created_after, created_before, cursor, limit
+        )
+        return items, {NEXT_CURSOR_HEADER: str(next_cursor)} if next_cursor is not None else {}
+
+    return await cached_json(request, (service_tag(service_id),), build)
+
+
+def _latest_request_ids(db: Session, keys: set[tuple[int, str, str]]) -> dict[tuple[int, str, str], int]:
+    if not keys:
+        return {}
+    columns = (ProvisionRequestModel.service_id, ProvisionRequestModel.tenant, ProvisionRequestModel.action)
+    rows = (
+        db.query(*columns, func.max(ProvisionRequestModel.id))
+        .filter(tuple_(*columns).in_(list(keys)))
+        .group_by(*columns)
+        .all()
     )
+    return {(service_id, tenant, action): request_id for service_id, tenant, action, request_id in rows}
 
 
-@router.post("/provisioning/callback")
-def provisioning_callback(payload: ProvisionCallback, request: Request, db: Session = Depends(get_db)):
+def _callback_services(db: Session, service_ids) -> dict:
+    columns = (
+        ServiceModel.id,
+        ServiceModel.tenant,
+        ServiceModel.owner_team,
+        ServiceModel.provision_status,
+        ServiceModel.version,
+    )
+    return {row.id: row for row in db.execute(select(*columns).where(ServiceModel.id.in_(service_ids)))}
+
+
+def _apply_provisioning_callbacks(db: Session, payloads: list[ProvisionCallback]) -> CallbackBatchResult:
+    result = CallbackBatchResult()
+    current = _callback_services(db, {p.service_id for p in payloads})
+    tenant_ids = {name: info.id for name, info in tenant_registry.lookup_many(db, {p.tenant for p in payloads}).items()}
+    explicit_ids = {p.request_id for p in payloads if p.request_id is not None}
+    request_services = {}
+    if explicit_ids:
+        request_services = dict(
+            db.query(ProvisionRequestModel.id, ProvisionRequestModel.service_id).filter(
+                ProvisionRequestModel.id.in_(explicit_ids)
+            )
+        )
+    latest = _latest_request_ids(db, {(p.service_id, p.tenant, p.action) for p in payloads if p.request_id is None})
+
+    # Keyed by primary key so later updates to the same row replace earlier ones.
+    services: dict[int, dict] = {}
+    tenants: dict[int, tuple[int, str, str]] = {}
+    requests: dict[int, dict] = {}
+    for index, payload in enumerate(payloads):
+        if payload.service_id not in current:
+            result.errors.append(CallbackError(index=index, error="Service not found"))
+            continue
+        if payload.tenant not in tenant_ids:
+            result.errors.append(CallbackError(index=index, error="Tenant not found"))
+            continue
+        if payload.request_id is not None:
+            if request_services.get(payload.request_id) != payload.service_id:
+                result.errors.append(CallbackError(index=index, error="Provision request not found"))
+                continue
+            request_id = payload.request_id
+        else:
+            request_id = latest.get((payload.service_id, payload.tenant, payload.action))
+
+        services[payload.service_id] = {
+            "id": payload.service_id,
+            "provision_status": payload.status,
+            "provision_detail": payload.detail,
+        }
+        tenant_id = tenant_ids[payload.tenant]
+        tenants[tenant_id] = (tenant_id, payload.status, payload.detail)
+        if request_id is not None:
+            values = {"id": request_id, "status": payload.status, "detail": payload.detail}
+            if payload.execution_arn:
+                values["execution_arn"] = payload.execution_arn
+            requests[request_id] = {**requests.get(request_id, {}), **values}
+        result.applied += 1
+
+    # Version-checked: a status another writer set since `current` was read is re-read, so the overview counters
+    # move from the status each callback actually replaced.
+    replaced = versioned_update_by_pk(
+        db, ServiceModel, services, current, lambda service_ids: _callback_services(db, service_ids)
+    )
+    delta = overview_delta(db)
+    for service_id, row in replaced.items():
+        delta.provision(row.tenant, row.owner_team, row.provision_status, services[service_id]["provision_status"])
+    set_tenant_statuses(db, tenants.values())
+    versioned_update_by_pk(db, ProvisionRequestModel, requests)
+    events = [
+        (
+            service_id,
+            row.tenant,
+            provision_status_event(
+                SimpleNamespace(
+                    id=service_id,
+                    provision_status=services[service_id]["provision_status"],
+                    provision_detail=services[service_id]["provision_detail"],
+                )
+            ),
+        )
+        for service_id, row in replaced.items()
+    ]
+    notify_service_events(db, events)
+    db.commit()
+    for event in events:
+        publish_service_event(*event)
+    if result.errors:
+        CALLBACK_ERRORS.inc("provisioning", amount=len(result.errors))
+    return result
+
+
+def _apply_provisioning_callback(db: Session, payload: ProvisionCallback) -> None:
+    result = _apply_provisioning_callbacks(db, [payload])
+    if result.errors:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=result.errors[0].error)
+
+
+def _flush_provisioning_callbacks(payloads: list[ProvisionCallback]) -> None:
+    with SessionLocal() as db:
+        result = _apply_provisioning_callbacks(db, payloads)
+    for error in result.errors:
+        logger.warning("Dropped provisioning callback for service %s: %s", payloads[error.index].service_id, error.error)
+
+
+provisioning_callbacks = WriteBehindCoalescer(
+    "provisioning_callbacks", _flush_provisioning_callbacks, CALLBACK_COALESCE_SECONDS, merge=keep_execution_arn
+)
+
+
+def _callback_key(payload: ProvisionCallback):
+    if payload.request_id is not None:
+        return payload.request_id
+    return payload.service_id, payload.tenant, payload.action
+
+
+def report_provisioning_result(payload: ProvisionCallback) -> None:
+    """Apply a result reported from inside this process (the local workflow backend) like an HTTP callback."""
+    CALLBACKS_RECEIVED.inc("provisioning", "local")
+    if provisioning_callbacks.active:
+        provisioning_callbacks.submit(_callback_key(payload), payload)
+    else:
+        _flush_provisioning_callbacks([payload])
+
+
+def _check_callback_token(request: Request) -> None:
     token = request.headers.get("X-Callback-Token")
     if token != CALLBACK_TOKEN:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid callback token")
 
-    service = db.get(ServiceModel, payload.service_id)
-    if not service:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Service not found")
 
-    tenant = db.query(TenantModel).filter(TenantModel.name == payload.tenant).first()
-    if not tenant:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tenant not found")
-
-    service.provision_status = payload.status
-    service.provision_detail = payload.detail
-    tenant.status = payload.status
-    tenant.detail = payload.detail
-
-    request_row = (
-        db.query(ProvisionRequestModel)
-        .filter(
-            ProvisionRequestModel.service_id == payload.service_id,
-            ProvisionRequestModel.tenant == payload.tenant,
-            ProvisionRequestModel.action == payload.action,
-        )
-        .order_by(ProvisionRequestModel.id.desc())
-        .first()
-    )
-    if request_row:
-        request_row.status = payload.status
-        request_row.detail = payload.detail
-        if payload.execution_arn:
-            request_row.execution_arn = payload.execution_arn
+@router.post("/provisioning/callback")
+async def provisioning_callback(
+    payload: ProvisionCallback, request: Request, response: Response, db: Session = Depends(get_db)
+):
+    _check_callback_token(request)
+    CALLBACKS_RECEIVED.inc("provisioning", "single")
+    if provisioning_callbacks.active:
+        provisioning_callbacks.submit(_callback_key(payload), payload)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {"status": "accepted"}
 
-    db.commit()
+    await run_db(db, _apply_provisioning_callback, payload)
     return {"status": "ok"}
+
+
+@router.post("/provisioning/callbacks:batch", response_model=CallbackBatchResult)
+async def provisioning_callbacks_batch(
+    payloads: List[ProvisionCallback], request: Request, response: Response, db: Session = Depends(get_db)
+):
+    _check_callback_token(request)
+    if len(payloads) > CALLBACK_BATCH_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {CALLBACK_BATCH_MAX} callbacks per batch",
+        )
+    CALLBACKS_RECEIVED.inc("provisioning", "batch", amount=len(payloads))
+    if provisioning_callbacks.active:
+        for payload in payloads:
+            provisioning_callbacks.submit(_callback_key(payload), payload)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return CallbackBatchResult(applied=len(payloads))
+    return await run_db(db, _apply_provisioning_callbacks, payloads)
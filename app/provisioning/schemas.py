@@ -1,6 +1,7 @@
+from datetime import datetime
 from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class ActionResponse(BaseModel):
@@ -8,6 +9,7 @@ class ActionResponse(BaseModel):
     action: str
     status: str
     detail: str
+    coalesced: bool = Field(False, description="True when the request joined a run already queued or in progress")
 
 
 class StatusResponse(BaseModel):
@@ -17,8 +19,21 @@ class StatusResponse(BaseModel):
     detail: str
 
 
+class ProvisionRequestRecord(BaseModel):
+    request_id: int
+    service_id: int
+    tenant: str
+    action: str
+    status: str
+    detail: str
+    execution_arn: Optional[str] = None
+    batch_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+
+
 class ProvisionCallback(BaseModel):
     service_id: int
+    request_id: Optional[int] = None
     tenant: str
     action: str = "provision"
     status: str
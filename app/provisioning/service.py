@@ -1,21 +1,17 @@
-import json
-import re
 import secrets
-from typing import Optional
-
-from app.core.config import AWS_REGION, DEFAULT_BUCKET_PREFIX, STEP_FUNCTION_ARN
-from app.provisioning.models import TenantModel
-from app.services.models import ServiceModel
-
-try:
-    import boto3
-except Exception:  # pragma: no cover - optional dependency for Step Functions
-    boto3 = None
+from typing import Iterable, Optional
 
+from sqlalchemy import func, select, update
 
-def slugify(value: str) -> str:
-    slug = re.sub(r"[^a-z0-9]+", "-", value.lower())
-    return slug.strip("-") or "tenant"
+from app.core.config import PROVISION_WORKFLOWS_ENABLED
+from app.db import update_if_version
+from app.events.hub import provision_status_event
+from app.overview.service import overview_delta
+from app.provisioning.models import ProvisionRequestModel
+from app.provisioning.tenants import TenantInfo, set_tenant_status, tenant_registry, tenant_version
+from app.services.models import ServiceModel
+from app.workflows.backends import workflow_backend
+from app.workflows.coalesce import RUNNING_STATUSES, coalesce_cutoff, is_joinable
 
 
 def generate_tenant_db_password() -> str:
@@ -23,32 +19,9 @@ def generate_tenant_db_password() -> str:
     return secrets.token_urlsafe(24)
 
 
-def get_or_create_tenant(db, tenant_name: str) -> TenantModel:
-    tenant = db.query(TenantModel).filter(TenantModel.name == tenant_name).first()
-    if tenant:
-        return tenant
-    slug = slugify(tenant_name)
-    tenant = TenantModel(
-        name=tenant_name,
-        status="not_requested",
-        detail="",
-        namespace=f"tenant-{slug}",
-        rds_schema=f"tenant_{slug}",
-        s3_bucket=f"{DEFAULT_BUCKET_PREFIX}-{slug}",
-    )
-    db.add(tenant)
-    db.commit()
-    db.refresh(tenant)
-    return tenant
-
-
-def start_step_function_execution(service: ServiceModel, tenant: TenantModel, action: str = "provision") -> Optional[str]:
-    if not STEP_FUNCTION_ARN:
-        return None
-    if not boto3:
-        raise RuntimeError("boto3 not installed")
-
-    client = boto3.client("stepfunctions", region_name=AWS_REGION)
+def build_execution_input(
+    service: ServiceModel, tenant: TenantInfo, action: str = "provision", request_id: Optional[int] = None
+) -> dict:
     tenant_payload = {
         "name": tenant.name,
         "namespace": tenant.namespace,
@@ -58,8 +31,9 @@ def start_step_function_execution(service: ServiceModel, tenant: TenantModel, ac
     if action == "provision":
         tenant_payload["db_password"] = generate_tenant_db_password()
 
-    execution_input = {
+    return {
         "action": action,
+        "request_id": request_id,
         "tenant": {
             **tenant_payload,
         },
@@ -73,5 +47,112 @@ def start_step_function_execution(service: ServiceModel, tenant: TenantModel, ac
             "environments": service.environments,
         },
     }
-    resp = client.start_execution(stateMachineArn=STEP_FUNCTION_ARN, input=json.dumps(execution_input))
-    return resp.get("executionArn")
+
+
+def start_step_function_execution(execution_input: dict, name: Optional[str] = None) -> Optional[str]:
+    # Blocking call (AWS, or the local executor's lock): run it off the event loop.
+    return workflow_backend.start("provision", execution_input, name=name)
+
+
+def action_title(action: str) -> str:
+    return "Provisioning" if action == "provision" else "Deprovisioning"
+
+
+def running_requests(db, service_ids: Iterable[int]) -> dict[int, ProvisionRequestModel]:
+    """service_id -> its latest provision request, for those still queued or in progress and recent enough that
+    a new request for the same action joins them instead of starting another run."""
+    service_ids = list(service_ids)
+    cutoff = coalesce_cutoff()
+    if not service_ids or cutoff is None:
+        return {}
+    latest = (
+        select(func.max(ProvisionRequestModel.id))
+        .where(ProvisionRequestModel.service_id.in_(service_ids))
+        .group_by(ProvisionRequestModel.service_id)
+    )
+    rows = db.scalars(
+        select(ProvisionRequestModel).where(
+            ProvisionRequestModel.id.in_(latest), ProvisionRequestModel.status.in_(RUNNING_STATUSES)
+        )
+    )
+    return {row.service_id: row for row in rows if is_joinable(row.created_at, cutoff)}
+
+
+def queue_request(db, service: ServiceModel, action: str, batch_id: Optional[int] = None) -> ProvisionRequestModel:
+    # The caller records the tenant side once per tenant with set_tenant_status(..., tenant_started_detail(action)).
+    title = action_title(action)
+    detail = f"{title} queued"
+    if not PROVISION_WORKFLOWS_ENABLED:
+        detail = f"{title} queued (Step Functions not configured)"
+
+    overview_delta(db).provision(service.tenant, service.owner_team, service.provision_status, "in_progress")
+    service.provision_status = "in_progress"
+    service.provision_detail = detail
+    # The caller holds the row lock; the bump sends callbacks that read the service before it to re-read it.
+    service.version = ServiceModel.version + 1
+
+    request = ProvisionRequestModel(
+        service_id=service.id,
+        tenant=service.tenant,
+        action=action,
+        status="queued",
+        detail=detail,
+        batch_id=batch_id,
+    )
+    db.add(request)
+    return request
+
+
+def tenant_started_detail(action: str) -> str:
+    return f"{action_title(action)} started"
+
+
+def status_event(service: ServiceModel) -> tuple[int, str, dict]:
+    # Captured before commit so publishing does not trigger a refresh of expired attributes.
+    return service.id, service.tenant, provision_status_event(service)
+
+
+def _set_request_status(db, request: ProvisionRequestModel, status: str, service_detail: str, tenant_detail: str):
+    service = db.get(ServiceModel, request.service_id)
+    tenant = tenant_registry.lookup(db, request.tenant)
+    if tenant:
+        # A callback that lands between the read and the write carries newer state, so the update yields to it.
+        version = tenant_version(db, tenant.id)
+        if version is not None:
+            set_tenant_status(db, tenant.id, status, tenant_detail, expected_version=version)
+    if not service:
+        return None
+    previous = service.provision_status
+    # Same for the service, against the version it was loaded at.
+    if not update_if_version(db, service, provision_status=status, provision_detail=service_detail):
+        return None
+    overview_delta(db).provision(service.tenant, service.owner_team, previous, status)
+    return status_event(service)
+
+
+def _set_request_fields(db, request: ProvisionRequestModel, **values) -> bool:
+    # Yields to a callback that moved the request on since it was read, keeping only which execution it was.
+    if update_if_version(db, request, **values):
+        return True
+    if values.get("execution_arn"):
+        db.execute(
+            update(ProvisionRequestModel)
+            .where(ProvisionRequestModel.id == request.id, ProvisionRequestModel.execution_arn.is_(None))
+            .values(execution_arn=values["execution_arn"])
+        )
+    return False
+
+
+def mark_request_started(db, request: ProvisionRequestModel, execution_arn: str) -> Optional[tuple[int, str, dict]]:
+    title = action_title(request.action)
+    detail = f"{title} started via {workflow_backend.label}"
+    if not _set_request_fields(db, request, execution_arn=execution_arn, status="in_progress", detail=detail):
+        return None
+    return _set_request_status(db, request, "in_progress", detail, f"{title} started")
+
+
+def mark_request_failed(db, request: ProvisionRequestModel, error: Exception | str) -> Optional[tuple[int, str, dict]]:
+    title = action_title(request.action)
+    if not _set_request_fields(db, request, status="failed", detail="Step Functions start failed"):
+        return None
+    return _set_request_status(db, request, "failed", f"{title} failed to start: {error}", f"{title} failed to start")
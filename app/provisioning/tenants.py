@@ -0,0 +1,158 @@
+import re
+import threading
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import DEFAULT_BUCKET_PREFIX
+from app.core.invalidation import register_resync
+from app.db import dialect_insert, versioned_update_by_pk
+from app.provisioning.models import TenantModel
+
+_PENDING_KEY = "pending_tenants"
+
+
+def slugify(value: str) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "-", value.lower())
+    return slug.strip("-") or "tenant"
+
+
+@dataclass(frozen=True)
+class TenantInfo:
+    # The columns that never change after a tenant is created; status/detail always come from the database.
+    id: int
+    name: str
+    namespace: str
+    rds_schema: str
+    s3_bucket: str
+
+
+def _tenant_columns(name: str) -> dict:
+    slug = slugify(name)
+    return {
+        "name": name,
+        "status": "not_requested",
+        "detail": "",
+        "namespace": f"tenant-{slug}",
+        "rds_schema": f"tenant_{slug}",
+        "s3_bucket": f"{DEFAULT_BUCKET_PREFIX}-{slug}",
+    }
+
+
+_INFO_COLUMNS = (TenantModel.id, TenantModel.name, TenantModel.namespace, TenantModel.rds_schema, TenantModel.s3_bucket)
+
+
+class TenantRegistry:
+    """Process-local map of tenant name -> TenantInfo so action paths skip the tenants lookup."""
+
+    def __init__(self):
+        self._tenants: dict[str, TenantInfo] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Optional[TenantInfo]:
+        return self._tenants.get(name)
+
+    def remember(self, info: TenantInfo) -> None:
+        with self._lock:
+            self._tenants[info.name] = info
+
+    def discard(self, name: str) -> None:
+        with self._lock:
+            self._tenants.pop(name, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tenants.clear()
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+    def lookup_many(self, db, names: Iterable[str]) -> dict[str, TenantInfo]:
+        """Known tenants only: registry hits plus one SELECT for the rest; never creates rows."""
+        found, missing = self._split(names)
+        if missing:
+            for row in db.execute(select(*_INFO_COLUMNS).where(TenantModel.name.in_(missing))):
+                found[row.name] = self._committed(row)
+        return found
+
+    def lookup(self, db, name: str) -> Optional[TenantInfo]:
+        return self.lookup_many(db, [name]).get(name)
+
+    def ensure_many(self, db, names: Iterable[str]) -> dict[str, TenantInfo]:
+        """Resolve tenants, creating missing ones with INSERT ... ON CONFLICT (name) DO NOTHING RETURNING."""
+        found, missing = self._split(names)
+        if not missing:
+            return found
+        stmt = dialect_insert(db, TenantModel).values([_tenant_columns(name) for name in sorted(missing)])
+        stmt = stmt.on_conflict_do_nothing(index_elements=[TenantModel.name]).returning(*_INFO_COLUMNS)
+        pending = db.info.setdefault(_PENDING_KEY, [])
+        for row in db.execute(stmt):
+            info = TenantInfo(row.id, row.name, row.namespace, row.rds_schema, row.s3_bucket)
+            found[info.name] = info
+            # Only registered once our transaction commits; a rollback takes the row with it.
+            pending.append(info)
+        # Conflicting names already exist (ON CONFLICT waits for the other inserter to commit).
+        conflicted = missing - found.keys()
+        if conflicted:
+            found.update(self.lookup_many(db, conflicted))
+        return found
+
+    def ensure(self, db, name: str) -> TenantInfo:
+        return self.ensure_many(db, [name])[name]
+
+    def _split(self, names: Iterable[str]) -> tuple[dict[str, TenantInfo], set[str]]:
+        found, missing = {}, set()
+        for name in names:
+            info = self._tenants.get(name)
+            if info is None:
+                missing.add(name)
+            else:
+                found[name] = info
+        return found, missing
+
+    def _committed(self, row) -> TenantInfo:
+        info = TenantInfo(row.id, row.name, row.namespace, row.rds_schema, row.s3_bucket)
+        self.remember(info)
+        return info
+
+
+tenant_registry = TenantRegistry()
+# Entries never change once a tenant exists, so there is nothing to invalidate per write; start over after a gap.
+register_resync(tenant_registry.clear)
+
+
+@event.listens_for(Session, "after_commit")
+def _register_created_tenants(session) -> None:
+    for info in session.info.pop(_PENDING_KEY, ()):
+        tenant_registry.remember(info)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_created_tenants(session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def set_tenant_status(
+    db, tenant_id: int, status: str, detail: str, expected_version: Optional[int] = None
+) -> bool:
+    """Write status/detail and bump `version`. With `expected_version` the write only lands if no
+    other writer got there first; returns whether the row was updated."""
+    stmt = update(TenantModel.__table__).where(TenantModel.id == tenant_id)
+    if expected_version is not None:
+        stmt = stmt.where(TenantModel.version == expected_version)
+    result = db.execute(stmt.values(status=status, detail=detail, version=TenantModel.version + 1))
+    return result.rowcount == 1
+
+
+def set_tenant_statuses(db, updates: Iterable[tuple[int, str, str]]) -> None:
+    """Bulk form of set_tenant_status for (tenant_id, status, detail) triples. The writes are version-checked; one
+    that races another writer is re-read and applied again on top of it."""
+    rows = {tenant_id: {"status": status, "detail": detail} for tenant_id, status, detail in updates}
+    if rows:
+        versioned_update_by_pk(db, TenantModel, rows)
+
+
+def tenant_version(db, tenant_id: int) -> Optional[int]:
+    return db.execute(select(TenantModel.version).where(TenantModel.id == tenant_id)).scalar()
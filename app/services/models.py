@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, DateTime, Integer, String, func
+from sqlalchemy import JSON, Boolean, Column, DateTime, Index, Integer, String, func, literal_column
 from sqlalchemy.dialects.postgresql import JSONB
 
 from app.db import Base
@@ -6,6 +6,14 @@ from app.db import Base
 
 class ServiceModel(Base):
     __tablename__ = "services"
+    # Composite (filter, id) indexes serve the keyset-paginated, filtered catalog listing.
+    __table_args__ = (
+        Index("ix_services_tenant_id", "tenant", "id"),
+        Index("ix_services_owner_team_id", "owner_team", "id"),
+        Index("ix_services_runtime_id", "runtime", "id"),
+        Index("ix_services_tier_id", "tier", "id"),
+        Index("ix_services_provision_status_id", "provision_status", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -13,9 +21,35 @@ class ServiceModel(Base):
     owner_team = Column(String, nullable=False)
     runtime = Column(String, nullable=False)
     tier = Column(String, nullable=False)
-    environments = Column(JSONB, nullable=False, default=list)
+    # JSONB on Postgres, plain JSON elsewhere (SQLite for dev and the benchmarks).
+    environments = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=False, default=list)
     tenant = Column(String, nullable=False, index=True)
     observability_enabled = Column(Boolean, nullable=False, default=False)
     provision_status = Column(String, nullable=False, default="not_requested")
     provision_detail = Column(String, nullable=False, default="")
+    # Bumped on every provision_status write; callbacks and the outbox update conditionally on it (see app.db).
+    version = Column(Integer, nullable=False, default=0, server_default="0")
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+# Lower-cased text that /services/search matches against. The separator is a literal (not a bind parameter) so
+# queries render the exact expression of the trigram index below and the planner can use it.
+_SEARCH_SEPARATOR = literal_column("' '")
+SEARCH_DOCUMENT = func.lower(
+    ServiceModel.name
+    + _SEARCH_SEPARATOR
+    + ServiceModel.owner_team
+    + _SEARCH_SEPARATOR
+    + ServiceModel.tenant
+    + _SEARCH_SEPARATOR
+    + ServiceModel.repo_url
+)
+
+# GiST rather than GIN: it can return rows in word-similarity order (KNN). Needs the pg_trgm extension; other
+# databases search through the in-process index in app.services.search.
+Index(
+    "ix_services_search_trgm",
+    SEARCH_DOCUMENT.label("search_document"),
+    postgresql_using="gist",
+    postgresql_ops={"search_document": "gist_trgm_ops"},
+).ddl_if(dialect="postgresql")
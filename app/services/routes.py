@@ -1,30 +1,81 @@
+import json
 from typing import List
 from urllib.parse import quote_plus
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
 from app.auth.utils import ROLE_ADMIN, ROLE_DEVELOPER, ROLE_VIEWER, require_roles
+from app.core.cache import (
+    SERVICES_TAG,
+    cached_json,
+    invalidate_service,
+    notify_service,
+    notify_tags,
+    response_cache,
+    service_tag,
+)
 from app.core.config import (
     OBSERVABILITY_GRAFANA_DASHBOARD_UID,
     OBSERVABILITY_GRAFANA_ORG_ID,
     OBSERVABILITY_GRAFANA_URL,
+    SERVICES_BULK_CHUNK_SIZE,
+    SERVICES_BULK_MAX_ERRORS,
+    SERVICES_EXPORT_BATCH_SIZE,
+    SERVICES_PAGE_SIZE_DEFAULT,
+    SERVICES_PAGE_SIZE_MAX,
+    SERVICES_SEARCH_MAX_RESULTS,
+    SERVICES_SEARCH_PAGE_SIZE_DEFAULT,
 )
-from app.core.deps import get_db
+from app.core.deps import get_db, get_read_db, run_db
+from app.core.serialization import dumps
+from app.db import DB_ASYNC, AsyncSessionLocal, SessionLocal, dialect_insert
+from app.overview.service import latest_deployments, overview_delta
 from app.services.models import ServiceModel
-from app.services.schemas import Service, ServiceInput
+from app.services.schemas import BulkImportResult, BulkLineError, Service, ServiceInput
+from app.services.search import normalize_query, search_index, search_postgres
 
 router = APIRouter(prefix="/services", tags=["services"])
 
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Columns each response field is derived from; used to narrow the SELECT for `fields=` projections.
+_FIELD_COLUMNS = {
+    "id": ("id",),
+    "name": ("name",),
+    "repo_url": ("repo_url",),
+    "owner_team": ("owner_team",),
+    "runtime": ("runtime",),
+    "tier": ("tier",),
+    "environments": ("environments",),
+    "tenant": ("tenant",),
+    "observability_enabled": ("observability_enabled",),
+    "observability_dashboard_url": ("observability_enabled", "name"),
+    "provision_status": ("provision_status",),
+    "provision_detail": ("provision_detail",),
+}
+
+
+_DASHBOARD_URL_PREFIX = (
+    f"{OBSERVABILITY_GRAFANA_URL}/d/{OBSERVABILITY_GRAFANA_DASHBOARD_UID}"
+    f"?orgId={OBSERVABILITY_GRAFANA_ORG_ID}&var-service="
+    if OBSERVABILITY_GRAFANA_URL
+    else None
+)
+
+
+def _dashboard_url(row) -> str | None:
+    if not (row.observability_enabled and _DASHBOARD_URL_PREFIX):
+        return None
+    return f"{_DASHBOARD_URL_PREFIX}{quote_plus(row.name)}&refresh=10s"
+
 
 def _model_to_payload(row: ServiceModel) -> dict:
-    dashboard_url = None
-    if row.observability_enabled and OBSERVABILITY_GRAFANA_URL:
-        service_var = quote_plus(row.name)
-        dashboard_url = (
-            f"{OBSERVABILITY_GRAFANA_URL}/d/{OBSERVABILITY_GRAFANA_DASHBOARD_UID}"
-            f"?orgId={OBSERVABILITY_GRAFANA_ORG_ID}&var-service={service_var}&refresh=10s"
-        )
+    dashboard_url = _dashboard_url(row)
     return {
         "name": row.name,
         "repo_url": row.repo_url,
@@ -40,6 +91,30 @@ def _model_to_payload(row: ServiceModel) -> dict:
     }
 
 
+# Fast read path: plain column tuples straight to JSON, skipping ORM identity tracking and pydantic validation.
+# Keys follow Service's field order, so the bytes match what the Service response model produced.
+_SERVICE_COLUMNS = tuple(
+    getattr(ServiceModel, name) for name in _FIELD_COLUMNS if name != "observability_dashboard_url"
+)
+
+
+def _service_item(row) -> dict:
+    return {
+        "name": row.name,
+        "repo_url": row.repo_url,
+        "owner_team": row.owner_team,
+        "runtime": row.runtime,
+        "tier": row.tier,
+        "environments": row.environments or [],
+        "tenant": row.tenant,
+        "observability_enabled": row.observability_enabled,
+        "id": row.id,
+        "provision_status": row.provision_status,
+        "provision_detail": row.provision_detail,
+        "observability_dashboard_url": _dashboard_url(row),
+    }
+
+
 def _apply_payload(row: ServiceModel, payload: ServiceInput) -> None:
     row.name = payload.name
     row.repo_url = payload.repo_url
@@ -51,69 +126,433 @@ def _apply_payload(row: ServiceModel, payload: ServiceInput) -> None:
     row.observability_enabled = payload.observability_enabled
 
 
+def _parse_fields(fields: str | None) -> list[str] | None:
+    if not fields:
+        return None
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in _FIELD_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown fields: {', '.join(unknown)}")
+    return ["id"] + [name for name in dict.fromkeys(requested) if name != "id"]
+
+
+def _project_row(row, fields: list[str]) -> dict:
+    item = {}
+    for name in fields:
+        if name == "observability_dashboard_url":
+            item[name] = _dashboard_url(row)
+        elif name == "environments":
+            item[name] = row.environments or []
+        else:
+            item[name] = getattr(row, name)
+    return item
+
+
+def _apply_filters(query, filters: dict):
+    for column, value in filters.items():
+        if value is not None:
+            query = query.where(getattr(ServiceModel, column) == value)
+    return query
+
+
+def _list_services(
+    db: Session, projection: list[str] | None, filters: dict, cursor: int | None, limit: int
+) -> tuple[bytes, int | None]:
+    if projection is None:
+        columns = _SERVICE_COLUMNS
+    else:
+        column_names = dict.fromkeys(col for name in projection for col in _FIELD_COLUMNS[name])
+        columns = tuple(getattr(ServiceModel, col) for col in column_names)
+
+    query = _apply_filters(select(*columns), filters)
+    if cursor is not None:
+        query = query.where(ServiceModel.id > cursor)
+
+    # Fetch one extra row to learn whether another page exists without a COUNT.
+    rows = db.execute(query.order_by(ServiceModel.id.asc()).limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1].id
+
+    if projection is not None:
+        return dumps([_project_row(row, projection) for row in rows]), next_cursor
+    return dumps([_service_item(row) for row in rows]), next_cursor
+
+
 @router.get("", response_model=List[Service])
-def list_services(
+async def list_services(
+    request: Request,
+    limit: int = Query(SERVICES_PAGE_SIZE_DEFAULT, ge=1, le=SERVICES_PAGE_SIZE_MAX),
+    cursor: int | None = Query(None, ge=0, description="Return services with id greater than this value"),
+    tenant: str | None = None,
+    owner_team: str | None = None,
+    runtime: str | None = None,
+    tier: str | None = None,
+    provision_status: str | None = None,
+    fields: str | None = Query(None, description="Comma-separated subset of Service fields; id is always included"),
     _: str = Depends(require_roles(ROLE_ADMIN, ROLE_DEVELOPER, ROLE_VIEWER)),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
-    rows = db.query(ServiceModel).order_by(ServiceModel.id.asc()).all()
-    return [Service(id=row.id, **_model_to_payload(row)) for row in rows]
+    projection = _parse_fields(fields)
+    filters = {
+        "tenant": tenant,
+        "owner_team": owner_team,
+        "runtime": runtime,
+        "tier": tier,
+        "provision_status": provision_status,
+    }
 
+    async def build():
+        items, next_cursor = await run_db(db, _list_services, projection, filters, cursor, limit)
+        return items, {NEXT_CURSOR_HEADER: str(next_cursor)} if next_cursor is not None else {}
 
-@router.post("", response_model=Service, status_code=status.HTTP_201_CREATED)
-def create_service(
-    payload: ServiceInput,
+    return await cached_json(request, (SERVICES_TAG,), build)
+
+
+_SERVICE_INPUT_FIELDS = tuple(ServiceInput.model_fields)
+
+
+def _parse_bulk_line(raw: bytes) -> dict:
+    try:
+        data = json.loads(raw)
+    except ValueError as exc:
+        raise ValueError(f"Invalid JSON: {exc}") from None
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    service_id = data.pop("id", None)
+    if service_id is not None and (type(service_id) is not int or service_id < 1):
+        raise ValueError("id must be a positive integer")
+    try:
+        payload = ServiceInput.model_validate(data)
+    except ValidationError as exc:
+        raise ValueError(
+            "; ".join(f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in exc.errors())
+        ) from None
+    row = payload.model_dump()
+    if service_id is not None:
+        row["id"] = service_id
+    return row
+
+
+# The columns a service's overview counters are keyed and bucketed by.
+_COUNTED_COLUMNS = (
+    ServiceModel.id,
+    ServiceModel.tenant,
+    ServiceModel.owner_team,
+    ServiceModel.provision_status,
+    ServiceModel.observability_enabled,
+)
+
+
+def _count_upserts(db: Session, rows: list[dict], existing: dict) -> None:
+    delta = overview_delta(db)
+    # Deployments only move between counters when the service changes tenant or team.
+    regrouped = [
+        row["id"]
+        for row in rows
+        if row["id"] in existing
+        and (existing[row["id"]].tenant, existing[row["id"]].owner_team) != (row["tenant"], row["owner_team"])
+    ]
+    deployments = latest_deployments(db, regrouped)
+    for row in rows:
+        old = existing.get(row["id"])
+        if old is None:
+            delta.service(row["tenant"], row["owner_team"], "not_requested", row["observability_enabled"])
+            continue
+        moved = deployments.get(row["id"])
+        delta.service(old.tenant, old.owner_team, old.provision_status, old.observability_enabled, moved, sign=-1)
+        delta.service(row["tenant"], row["owner_team"], old.provision_status, row["observability_enabled"], moved)
+
+
+def _upsert_chunk(db: Session, rows: list[dict]) -> tuple[int, int, str | None]:
+    # Later lines win when the same id appears twice in one chunk; ON CONFLICT cannot touch a row twice.
+    with_id = list({row["id"]: row for row in rows if "id" in row}.values())
+    without_id = [row for row in rows if "id" not in row]
+    defaults = {"provision_status": "not_requested", "provision_detail": ""}
+    try:
+        existing = {}
+        if with_id:
+            ids = [row["id"] for row in with_id]
+            existing = {
+                row.id: row
+                for row in db.execute(select(*_COUNTED_COLUMNS).where(ServiceModel.id.in_(ids)).with_for_update())
+            }
+            _count_upserts(db, with_id, existing)
+            stmt = dialect_insert(db, ServiceModel)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[ServiceModel.id],
+                set_={**{name: stmt.excluded[name] for name in _SERVICE_INPUT_FIELDS}, "updated_at": func.now()},
+            )
+            db.execute(stmt, [{**defaults, **row} for row in with_id])
+            if db.get_bind().dialect.name == "postgresql":
+                # Explicit ids bypass the sequence; move it past them so later plain inserts don't collide.
+                db.execute(text("SELECT setval(pg_get_serial_sequence('services', 'id'), (SELECT MAX(id) FROM services))"))
+        if without_id:
+            db.execute(insert(ServiceModel), [{**defaults, **row} for row in without_id])
+            delta = overview_delta(db)
+            for row in without_id:
+                delta.service(row["tenant"], row["owner_team"], "not_requested", row["observability_enabled"])
+        notify_tags(db, SERVICES_TAG, *(service_tag(row["id"]) for row in with_id))
+        db.commit()
+    except SQLAlchemyError as exc:
+        db.rollback()
+        return 0, 0, str(exc.orig if getattr(exc, "orig", None) is not None else exc).splitlines()[0]
+    response_cache.invalidate(SERVICES_TAG, *(service_tag(row["id"]) for row in with_id))
+    search_index.invalidate()
+    created = len(without_id) + len(with_id) - len(existing)
+    return created, len(rows) - created, None
+
+
+async def _request_lines(request: Request):
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+def _export_line(row) -> str:
+    return json.dumps({"id": row.id, **_model_to_payload(row)}) + "\n"
+
+
+def _export_statement(filters: dict):
+    stmt = select(*ServiceModel.__table__.columns).order_by(ServiceModel.id.asc())
+    return _apply_filters(stmt, filters).execution_options(yield_per=SERVICES_EXPORT_BATCH_SIZE)
+
+
+def _export_sync(filters: dict):
+    # Own session: the request-scoped one is closed before the body streams.
+    with SessionLocal() as db:
+        for partition in db.execute(_export_statement(filters)).partitions():
+            yield "".join(_export_line(row) for row in partition)
+
+
+async def _export_async(filters: dict):
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(_export_statement(filters))
+        async for partition in result.partitions():
+            yield "".join(_export_line(row) for row in partition)
+
+
+@router.post(":bulk", response_model=BulkImportResult)
+async def bulk_import_services(
+    request: Request,
     _: str = Depends(require_roles(ROLE_ADMIN)),
     db: Session = Depends(get_db),
 ):
+    """Upsert services from an NDJSON body; rows with an `id` update in place, others are created."""
+    result = BulkImportResult()
+
+    def record_error(line: int, error: str) -> None:
+        result.failed += 1
+        if len(result.errors) < SERVICES_BULK_MAX_ERRORS:
+            result.errors.append(BulkLineError(line=line, error=error))
+
+    chunk: list[dict] = []
+    chunk_lines: list[int] = []
+
+    async def flush() -> None:
+        created, updated, error = await run_db(db, _upsert_chunk, chunk)
+        if error is not None:
+            for line in chunk_lines:
+                record_error(line, error)
+        result.created += created
+        result.updated += updated
+        chunk.clear()
+        chunk_lines.clear()
+
+    line_number = 0
+    async for raw in _request_lines(request):
+        line_number += 1
+        if not raw.strip():
+            continue
+        try:
+            chunk.append(_parse_bulk_line(raw))
+        except ValueError as exc:
+            record_error(line_number, str(exc))
+            continue
+        chunk_lines.append(line_number)
+        if len(chunk) >= SERVICES_BULK_CHUNK_SIZE:
+            await flush()
+    if chunk:
+        await flush()
+    return result
+
+
+@router.get(":export")
+async def export_services(
+    tenant: str | None = None,
+    owner_team: str | None = None,
+    runtime: str | None = None,
+    tier: str | None = None,
+    provision_status: str | None = None,
+    _: str = Depends(require_roles(ROLE_ADMIN, ROLE_DEVELOPER, ROLE_VIEWER)),
+):
+    """Stream the catalog as NDJSON in id order, one Service object per line."""
+    filters = {
+        "tenant": tenant,
+        "owner_team": owner_team,
+        "runtime": runtime,
+        "tier": tier,
+        "provision_status": provision_status,
+    }
+    body = _export_async(filters) if DB_ASYNC else _export_sync(filters)
+    return StreamingResponse(body, media_type="application/x-ndjson")
+
+
+def _search_services(db: Session, q: str, offset: int, limit: int) -> tuple[bytes, int | None]:
+    query = normalize_query(q)
+    fetch = min(limit + 1, SERVICES_SEARCH_MAX_RESULTS - offset)
+    if not query or fetch <= 0:
+        return dumps([]), None
+    if db.get_bind().dialect.name == "postgresql":
+        rows = search_postgres(db, query, _SERVICE_COLUMNS, offset, fetch)
+    else:
+        ids = search_index.search(db, query, offset, fetch)
+        found = {row.id: row for row in db.execute(select(*_SERVICE_COLUMNS).where(ServiceModel.id.in_(ids)))}
+        rows = [found[service_id] for service_id in ids if service_id in found]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = offset + limit
+    return dumps([_service_item(row) for row in rows]), next_cursor
+
+
+@router.get("/search", response_model=List[Service])
+async def search_services(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200, description="Matched against name, owner_team, tenant, repo_url"),
+    limit: int = Query(SERVICES_SEARCH_PAGE_SIZE_DEFAULT, ge=1, le=SERVICES_PAGE_SIZE_MAX),
+    cursor: int = Query(0, ge=0, description="Value of the previous page's X-Next-Cursor header"),
+    _: str = Depends(require_roles(ROLE_ADMIN, ROLE_DEVELOPER, ROLE_VIEWER)),
+    db: Session = Depends(get_read_db),
+):
+    """Best matches first, by trigram word similarity to the name, owner team, tenant and repo URL, so word
+    prefixes and small typos match too. There is no separate prefix or substring tier."""
+
+    async def build():
+        items, next_cursor = await run_db(db, _search_services, q, cursor, limit)
+        return items, {NEXT_CURSOR_HEADER: str(next_cursor)} if next_cursor is not None else {}
+
+    return await cached_json(request, (SERVICES_TAG,), build)
+
+
+def _index_for_search(row: ServiceModel) -> None:
+    search_index.put(row.id, row.name, row.owner_team, row.tenant, row.repo_url)
+
+
+def _get_row(db: Session, service_id: int) -> ServiceModel:
+    row = db.get(ServiceModel, service_id)
+    if not row:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Service not found")
+    return row
+
+
+def _create_service(db: Session, payload: ServiceInput) -> Service:
     row = ServiceModel(
         **payload.dict(),
         provision_status="not_requested",
         provision_detail="",
     )
     db.add(row)
+    overview_delta(db).service(row.tenant, row.owner_team, row.provision_status, row.observability_enabled)
+    notify_tags(db, SERVICES_TAG)
+    db.commit()
+    response_cache.invalidate(SERVICES_TAG)
+    db.refresh(row)
+    _index_for_search(row)
+    return Service(id=row.id, **_model_to_payload(row))
+
+
+def _get_service(db: Session, service_id: int) -> bytes:
+    row = db.execute(select(*_SERVICE_COLUMNS).where(ServiceModel.id == service_id)).first()
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Service not found")
+    return dumps(_service_item(row))
+
+
+def _update_service(db: Session, service_id: int, payload: ServiceInput) -> Service:
+    row = _get_row(db, service_id)
+    old_tenant, old_team, old_observability = row.tenant, row.owner_team, row.observability_enabled
+    _apply_payload(row, payload)
+    if (old_tenant, old_team, old_observability) != (row.tenant, row.owner_team, row.observability_enabled):
+        moved = None
+        if (old_tenant, old_team) != (row.tenant, row.owner_team):
+            moved = latest_deployments(db, [service_id]).get(service_id)
+        delta = overview_delta(db)
+        delta.service(old_tenant, old_team, row.provision_status, old_observability, moved, sign=-1)
+        delta.service(row.tenant, row.owner_team, row.provision_status, row.observability_enabled, moved)
+    notify_service(db, service_id)
     db.commit()
+    invalidate_service(service_id)
     db.refresh(row)
+    _index_for_search(row)
     return Service(id=row.id, **_model_to_payload(row))
 
 
+def _delete_service(db: Session, service_id: int) -> None:
+    row = _get_row(db, service_id)
+    overview_delta(db).service(
+        row.tenant,
+        row.owner_team,
+        row.provision_status,
+        row.observability_enabled,
+        latest_deployments(db, [service_id]).get(service_id),
+        sign=-1,
+    )
+    db.delete(row)
+    notify_service(db, service_id)
+    db.commit()
+    invalidate_service(service_id)
+    search_index.remove(service_id)
+
+
+@router.post("", response_model=Service, status_code=status.HTTP_201_CREATED)
+async def create_service(
+    payload: ServiceInput,
+    _: str = Depends(require_roles(ROLE_ADMIN)),
+    db: Session = Depends(get_db),
+):
+    return await run_db(db, _create_service, payload)
+
+
+@router.get(":cache-stats")
+async def cache_stats(_: str = Depends(require_roles(ROLE_ADMIN))):
+    return response_cache.stats()
+
+
 @router.get("/{service_id}", response_model=Service)
-def get_service(
+async def get_service(
     service_id: int,
+    request: Request,
     _: str = Depends(require_roles(ROLE_ADMIN, ROLE_DEVELOPER, ROLE_VIEWER)),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
-    row = db.get(ServiceModel, service_id)
-    if not row:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Service not found")
-    return Service(id=row.id, **_model_to_payload(row))
+    async def build():
+        return await run_db(db, _get_service, service_id), {}
+
+    return await cached_json(request, (service_tag(service_id),), build)
 
 
 @router.put("/{service_id}", response_model=Service)
-def update_service(
+async def update_service(
     service_id: int,
     payload: ServiceInput,
     _: str = Depends(require_roles(ROLE_ADMIN)),
     db: Session = Depends(get_db),
 ):
-    row = db.get(ServiceModel, service_id)
-    if not row:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Service not found")
-    _apply_payload(row, payload)
-    db.commit()
-    db.refresh(row)
-    return Service(id=row.id, **_model_to_payload(row))
+    return await run_db(db, _update_service, service_id, payload)
 
 
 @router.delete("/{service_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_service(
+async def delete_service(
     service_id: int,
     _: str = Depends(require_roles(ROLE_ADMIN)),
     db: Session = Depends(get_db),
 ):
-    row = db.get(ServiceModel, service_id)
-    if not row:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Service not found")
-    db.delete(row)
-    db.commit()
+    await run_db(db, _delete_service, service_id)
     return None
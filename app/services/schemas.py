@@ -19,3 +19,15 @@ class Service(ServiceInput):
     provision_status: str
     provision_detail: str
     observability_dashboard_url: Optional[str] = None
+
+
+class BulkLineError(BaseModel):
+    line: int
+    error: str
+
+
+class BulkImportResult(BaseModel):
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[BulkLineError] = Field(default_factory=list)
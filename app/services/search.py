@@ -0,0 +1,173 @@
+import heapq
+import re
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.orm import Session
+
+from app.core.config import SERVICES_SEARCH_INDEX_TTL_SECONDS, SERVICES_SEARCH_SIMILARITY
+from app.services.models import SEARCH_DOCUMENT, ServiceModel
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize_query(value: str) -> str:
+    return " ".join(value.lower().split())
+
+
+def trigrams(text: str) -> set[str]:
+    """pg_trgm's trigram set: every alphanumeric word padded with two spaces in front and one behind."""
+    grams = set()
+    for word in _WORD.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def search_postgres(db: Session, query: str, columns, offset: int, limit: int) -> list:
+    """One page ordered by pg_trgm word similarity to `query` (normalized), best first.
+
+    `<<->` is the word-similarity distance; the GiST index returns rows in that order (KNN), so a page costs
+    about offset + limit index probes however many services match.
+    """
+    # Transaction-local; `<%` keeps rows whose word similarity reaches this threshold.
+    db.execute(select(func.set_config("pg_trgm.word_similarity_threshold", str(SERVICES_SEARCH_SIMILARITY), True)))
+    term = literal(query)
+    stmt = (
+        select(*columns)
+        .where(term.op("<%")(SEARCH_DOCUMENT))
+        .order_by(term.op("<<->")(SEARCH_DOCUMENT), ServiceModel.id.asc())
+        .offset(offset)
+        .limit(limit)
+    )
+    return db.execute(stmt).all()
+
+
+class ServiceSearchIndex:
+    """In-process trigram index for databases without pg_trgm, ranked like search_postgres.
+
+    Loaded on first use and reloaded after `ttl` seconds, which bounds how long other workers' writes stay
+    invisible; writes made through this process are applied as they commit.
+    """
+
+    def __init__(self, ttl: float = SERVICES_SEARCH_INDEX_TTL_SECONDS):
+        self.ttl = ttl
+        self._documents: dict[int, str] = {}
+        self._postings: dict[str, set[int]] = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._loaded_at: float | None = None
+        self._generation = 0
+
+    def _expired(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._loaded_at = None
+
+    def put(self, service_id: int, name: str, owner_team: str, tenant: str, repo_url: str) -> None:
+        with self._lock:
+            self._generation += 1
+            if self._loaded_at is not None:
+                self._remove(service_id)
+                self._add(service_id, name, owner_team, tenant, repo_url)
+
+    def remove(self, service_id: int) -> None:
+        with self._lock:
+            self._generation += 1
+            self._remove(service_id)
+
+    def _add(self, service_id: int, name: str, owner_team: str, tenant: str, repo_url: str) -> None:
+        # Same text as SEARCH_DOCUMENT, lower-cased here so it matches the Python-normalized query exactly.
+        document = f"{name} {owner_team} {tenant} {repo_url}".lower()
+        self._documents[service_id] = document
+        for gram in trigrams(document):
+            self._postings.setdefault(gram, set()).add(service_id)
+
+    def _remove(self, service_id: int) -> None:
+        document = self._documents.pop(service_id, None)
+        if document is None:
+            return
+        for gram in trigrams(document):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(service_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def _load(self, db: Session) -> None:
+        generation = self._generation
+        columns = (ServiceModel.id, ServiceModel.name, ServiceModel.owner_team, ServiceModel.tenant, ServiceModel.repo_url)
+        rows = db.execute(select(*columns)).all()
+        with self._lock:
+            self._documents, self._postings = {}, {}
+            for row in rows:
+                self._add(*row)
+            # A write landed while loading and may be missing from this snapshot; load again next time.
+            self._loaded_at = time.monotonic() if generation == self._generation else None
+
+    def search(self, db: Session, query: str, offset: int, limit: int) -> list[int]:
+        """Ids of one page for a normalized `query`, by shared trigrams / query trigrams (pg_trgm's word
+        similarity, approximately), best first, ties by id."""
+        if self._expired():
+            with self._load_lock:
+                # Concurrent searches wait for the one load instead of each reading the whole table.
+                if self._expired():
+                    self._load(db)
+        grams = trigrams(query)
+        if not grams:
+            return []
+        with self._lock:
+            top = self._top(grams, SERVICES_SEARCH_SIMILARITY * len(grams), offset + limit)
+        return [-negated_id for _, negated_id in sorted(top, reverse=True)[offset:]]
+
+    def _top(self, grams: set[str], need: float, k: int) -> list[tuple[int, int]]:
+        # Counting every posting of a trigram most services share ("svc", "tea") would cost O(services) per
+        # query. Only the shortest lists, up to one entry per service in total, are counted; the rest are
+        # probed per candidate, best partial counts first, until no remaining candidate can reach the page.
+        lists = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+        budget, split = len(self._documents), 0
+        while split < len(lists) and len(lists[split]) <= budget:
+            budget -= len(lists[split])
+            split += 1
+        counted, probed = lists[:split], lists[split:]
+        partial = Counter()
+        for ids in counted:
+            partial.update(ids)
+        by_count: dict[int, list[int]] = {}
+        for service_id, count in partial.items():
+            by_count.setdefault(count, []).append(service_id)
+
+        top: list[tuple[int, int]] = []  # min-heap of (shared trigrams, -id)
+
+        def offer(count: int, service_id: int) -> None:
+            if count < need:
+                return
+            entry = (count, -service_id)
+            if len(top) < k:
+                heapq.heappush(top, entry)
+            elif entry > top[0]:
+                heapq.heapreplace(top, entry)
+
+        for count in sorted(by_count, reverse=True):
+            best = count + len(probed)
+            if len(top) == k and top[0][0] > best:
+                return top
+            # Ascending ids: once the best this group could score loses to the page, so does the rest of it.
+            for service_id in sorted(by_count[count]):
+                if len(top) == k and (best, -service_id) < top[0]:
+                    break
+                offer(count + sum(service_id in ids for ids in probed), service_id)
+        if len(probed) >= need and (len(top) < k or top[0][0] <= len(probed)):
+            # Services with none of the counted trigrams can still match on the probed ones alone.
+            for service_id, count in Counter(service_id for ids in probed for service_id in ids).items():
+                if service_id not in partial:
+                    offer(count, service_id)
+        return top
+
+
+search_index = ServiceSearchIndex()
@@ -0,0 +1,171 @@
+import math
+import threading
+import time
+from typing import Iterable
+
+from fastapi import HTTPException, status
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from app.auth.utils import AuthContext
+from app.core.config import (
+    ACTION_RATE_LIMIT_BACKEND,
+    ACTION_RATE_LIMIT_ENABLED,
+    ACTION_RATE_LIMIT_TENANT,
+    ACTION_RATE_LIMIT_USER,
+    WORKFLOW_IN_FLIGHT_RETRY_AFTER_SECONDS,
+    WORKFLOW_MAX_IN_FLIGHT,
+)
+from app.core.metrics import ACTIONS_REJECTED
+from app.db import dialect_insert
+from app.deploy.models import DeploymentModel
+from app.provisioning.models import ProvisionRequestModel
+from app.services.models import ServiceModel
+from app.workflows.coalesce import RUNNING_STATUSES
+from app.workflows.models import RateLimitBucketModel
+
+# (reason, bucket key, tokens per second, burst, tokens the action takes)
+Bucket = tuple[str, str, float, float, int]
+
+# Memory buckets that refilled to full are forgotten once there are more than this many.
+_MAX_MEMORY_BUCKETS = 10_000
+
+
+def _retry_after(tokens: float, rate: float, cost: int) -> int:
+    return max(1, math.ceil((cost - tokens) / rate))
+
+
+class MemoryBuckets:
+    """Per-worker buckets: with N workers a client can get up to N times the configured rate."""
+
+    def __init__(self):
+        # key -> (tokens, last refill, rate, burst)
+        self._buckets: dict[str, tuple[float, float, float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, _db: Session, buckets: list[Bucket]) -> tuple[str, int] | None:
+        """Takes each bucket's cost from it, or nothing at all; returns (reason, retry after) when one is short."""
+        now = time.monotonic()
+        with self._lock:
+            refilled = []
+            for reason, key, rate, burst, cost in buckets:
+                tokens, updated_at, _, _ = self._buckets.get(key, (burst, now, rate, burst))
+                tokens = min(burst, tokens + (now - updated_at) * rate)
+                if tokens < cost:
+                    return reason, _retry_after(tokens, rate, cost)
+                refilled.append((key, tokens - cost, now, rate, burst))
+            for key, *state in refilled:
+                self._buckets[key] = tuple(state)
+            if len(self._buckets) > _MAX_MEMORY_BUCKETS:
+                # A full bucket is the same as a missing one.
+                self._buckets = {
+                    key: state
+                    for key, state in self._buckets.items()
+                    if state[0] + (now - state[1]) * state[2] < state[3]
+                }
+        return None
+
+
+class PostgresBuckets:
+    """Buckets shared by all workers, as rows updated inside the action's transaction.
+
+    A rejection raises and rolls the transaction back, so tokens already taken from other buckets are returned.
+    The row locks are held until the action commits, which is why buckets are taken last, after the services.
+    """
+
+    def take(self, db: Session, buckets: list[Bucket]) -> tuple[str, int] | None:
+        now = time.time()
+        for reason, key, rate, burst, cost in buckets:
+            elapsed = case((RateLimitBucketModel.updated_at < now, now - RateLimitBucketModel.updated_at), else_=0.0)
+            refilled = RateLimitBucketModel.tokens + elapsed * rate
+            refilled = case((refilled > burst, burst), else_=refilled)
+            stmt = dialect_insert(db, RateLimitBucketModel).values(key=key, tokens=burst - cost, updated_at=now)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["key"], set_={"tokens": refilled - cost, "updated_at": now}, where=refilled >= cost
+            ).returning(RateLimitBucketModel.key)
+            if db.execute(stmt).first() is None:
+                row = db.execute(
+                    select(RateLimitBucketModel.tokens, RateLimitBucketModel.updated_at).where(
+                        RateLimitBucketModel.key == key
+                    )
+                ).one()
+                tokens = min(burst, row.tokens + max(now - row.updated_at, 0.0) * rate)
+                return reason, _retry_after(tokens, rate, cost)
+        return None
+
+
+buckets = PostgresBuckets() if ACTION_RATE_LIMIT_BACKEND == "postgres" else MemoryBuckets()
+
+
+def _limit(table: dict[str, tuple[float, float]], name: str) -> tuple[float, float] | None:
+    return table.get(name, table.get("*"))
+
+
+def action_buckets(ctx: AuthContext, services: Iterable[ServiceModel]) -> list[Bucket]:
+    """One bucket per tenant of `services`, rated by the tier of its first service and charged a token per service,
+    then the user's, charged a token per service in all."""
+    tenants: dict[str, tuple[float, float, int]] = {}
+    total = 0
+    for service in services:
+        total += 1
+        limit = _limit(ACTION_RATE_LIMIT_TENANT, service.tier)
+        if limit is not None:
+            rate, burst, cost = tenants.get(service.tenant, (*limit, 0))
+            tenants[service.tenant] = (rate, burst, cost + 1)
+    selected: list[Bucket] = [("tenant", f"tenant:{name}", *tenants[name]) for name in sorted(tenants)]
+    limit = _limit(ACTION_RATE_LIMIT_USER, ctx.role)
+    if limit is not None and total:
+        selected.append(("user", f"user:{ctx.username}", *limit, total))
+    return selected
+
+
+def in_flight(db: Session) -> int:
+    return sum(
+        db.execute(select(func.count()).select_from(model).where(model.status.in_(RUNNING_STATUSES))).scalar_one()
+        for model in (DeploymentModel, ProvisionRequestModel)
+    )
+
+
+def _reject(status_code: int, reason: str, retry_after: int, detail: str) -> HTTPException:
+    ACTIONS_REJECTED.inc(reason)
+    return HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(retry_after)})
+
+
+def admit(db: Session, ctx: AuthContext, services: list[ServiceModel]) -> None:
+    """Admission for an action about to start one new workflow per entry of `services`; raises 503 when the global
+    in-flight cap would be exceeded and 429 when the user or a tenant is short of tokens, both with Retry-After.
+    A batch that needs more tokens than a bucket can ever hold gets 400.
+
+    Call it once the action knows it starts something: replays and joined runs cost nothing.
+    """
+    if not services:
+        return
+    if WORKFLOW_MAX_IN_FLIGHT > 0 and in_flight(db) + len(services) > WORKFLOW_MAX_IN_FLIGHT:
+        # Counted without a lock, so concurrent actions can overshoot the cap slightly.
+        raise _reject(
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            "in_flight",
+            WORKFLOW_IN_FLIGHT_RETRY_AFTER_SECONDS,
+            "Too many workflows in flight, try again later",
+        )
+    if not ACTION_RATE_LIMIT_ENABLED:
+        return
+    selected = action_buckets(ctx, services)
+    for reason, key, _, burst, cost in selected:
+        if cost > burst:
+            ACTIONS_REJECTED.inc(reason)
+            who = f"tenant {key.partition(':')[2]}" if reason == "tenant" else "you"
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Batch starts {cost} actions for {who}, more than the limit of {burst:g} at once; split it",
+            )
+    rejected = buckets.take(db, selected)
+    if rejected is not None:
+        reason, retry_after = rejected
+        who = "this tenant" if reason == "tenant" else "you"
+        raise _reject(
+            status.HTTP_429_TOO_MANY_REQUESTS,
+            reason,
+            retry_after,
+            f"Too many actions started by {who}, retry in {retry_after}s",
+        )
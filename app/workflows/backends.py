@@ -0,0 +1,48 @@
+from app.core.config import DEPLOY_STEP_FUNCTION_ARN, STEP_FUNCTION_ARN, WORKFLOW_BACKEND
+from app.core.invalidation import register_handler
+from app.core.metrics import gauge_callback
+from app.workflows import client as workflow_client
+from app.workflows.local import CANCEL_MESSAGE, LocalExecutor
+
+# A backend has a `label` (shown in "... started via <label>"), start(kind, input, name) -> execution ARN or None
+# when it cannot run `kind`, confirm(execution ARNs) once their starts are recorded, cancel(execution_arn) ->
+# "cancelled" | "requested" | "not_found", and async stop().
+
+
+class StepFunctionsBackend:
+    label = "Step Functions"
+
+    def start(self, kind: str, execution_input: dict, name: str | None = None) -> str | None:
+        state_machine_arn = DEPLOY_STEP_FUNCTION_ARN if kind == "deploy" else STEP_FUNCTION_ARN
+        if not state_machine_arn:
+            return None
+        return workflow_client.start_execution(state_machine_arn, execution_input, name=name)
+
+    def confirm(self, execution_arns: list[str]) -> None:
+        pass
+
+    def cancel(self, execution_arn: str) -> str:
+        # The reconciler then picks the execution up as ABORTED and marks it failed.
+        try:
+            workflow_client.stop_execution(execution_arn, cause="Cancelled from the portal")
+        except Exception as exc:
+            if workflow_client.error_code(exc) in ("ExecutionDoesNotExist", "ValidationException"):
+                return "not_found"
+            raise
+        return "cancelled"
+
+    async def stop(self) -> None:
+        pass
+
+
+if WORKFLOW_BACKEND == "local":
+    workflow_backend = LocalExecutor()
+    register_handler(CANCEL_MESSAGE, lambda execution_arn: workflow_backend.cancel(execution_arn, broadcast=False))
+    gauge_callback(
+        "idp_local_workflow_runs",
+        "Local workflow executor runs by state",
+        ("state",),
+        lambda: [((state,), float(workflow_backend.stats()[state])) for state in ("running", "queued")],
+    )
+else:
+    workflow_backend = StepFunctionsBackend()
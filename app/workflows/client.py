@@ -0,0 +1,229 @@
+import importlib.util
+import json
+import logging
+import threading
+import time
+
+from app.core.config import (
+    AWS_REGION,
+    WORKFLOW_BREAKER_FAILURE_THRESHOLD,
+    WORKFLOW_BREAKER_RESET_SECONDS,
+    WORKFLOW_CONNECT_TIMEOUT_SECONDS,
+    WORKFLOW_MAX_ATTEMPTS,
+    WORKFLOW_MAX_POOL_CONNECTIONS,
+    WORKFLOW_READ_TIMEOUT_SECONDS,
+)
+from app.core.metrics import WORKFLOW_CALL_SECONDS, WORKFLOW_CALLS_REJECTED, gauge_callback, span
+
+logger = logging.getLogger(__name__)
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+_THROTTLING_CODES = {"ThrottlingException", "TooManyRequestsException", "RequestLimitExceeded"}
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = BREAKER_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == BREAKER_CLOSED:
+                return
+            if self.state == BREAKER_OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = BREAKER_HALF_OPEN
+                self._trial_in_flight = False
+            # Half-open lets exactly one trial call through; everything else fails fast.
+            if self.state == BREAKER_HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            raise CircuitOpenError("Step Functions circuit breaker is open")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = BREAKER_CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == BREAKER_HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = BREAKER_OPEN
+                self.opened_at = time.monotonic()
+
+
+class _CallStats:
+    __slots__ = ("calls", "errors", "rejected", "total_seconds", "max_seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "avg_seconds": self.total_seconds / self.calls if self.calls else 0.0,
+            "max_seconds": self.max_seconds,
+        }
+
+
+breaker = CircuitBreaker(WORKFLOW_BREAKER_FAILURE_THRESHOLD, WORKFLOW_BREAKER_RESET_SECONDS)
+gauge_callback(
+    "idp_workflow_breaker_state",
+    "Step Functions circuit breaker state (1 for the current state)",
+    ("state",),
+    lambda: [((state,), float(breaker.state == state)) for state in (BREAKER_CLOSED, BREAKER_OPEN, BREAKER_HALF_OPEN)],
+)
+_stats: dict[str, _CallStats] = {}
+_stats_lock = threading.Lock()
+_client = None
+_client_lock = threading.Lock()
+
+
+def available() -> bool:
+    return importlib.util.find_spec("boto3") is not None
+
+
+def get_client():
+    # One client per process: boto3 clients are thread-safe and keep their own connection pool.
+    global _client
+    if _client is not None:
+        return _client
+    with _client_lock:
+        if _client is None:
+            if not available():
+                raise RuntimeError("boto3 not installed")
+            import boto3
+            from botocore.config import Config
+
+            config = Config(
+                region_name=AWS_REGION,
+                connect_timeout=WORKFLOW_CONNECT_TIMEOUT_SECONDS,
+                read_timeout=WORKFLOW_READ_TIMEOUT_SECONDS,
+                retries={"max_attempts": WORKFLOW_MAX_ATTEMPTS, "mode": "standard"},
+                max_pool_connections=WORKFLOW_MAX_POOL_CONNECTIONS,
+            )
+            _client = boto3.client("stepfunctions", config=config)
+    return _client
+
+
+def warm_up() -> None:
+    # Importing boto3 and building the client takes hundreds of ms; done off the startup path so workers
+    # report ready immediately and the first workflow call does not pay for it.
+    if not available():
+        return
+    try:
+        get_client()
+    except Exception:
+        logger.exception("Creating the Step Functions client failed")
+
+
+def error_code(exc: Exception) -> str:
+    response = getattr(exc, "response", None)
+    if not isinstance(response, dict):
+        return ""
+    return response.get("Error", {}).get("Code", "")
+
+
+def is_throttling_error(exc: Exception) -> bool:
+    return isinstance(exc, CircuitOpenError) or error_code(exc) in _THROTTLING_CODES
+
+
+def _is_caller_error(exc: Exception) -> bool:
+    # 4xx responses other than throttling mean the request was bad, not that Step Functions is unhealthy.
+    response = getattr(exc, "response", None)
+    if not isinstance(response, dict) or is_throttling_error(exc):
+        return False
+    return response.get("ResponseMetadata", {}).get("HTTPStatusCode", 500) < 500
+
+
+def _record(operation: str, seconds: float | None, error: bool = False, rejected: bool = False) -> None:
+    with _stats_lock:
+        stats = _stats.setdefault(operation, _CallStats())
+        if rejected:
+            stats.rejected += 1
+            return
+        stats.calls += 1
+        stats.total_seconds += seconds
+        stats.max_seconds = max(stats.max_seconds, seconds)
+        if error:
+            stats.errors += 1
+
+
+def _call(operation: str, **kwargs) -> dict:
+    try:
+        breaker.before_call()
+    except CircuitOpenError:
+        _record(operation, None, rejected=True)
+        WORKFLOW_CALLS_REJECTED.inc(operation)
+        raise
+    client = get_client()
+    started = time.perf_counter()
+    try:
+        with span(f"stepfunctions {operation}", **{"aws.operation": operation}):
+            resp = getattr(client, operation)(**kwargs)
+    except Exception as exc:
+        elapsed = time.perf_counter() - started
+        _record(operation, elapsed, error=True)
+        WORKFLOW_CALL_SECONDS.observe(elapsed, operation, "throttled" if is_throttling_error(exc) else "error")
+        if _is_caller_error(exc):
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+        raise
+    elapsed = time.perf_counter() - started
+    _record(operation, elapsed)
+    WORKFLOW_CALL_SECONDS.observe(elapsed, operation, "ok")
+    breaker.record_success()
+    return resp
+
+
+def execution_arn_for(state_machine_arn: str, name: str) -> str:
+    return f"{state_machine_arn.replace(':stateMachine:', ':execution:', 1)}:{name}"
+
+
+def start_execution(state_machine_arn: str, execution_input: dict, name: str | None = None) -> str | None:
+    kwargs = {"stateMachineArn": state_machine_arn, "input": json.dumps(execution_input)}
+    if name:
+        kwargs["name"] = name
+    try:
+        resp = _call("start_execution", **kwargs)
+    except Exception as exc:
+        # A named execution that already exists was started by an earlier attempt whose result was lost.
+        if name and error_code(exc) == "ExecutionAlreadyExists":
+            return execution_arn_for(state_machine_arn, name)
+        raise
+    return resp.get("executionArn")
+
+
+def describe_execution(execution_arn: str) -> dict:
+    return _call("describe_execution", executionArn=execution_arn)
+
+
+def stop_execution(execution_arn: str, cause: str = "") -> None:
+    _call("stop_execution", executionArn=execution_arn, cause=cause)
+
+
+def stats() -> dict:
+    with _stats_lock:
+        calls = {operation: item.as_dict() for operation, item in _stats.items()}
+    return {"breaker": {"state": breaker.state, "failures": breaker.failures}, "calls": calls}
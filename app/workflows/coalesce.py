@@ -0,0 +1,19 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from app.core.config import ACTION_COALESCE_SECONDS
+
+RUNNING_STATUSES = ("queued", "in_progress")
+
+
+def coalesce_cutoff() -> Optional[datetime]:
+    """Runs created before this are too old to join; None when joining is disabled."""
+    if ACTION_COALESCE_SECONDS <= 0:
+        return None
+    return datetime.now(timezone.utc) - timedelta(seconds=ACTION_COALESCE_SECONDS)
+
+
+def is_joinable(created_at: Optional[datetime], cutoff: datetime) -> bool:
+    if created_at is None:
+        return False
+    return (created_at if created_at.tzinfo else created_at.replace(tzinfo=timezone.utc)) >= cutoff
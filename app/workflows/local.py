@@ -0,0 +1,354 @@
+import asyncio
+import json
+import logging
+import os
+import signal
+import subprocess
+import threading
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from app.core.config import (
+    CALLBACK_TOKEN,
+    DEPLOYMENT_CALLBACK_TOKEN,
+    WORKFLOW_LOCAL_API_URL,
+    WORKFLOW_LOCAL_CONCURRENCY,
+    WORKFLOW_LOCAL_DEPLOY_SCRIPT,
+    WORKFLOW_LOCAL_MAX_QUEUED,
+    WORKFLOW_LOCAL_PROVISION_SCRIPT,
+    WORKFLOW_LOCAL_RUNNER,
+    WORKFLOW_LOCAL_STUB_SECONDS,
+    WORKFLOW_LOCAL_TIMEOUT_SECONDS,
+)
+from app.core.invalidation import notify_now
+
+logger = logging.getLogger(__name__)
+
+# Invalidation bus message asking the worker that holds a run to cancel it.
+CANCEL_MESSAGE = "workflow_cancel"
+# Finished execution names remembered, so a start retried after its result was lost does not run twice.
+_MAX_FINISHED = 10_000
+_KILL_GRACE_SECONDS = 10
+_OUTPUT_TAIL_CHARS = 300
+
+
+def _title(kind: str, execution_input: dict) -> str:
+    if kind == "deploy":
+        return "Deployment"
+    return "Provisioning" if execution_input.get("action") == "provision" else "Deprovisioning"
+
+
+def _tenant(kind: str, execution_input: dict) -> str:
+    if kind == "deploy":
+        return execution_input["service"]["tenant"]
+    return execution_input["tenant"]["name"]
+
+
+def _env_value(value) -> str:
+    # Like the state machines' States.Format('{}', ...): null and booleans as in JSON.
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def script_environment(kind: str, execution_input: dict) -> dict[str, str]:
+    """The variables infra/step-functions passes to the scripts; the rest (AWS, cluster and database settings)
+    are inherited from this process's environment."""
+    service = execution_input["service"]
+    if kind == "deploy":
+        values = {
+            "DEPLOYMENT_ID": execution_input["deployment_id"],
+            "TARGET_ENV": execution_input["environment"],
+            "OBSERVABILITY_ENABLED": service["observability_enabled"],
+            "SERVICE_NAME": service["name"],
+            "TENANT_NAME": service["tenant"],
+            "NAMESPACE": f"tenant-{service['tenant']}",
+            "DEPLOYMENT_API_URL": WORKFLOW_LOCAL_API_URL,
+            "DEPLOYMENT_CALLBACK_TOKEN": DEPLOYMENT_CALLBACK_TOKEN,
+        }
+    else:
+        tenant = execution_input["tenant"]
+        values = {
+            "TENANT_NAME": tenant["name"],
+            "ACTION": execution_input["action"],
+            "NAMESPACE": tenant["namespace"],
+            "RDS_SCHEMA": tenant["rds_schema"],
+            "S3_BUCKET": tenant["s3_bucket"],
+            "SERVICE_ID": service["id"],
+            "REQUEST_ID": execution_input["request_id"],
+            "PROVISIONING_API_URL": WORKFLOW_LOCAL_API_URL,
+            "PROVISIONING_CALLBACK_TOKEN": CALLBACK_TOKEN,
+        }
+        if tenant.get("db_password"):
+            values["TF_VAR_tenant_db_password"] = tenant["db_password"]
+    return {**os.environ, **{name: _env_value(value) for name, value in values.items()}}
+
+
+def _signal_group(process: subprocess.Popen, sig: int) -> None:
+    # The script runs in its own session, so terraform/kubectl children get the signal too.
+    try:
+        os.killpg(process.pid, sig)
+    except ProcessLookupError:
+        pass
+
+
+def _terminate(process: subprocess.Popen) -> None:
+    _signal_group(process, signal.SIGTERM)
+    try:
+        process.wait(_KILL_GRACE_SECONDS)
+    except subprocess.TimeoutExpired:
+        _signal_group(process, signal.SIGKILL)
+
+
+class LocalRun:
+    __slots__ = (
+        "kind",
+        "execution_arn",
+        "execution_input",
+        "tenant",
+        "title",
+        "cancelled",
+        "cancel_detail",
+        "state",
+        "process",
+    )
+
+    def __init__(self, kind: str, execution_arn: str, execution_input: dict):
+        self.kind = kind
+        self.execution_arn = execution_arn
+        self.execution_input = execution_input
+        self.tenant = _tenant(kind, execution_input)
+        self.title = _title(kind, execution_input)
+        self.cancelled = threading.Event()
+        self.cancel_detail = f"{self.title} cancelled"
+        # "starting" until the dispatcher has recorded the start, then "held" behind the tenant's current run,
+        # "submitted" to the pool and "running".
+        self.state = "starting"
+        self.process: subprocess.Popen | None = None
+
+
+class LocalExecutor:
+    """Runs workflows in this process in place of Step Functions, at most `concurrency` at a time.
+
+    A run is released by `confirm` once the dispatcher has recorded its start, so a run that fails at once cannot
+    report before it is marked started. A tenant's runs execute one after another, held back while an earlier one
+    runs. Beyond `max_queued` runs, start raises and the outbox retries later. Results are applied through the same
+    code as workflow callbacks; "script" runs report success themselves, the executor reports failures, timeouts
+    and cancellations. Runs live in memory only: those of a worker that dies stay in progress until new actions
+    bypass them after ACTION_COALESCE_SECONDS.
+    """
+
+    label = "local executor"
+
+    def __init__(
+        self,
+        runner: str = WORKFLOW_LOCAL_RUNNER,
+        concurrency: int = WORKFLOW_LOCAL_CONCURRENCY,
+        max_queued: int = WORKFLOW_LOCAL_MAX_QUEUED,
+        timeout: float = WORKFLOW_LOCAL_TIMEOUT_SECONDS,
+        stub_seconds: float = WORKFLOW_LOCAL_STUB_SECONDS,
+    ):
+        self.runner = runner
+        self.concurrency = concurrency
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.stub_seconds = stub_seconds
+        self.scripts = {"provision": WORKFLOW_LOCAL_PROVISION_SCRIPT, "deploy": WORKFLOW_LOCAL_DEPLOY_SCRIPT}
+        self._pool: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        # Queued and running runs by ARN; tenant -> runs held behind the one it is running (present while busy).
+        self._runs: dict[str, LocalRun] = {}
+        self._held: dict[str, deque[LocalRun]] = {}
+        self._finished: OrderedDict[str, None] = OrderedDict()
+        self._outcomes = {"succeeded": 0, "failed": 0, "timed_out": 0, "cancelled": 0}
+        self._closed = False
+
+    def start(self, kind: str, execution_input: dict, name: str | None = None) -> str:
+        execution_arn = f"local:{kind}:{name or uuid.uuid4().hex}"
+        run = LocalRun(kind, execution_arn, execution_input)
+        with self._lock:
+            if execution_arn in self._runs or execution_arn in self._finished:
+                return execution_arn
+            if self._closed:
+                raise RuntimeError("Local workflow executor is shutting down")
+            if len(self._runs) >= self.max_queued:
+                raise RuntimeError("Local workflow queue is full")
+            self._runs[execution_arn] = run
+        return execution_arn
+
+    def confirm(self, execution_arns: list[str]) -> None:
+        with self._lock:
+            for execution_arn in execution_arns:
+                run = self._runs.get(execution_arn)
+                if run is None or run.state != "starting" or self._closed:
+                    continue
+                held = self._held.get(run.tenant)
+                if held is not None:
+                    run.state = "held"
+                    held.append(run)
+                    continue
+                self._held[run.tenant] = deque()
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="local-workflow")
+                run.state = "submitted"
+                self._pool.submit(self._execute, run)
+
+    def cancel(self, execution_arn: str, broadcast: bool = True, reason: str = "cancelled") -> str:
+        """Returns "cancelled" for a run of this worker, "requested" when other workers were asked to cancel it
+        and "not_found" otherwise."""
+        with self._lock:
+            run = self._runs.get(execution_arn)
+            if run is not None:
+                run.cancel_detail = f"{run.title} {reason}"
+                run.cancelled.set()
+                dequeued = run.state in ("starting", "held")
+                if run.state == "held":
+                    self._held[run.tenant].remove(run)
+                if dequeued:
+                    self._forget(run)
+                process = run.process
+        if run is None:
+            if broadcast and execution_arn.startswith("local:") and notify_now(CANCEL_MESSAGE, execution_arn):
+                return "requested"
+            return "not_found"
+        if dequeued:
+            self._report(run, "cancelled", run.cancel_detail)
+        elif process is not None:
+            # Off the caller's thread: the script gets a grace period before it is killed.
+            threading.Thread(target=_terminate, args=(process,), daemon=True).start()
+        return "cancelled"
+
+    def _forget(self, run: LocalRun) -> None:
+        self._runs.pop(run.execution_arn, None)
+        self._finished[run.execution_arn] = None
+        while len(self._finished) > _MAX_FINISHED:
+            self._finished.popitem(last=False)
+
+    def _execute(self, run: LocalRun) -> None:
+        with self._lock:
+            run.state = "running"
+        try:
+            result, detail = self._run(run)
+        except Exception as exc:
+            logger.exception("Local workflow %s failed", run.execution_arn)
+            result, detail = "failed", f"{run.title} failed: {exc}"
+        # Reported before the tenant's next run starts, so its results arrive in order.
+        self._report(run, result, detail)
+        with self._lock:
+            self._forget(run)
+            held = self._held[run.tenant]
+            if held and not self._closed:
+                next_run = held.popleft()
+                next_run.state = "submitted"
+                self._pool.submit(self._execute, next_run)
+            else:
+                del self._held[run.tenant]
+
+    def _run(self, run: LocalRun) -> tuple[str, str | None]:
+        """(outcome, detail to report); no detail when the script reported the result itself."""
+        if run.cancelled.is_set():
+            return "cancelled", run.cancel_detail
+        if self.runner == "script":
+            return self._run_script(run)
+        if run.cancelled.wait(min(self.stub_seconds, self.timeout)):
+            return "cancelled", run.cancel_detail
+        if self.stub_seconds > self.timeout:
+            return "timed_out", f"{run.title} timed out after {self.timeout:g}s"
+        return "succeeded", f"{run.title} succeeded (local stub)"
+
+    def _run_script(self, run: LocalRun) -> tuple[str, str | None]:
+        script = Path(self.scripts[run.kind]).resolve()
+        with self._lock:
+            if run.cancelled.is_set():
+                return "cancelled", run.cancel_detail
+            run.process = process = subprocess.Popen(
+                [str(script)],
+                cwd=script.parent,
+                env=script_environment(run.kind, run.execution_input),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                errors="replace",
+                start_new_session=True,
+            )
+        try:
+            output, _ = process.communicate(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            _terminate(process)
+            process.communicate()
+            return "timed_out", f"{run.title} timed out after {self.timeout:g}s"
+        if run.cancelled.is_set():
+            return "cancelled", run.cancel_detail
+        if process.returncode == 0:
+            return "succeeded", None
+        lines = [line for line in output.splitlines() if line.strip()]
+        last_line = lines[-1][-_OUTPUT_TAIL_CHARS:] if lines else ""
+        logger.warning("Local workflow %s exited with %s:\n%s", run.execution_arn, process.returncode, output[-4000:])
+        detail = f"{run.title} failed: exit status {process.returncode}"
+        return "failed", f"{detail}: {last_line}" if last_line else detail
+
+    def _report(self, run: LocalRun, result: str, detail: str | None) -> None:
+        with self._lock:
+            self._outcomes[result] += 1
+        if detail is None:
+            return
+        status = "succeeded" if result == "succeeded" else "failed"
+        execution_input = run.execution_input
+        try:
+            # Imported here: the routes import the workflow backends.
+            if run.kind == "deploy":
+                from app.deploy.routes import report_deployment_result
+                from app.deploy.schemas import DeployCallback
+
+                report_deployment_result(
+                    DeployCallback(
+                        deployment_id=execution_input["deployment_id"],
+                        status=status,
+                        detail=detail,
+                        execution_arn=run.execution_arn,
+                    )
+                )
+            else:
+                from app.provisioning.routes import report_provisioning_result
+                from app.provisioning.schemas import ProvisionCallback
+
+                report_provisioning_result(
+                    ProvisionCallback(
+                        service_id=execution_input["service"]["id"],
+                        request_id=execution_input["request_id"],
+                        tenant=run.tenant,
+                        action=execution_input["action"],
+                        status=status,
+                        detail=detail,
+                        execution_arn=run.execution_arn,
+                    )
+                )
+        except Exception:
+            logger.exception("Reporting local workflow %s failed", run.execution_arn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            running = sum(run.state == "running" for run in self._runs.values())
+            return {
+                "runner": self.runner,
+                "concurrency": self.concurrency,
+                "running": running,
+                "queued": len(self._runs) - running,
+                "busy_tenants": len(self._held),
+                "outcomes": dict(self._outcomes),
+            }
+
+    def shutdown(self) -> None:
+        """Cancel every run (reported as failed) and wait for the pool to drain."""
+        with self._lock:
+            self._closed = True
+            execution_arns = list(self._runs)
+            pool = self._pool
+        for execution_arn in execution_arns:
+            self.cancel(execution_arn, broadcast=False, reason="interrupted: the worker running it shut down")
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    async def stop(self) -> None:
+        await asyncio.to_thread(self.shutdown)
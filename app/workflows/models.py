@@ -0,0 +1,39 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, Float, Index, Integer, String, func, text
+
+from app.db import Base
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class WorkflowOutboxModel(Base):
+    __tablename__ = "workflow_outbox"
+    # The dispatcher only ever scans pending rows that are due.
+    __table_args__ = (
+        Index("ix_workflow_outbox_due", "next_attempt_at", "id", postgresql_where=text("status = 'pending'")),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    ref_id = Column(Integer, nullable=False)
+    execution_name = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String, nullable=False, default="")
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, default=_utcnow)
+    dispatched_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=_utcnow, server_default=func.now())
+
+
+class RateLimitBucketModel(Base):
+    """Token bucket state shared by all workers when ACTION_RATE_LIMIT_BACKEND is "postgres"."""
+
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String, primary_key=True)
+    tokens = Column(Float, nullable=False)
+    # Epoch seconds of the last refill, from the workers' clocks.
+    updated_at = Column(Float, nullable=False)
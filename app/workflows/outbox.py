@@ -0,0 +1,290 @@
+import asyncio
+import logging
+import threading
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
+
+from app.core.config import (
+    OUTBOX_BATCH_SIZE,
+    OUTBOX_CONCURRENCY,
+    OUTBOX_DISPATCHER_ENABLED,
+    OUTBOX_LEASE_SECONDS,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_POLL_SECONDS,
+    OUTBOX_RETRY_BASE_SECONDS,
+)
+from app.db import SessionLocal
+from app.deploy.models import DeploymentModel
+from app.deploy.service import build_deploy_input, mark_deployment_failed, mark_deployment_started, start_deploy_execution
+from app.events.hub import notify_service_events, publish_service_event
+from app.provisioning.models import ProvisionRequestModel
+from app.provisioning.service import (
+    build_execution_input,
+    mark_request_failed,
+    mark_request_started,
+    start_step_function_execution,
+)
+from app.provisioning.tenants import tenant_registry
+from app.services.models import ServiceModel
+from app.workflows import client as workflow_client
+from app.workflows.backends import workflow_backend
+from app.workflows.models import WorkflowOutboxModel
+
+logger = logging.getLogger(__name__)
+
+_MAX_RETRY_DELAY_SECONDS = 300.0
+
+
+@dataclass
+class ClaimedWorkflow:
+    outbox_id: int
+    kind: str
+    ref_id: int
+    execution_name: str
+    attempts: int
+    created_at: datetime
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def enqueue_workflow(db, kind: str, ref_id: int) -> WorkflowOutboxModel:
+    # Written in the caller's transaction: the workflow starts if and only if the action row commits.
+    row = WorkflowOutboxModel(kind=kind, ref_id=ref_id, execution_name=f"{kind}-{ref_id}-{uuid.uuid4().hex[:12]}")
+    db.add(row)
+    return row
+
+
+def _claim_batch(limit: int) -> list[ClaimedWorkflow]:
+    now = _utcnow()
+    lease_until = now + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+    with SessionLocal() as db:
+        rows = (
+            db.query(WorkflowOutboxModel)
+            .filter(WorkflowOutboxModel.status == "pending", WorkflowOutboxModel.next_attempt_at <= now)
+            .order_by(WorkflowOutboxModel.next_attempt_at.asc(), WorkflowOutboxModel.id.asc())
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        claimed = []
+        for row in rows:
+            # Leasing instead of holding the row lock keeps AWS calls outside the transaction;
+            # a crashed dispatcher's claims become due again when the lease runs out.
+            row.attempts += 1
+            row.next_attempt_at = lease_until
+            claimed.append(
+                ClaimedWorkflow(row.id, row.kind, row.ref_id, row.execution_name, row.attempts, _as_utc(row.created_at))
+            )
+        db.commit()
+    return claimed
+
+
+def _load_targets(db, claims: list[ClaimedWorkflow]) -> None:
+    # Pull every row the claims touch into the identity map up front, so the per-claim
+    # db.get() calls below are served from memory instead of a query each.
+    deploy_ids = [claim.ref_id for claim in claims if claim.kind == "deploy"]
+    request_ids = [claim.ref_id for claim in claims if claim.kind != "deploy"]
+    service_ids = set()
+    if deploy_ids:
+        service_ids.update(row.service_id for row in db.query(DeploymentModel).filter(DeploymentModel.id.in_(deploy_ids)))
+    if request_ids:
+        service_ids.update(
+            row.service_id for row in db.query(ProvisionRequestModel).filter(ProvisionRequestModel.id.in_(request_ids))
+        )
+    if service_ids:
+        db.query(ServiceModel).filter(ServiceModel.id.in_(service_ids)).all()
+
+
+def _prepare_inputs(claims: list[ClaimedWorkflow]) -> list[dict | None]:
+    inputs = []
+    with SessionLocal() as db:
+        _load_targets(db, claims)
+        requests = [db.get(ProvisionRequestModel, claim.ref_id) for claim in claims if claim.kind != "deploy"]
+        tenant_names = {request.tenant for request in requests if request is not None}
+        tenants = tenant_registry.lookup_many(db, tenant_names)
+        for claim in claims:
+            if claim.kind == "deploy":
+                deployment = db.get(DeploymentModel, claim.ref_id)
+                service = db.get(ServiceModel, deployment.service_id) if deployment else None
+                if deployment and service and deployment.status == "queued":
+                    inputs.append(build_deploy_input(service, deployment))
+                    continue
+            else:
+                request = db.get(ProvisionRequestModel, claim.ref_id)
+                service = db.get(ServiceModel, request.service_id) if request else None
+                tenant = tenants.get(request.tenant) if request else None
+                if request and service and tenant and request.status == "queued":
+                    inputs.append(build_execution_input(service, tenant, action=request.action, request_id=request.id))
+                    continue
+            inputs.append(None)
+    return inputs
+
+
+def _start(claim: ClaimedWorkflow, execution_input: dict) -> str:
+    if claim.kind == "deploy":
+        execution_arn = start_deploy_execution(execution_input, name=claim.execution_name)
+    else:
+        execution_arn = start_step_function_execution(execution_input, name=claim.execution_name)
+    if not execution_arn:
+        raise RuntimeError(f"No workflow backend is configured for {claim.kind}")
+    return execution_arn
+
+
+class OutboxDispatcher:
+    def __init__(
+        self,
+        poll_seconds: float = OUTBOX_POLL_SECONDS,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        concurrency: int = OUTBOX_CONCURRENCY,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+    ):
+        self.poll_seconds = poll_seconds
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wake: asyncio.Event | None = None
+        self._stats_lock = threading.Lock()
+        self._dispatched = 0
+        self._failed = 0
+        self._retried = 0
+        self._lag_total = 0.0
+        self._last_lag = 0.0
+
+    def _record_results(self, claims: list[ClaimedWorkflow], results: list[tuple[str | None, Exception | None]]) -> None:
+        now = _utcnow()
+        events = []
+        lags = []
+        failed = retried = 0
+        with SessionLocal() as db:
+            db.query(WorkflowOutboxModel).filter(WorkflowOutboxModel.id.in_([claim.outbox_id for claim in claims])).all()
+            _load_targets(db, claims)
+            for claim, (execution_arn, error) in zip(claims, results):
+                outbox = db.get(WorkflowOutboxModel, claim.outbox_id)
+                model = DeploymentModel if claim.kind == "deploy" else ProvisionRequestModel
+                row = db.get(model, claim.ref_id)
+                target_queued = row is not None and row.status == "queued"
+                if error is None:
+                    outbox.status = "dispatched"
+                    outbox.dispatched_at = now
+                    outbox.last_error = ""
+                    lags.append((now - claim.created_at).total_seconds())
+                    if target_queued:
+                        mark = mark_deployment_started if claim.kind == "deploy" else mark_request_started
+                        events.append(mark(db, row, execution_arn))
+                    continue
+
+                outbox.last_error = str(error)[:500]
+                throttled = workflow_client.is_throttling_error(error)
+                if throttled:
+                    # Don't burn attempts while Step Functions is shedding load.
+                    outbox.attempts = claim.attempts - 1
+                if not target_queued or (not throttled and claim.attempts >= self.max_attempts):
+                    outbox.status = "failed"
+                    failed += 1
+                    if target_queued:
+                        mark = mark_deployment_failed if claim.kind == "deploy" else mark_request_failed
+                        events.append(mark(db, row, error))
+                    continue
+                delay = min(OUTBOX_RETRY_BASE_SECONDS * 2 ** max(claim.attempts - 1, 0), _MAX_RETRY_DELAY_SECONDS)
+                outbox.next_attempt_at = now + timedelta(seconds=delay)
+                retried += 1
+            notify_service_events(db, events)
+            db.commit()
+        for event in events:
+            if event:
+                publish_service_event(*event)
+        with self._stats_lock:
+            self._dispatched += len(lags)
+            self._failed += failed
+            self._retried += retried
+            self._lag_total += sum(lags)
+            if lags:
+                self._last_lag = lags[-1]
+
+    async def dispatch_once(self) -> int:
+        claims = await run_in_threadpool(_claim_batch, self.batch_size)
+        if not claims:
+            return 0
+        inputs = await run_in_threadpool(_prepare_inputs, claims)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def start(claim: ClaimedWorkflow, execution_input: dict | None):
+            if execution_input is None:
+                return None, RuntimeError("Workflow target no longer exists or is not queued")
+            async with semaphore:
+                try:
+                    return await run_in_threadpool(_start, claim, execution_input), None
+                except Exception as exc:
+                    return None, exc
+
+        results = await asyncio.gather(*(start(claim, item) for claim, item in zip(claims, inputs)))
+        await run_in_threadpool(self._record_results, claims, list(results))
+        workflow_backend.confirm([execution_arn for execution_arn, _ in results if execution_arn])
+        return len(claims)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                while await self.dispatch_once() >= self.batch_size:
+                    pass
+            except Exception:
+                logger.exception("Workflow outbox dispatch failed")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def wake(self) -> None:
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def start(self) -> None:
+        if not OUTBOX_DISPATCHER_ENABLED or self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = self._loop.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        with SessionLocal() as db:
+            depth, oldest = (
+                db.query(func.count(WorkflowOutboxModel.id), func.min(WorkflowOutboxModel.created_at))
+                .filter(WorkflowOutboxModel.status == "pending")
+                .one()
+            )
+        with self._stats_lock:
+            return {
+                "queue_depth": depth,
+                "oldest_pending_seconds": (_utcnow() - _as_utc(oldest)).total_seconds() if oldest else 0.0,
+                "dispatched": self._dispatched,
+                "failed": self._failed,
+                "retried": self._retried,
+                "last_dispatch_lag_seconds": self._last_lag,
+                "avg_dispatch_lag_seconds": self._lag_total / self._dispatched if self._dispatched else 0.0,
+            }
+
+
+dispatcher = OutboxDispatcher()
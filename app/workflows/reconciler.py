@@ -0,0 +1,275 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select, text
+
+from app.core.config import (
+    RECONCILER_BATCH_SIZE,
+    RECONCILER_CONCURRENCY,
+    RECONCILER_ENABLED,
+    RECONCILER_INTERVAL_SECONDS,
+    RECONCILER_MAX_BACKOFF_SECONDS,
+    WORKFLOW_BACKEND,
+)
+from app.db import SessionLocal, engine, update_if_version
+from app.deploy.models import DeploymentModel
+from app.deploy.service import DEPLOY_STARTED_DETAIL, record_deployment_status
+from app.events.hub import (
+    deploy_status_event,
+    notify_service_events,
+    provision_status_event,
+    publish_service_event,
+)
+from app.overview.service import overview_delta
+from app.provisioning.models import ProvisionRequestModel
+from app.provisioning.tenants import set_tenant_status, tenant_registry, tenant_version
+from app.services.models import ServiceModel
+from app.workflows import client as workflow_client
+
+logger = logging.getLogger(__name__)
+
+PENDING_STATUSES = ("queued", "in_progress")
+_FAILED_EXECUTION_STATUSES = {"FAILED", "TIMED_OUT", "ABORTED"}
+_DEFAULT_DEPLOY_DETAILS = {"Deployment request queued", DEPLOY_STARTED_DETAIL}
+# Arbitrary application-wide key for pg_try_advisory_lock so only one worker polls Step Functions.
+_LEADER_LOCK_KEY = 0x1D9_4EC0
+
+
+@dataclass
+class PendingExecution:
+    kind: str
+    row_id: int
+    execution_arn: str
+    detail: str
+    action: str | None = None
+
+
+def _load_pending(kind: str, after_id: int, limit: int) -> list[PendingExecution]:
+    model = DeploymentModel if kind == "deploy" else ProvisionRequestModel
+    action_col = ProvisionRequestModel.action if kind == "provision" else None
+    columns = [model.id, model.execution_arn, model.detail]
+    if action_col is not None:
+        columns.append(action_col)
+    with SessionLocal() as db:
+        rows = (
+            db.query(*columns)
+            .filter(
+                model.status.in_(PENDING_STATUSES),
+                model.execution_arn.isnot(None),
+                model.id > after_id,
+            )
+            .order_by(model.id.asc())
+            .limit(limit)
+            .all()
+        )
+    return [
+        PendingExecution(
+            kind=kind,
+            row_id=row.id,
+            execution_arn=row.execution_arn,
+            detail=row.detail,
+            action=row.action if kind == "provision" else None,
+        )
+        for row in rows
+    ]
+
+
+def execution_outcome(pending: PendingExecution, resp: dict) -> tuple[str, str] | None:
+    sf_status = resp.get("status", "")
+    if pending.kind == "deploy":
+        title = "Deployment"
+    else:
+        title = "Provisioning" if pending.action == "provision" else "Deprovisioning"
+
+    if sf_status == "SUCCEEDED":
+        if pending.kind == "deploy" and pending.detail not in _DEFAULT_DEPLOY_DETAILS:
+            return "succeeded", pending.detail
+        return "succeeded", f"{title} succeeded"
+    if sf_status in _FAILED_EXECUTION_STATUSES:
+        failure_detail = resp.get("error") or sf_status
+        cause = resp.get("cause")
+        if cause:
+            failure_detail = f"{failure_detail}: {cause}"
+        return "failed", f"{title} failed: {failure_detail}"
+    return None
+
+
+def _apply_outcomes(outcomes: list[tuple[PendingExecution, tuple[str, str]]]) -> int:
+    events = []
+    with SessionLocal() as db:
+        for pending, (new_status, detail) in outcomes:
+            if pending.kind == "deploy":
+                deployment = db.get(DeploymentModel, pending.row_id, with_for_update=True)
+                # A callback may have landed since the row was read; it wins.
+                if not deployment or deployment.status not in PENDING_STATUSES:
+                    continue
+                service = db.get(ServiceModel, deployment.service_id)
+                record_deployment_status(db, service, deployment, new_status)
+                deployment.status = new_status
+                deployment.detail = detail
+                events.append((deployment.service_id, service.tenant if service else "", deploy_status_event(deployment)))
+                continue
+
+            request = db.get(ProvisionRequestModel, pending.row_id, with_for_update=True)
+            if not request or request.status not in PENDING_STATUSES:
+                continue
+            request.status = new_status
+            request.detail = detail
+            request.version = ProvisionRequestModel.version + 1
+            latest_id = (
+                db.query(func.max(ProvisionRequestModel.id))
+                .filter(ProvisionRequestModel.service_id == request.service_id)
+                .scalar()
+            )
+            if latest_id != request.id:
+                continue
+            service = db.get(ServiceModel, request.service_id)
+            previous = service.provision_status if service else None
+            # The service row isn't locked: a callback that lands in between wins, as for the tenant below.
+            if service and update_if_version(db, service, provision_status=new_status, provision_detail=detail):
+                overview_delta(db).provision(service.tenant, service.owner_team, previous, new_status)
+                events.append((service.id, service.tenant, provision_status_event(service)))
+            tenant = tenant_registry.lookup(db, request.tenant)
+            version = tenant_version(db, tenant.id) if tenant else None
+            if version is not None:
+                set_tenant_status(db, tenant.id, new_status, detail, expected_version=version)
+        notify_service_events(db, events)
+        db.commit()
+    for event in events:
+        publish_service_event(*event)
+    return len(events)
+
+
+class _LeaderLock:
+    # Holds a session-level advisory lock on a dedicated connection; other workers skip reconciling.
+    def __init__(self):
+        self._conn = None
+
+    def acquire(self) -> bool:
+        if engine.dialect.name != "postgresql":
+            return True
+        if self._conn is not None:
+            try:
+                self._conn.execute(text("SELECT 1"))
+                self._conn.commit()
+                return True
+            except Exception:
+                self.release()
+        conn = engine.connect()
+        try:
+            acquired = conn.execute(select(func.pg_try_advisory_lock(_LEADER_LOCK_KEY))).scalar()
+            conn.commit()
+        except Exception:
+            conn.invalidate()
+            conn.close()
+            raise
+        if not acquired:
+            conn.close()
+            return False
+        self._conn = conn
+        return True
+
+    def release(self) -> None:
+        if self._conn is None:
+            return
+        # Invalidate rather than return to the pool so the session-level lock is dropped with the connection.
+        self._conn.invalidate()
+        self._conn.close()
+        self._conn = None
+
+
+class Reconciler:
+    def __init__(
+        self,
+        interval: float = RECONCILER_INTERVAL_SECONDS,
+        batch_size: int = RECONCILER_BATCH_SIZE,
+        concurrency: int = RECONCILER_CONCURRENCY,
+        max_backoff: float = RECONCILER_MAX_BACKOFF_SECONDS,
+    ):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_backoff = max_backoff
+        self._leader = _LeaderLock()
+        self._task: asyncio.Task | None = None
+
+    async def _describe_batch(self, batch: list[PendingExecution]):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        throttled = False
+
+        async def describe(pending: PendingExecution):
+            nonlocal throttled
+            async with semaphore:
+                if throttled:
+                    return None
+                try:
+                    resp = await run_in_threadpool(workflow_client.describe_execution, pending.execution_arn)
+                except Exception as exc:
+                    if workflow_client.is_throttling_error(exc):
+                        throttled = True
+                    else:
+                        logger.warning("describe_execution failed for %s: %s", pending.execution_arn, exc)
+                    return None
+            outcome = execution_outcome(pending, resp)
+            return (pending, outcome) if outcome else None
+
+        results = await asyncio.gather(*(describe(pending) for pending in batch))
+        return [result for result in results if result], throttled
+
+    async def run_once(self) -> bool:
+        """Reconcile every in-flight execution once. Returns True when Step Functions throttled us."""
+        if not await run_in_threadpool(self._leader.acquire):
+            return False
+        for kind in ("deploy", "provision"):
+            after_id = 0
+            while True:
+                batch = await run_in_threadpool(_load_pending, kind, after_id, self.batch_size)
+                if not batch:
+                    break
+                after_id = batch[-1].row_id
+                outcomes, throttled = await self._describe_batch(batch)
+                if outcomes:
+                    await run_in_threadpool(_apply_outcomes, outcomes)
+                if throttled:
+                    return True
+                if len(batch) < self.batch_size:
+                    break
+        return False
+
+    async def run(self) -> None:
+        delay = self.interval
+        while True:
+            try:
+                backoff = await self.run_once()
+            except Exception:
+                logger.exception("Step Functions reconciliation failed")
+                backoff = True
+            delay = min(delay * 2, self.max_backoff) if backoff else self.interval
+            await asyncio.sleep(delay)
+
+    def start(self) -> None:
+        # Local runs report their own results; only Step Functions executions are polled.
+        if (
+            not RECONCILER_ENABLED
+            or WORKFLOW_BACKEND == "local"
+            or not workflow_client.available()
+            or self._task is not None
+        ):
+            return
+        self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await run_in_threadpool(self._leader.release)
+
+
+reconciler = Reconciler()
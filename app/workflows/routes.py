@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+
+from app.auth.utils import ROLE_ADMIN, require_roles
+from app.core.config import WORKFLOW_BACKEND
+from app.deploy.routes import deployment_callbacks
+from app.provisioning.routes import provisioning_callbacks
+from app.workflows import client as workflow_client
+from app.workflows.backends import workflow_backend
+from app.workflows.outbox import dispatcher
+from app.workflows.schemas import CancelExecutionRequest, CancelExecutionResponse
+
+router = APIRouter(prefix="/workflows", tags=["workflows"])
+
+
+@router.get("/stats")
+async def workflow_stats(_: str = Depends(require_roles(ROLE_ADMIN))):
+    stats = {
+        "backend": WORKFLOW_BACKEND,
+        "client": workflow_client.stats(),
+        "outbox": await run_in_threadpool(dispatcher.stats),
+        "callbacks": {
+            "provisioning": provisioning_callbacks.stats(),
+            "deployment": deployment_callbacks.stats(),
+        },
+    }
+    if WORKFLOW_BACKEND == "local":
+        stats["local"] = workflow_backend.stats()
+    return stats
+
+
+@router.post("/executions/cancel", response_model=CancelExecutionResponse, status_code=status.HTTP_202_ACCEPTED)
+async def cancel_execution(payload: CancelExecutionRequest, _: str = Depends(require_roles(ROLE_ADMIN))):
+    # The run is marked failed once the backend reports it stopped, like any other failure.
+    result = await run_in_threadpool(workflow_backend.cancel, payload.execution_arn)
+    if result == "not_found":
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Execution not found or already finished")
+    return CancelExecutionResponse(execution_arn=payload.execution_arn, status=result)
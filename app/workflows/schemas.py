@@ -0,0 +1,29 @@
+from typing import List
+
+from pydantic import BaseModel, Field
+
+
+class CallbackError(BaseModel):
+    index: int
+    error: str
+
+
+class CallbackBatchResult(BaseModel):
+    applied: int = 0
+    errors: List[CallbackError] = Field(default_factory=list)
+
+
+def keep_execution_arn(previous, current):
+    # A coalesced callback without an ARN must not drop one reported by an earlier update.
+    if current.execution_arn or not previous.execution_arn:
+        return current
+    return current.model_copy(update={"execution_arn": previous.execution_arn})
+
+
+class CancelExecutionRequest(BaseModel):
+    execution_arn: str
+
+
+class CancelExecutionResponse(BaseModel):
+    execution_arn: str
+    status: str
@@ -0,0 +1,110 @@
+import json
+import math
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from bench.serve import QUERY_COUNT_HEADER
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+class Recorder:
+    """Latency, status and DB query count per endpoint label for one scenario."""
+
+    def __init__(self):
+        self._samples: dict[str, list[tuple[float, int, int | None]]] = defaultdict(list)
+        self._started = time.perf_counter()
+        self._finished: float | None = None
+
+    def record(self, label: str, seconds: float, status: int, headers=None) -> None:
+        queries = None
+        if headers is not None and QUERY_COUNT_HEADER in headers:
+            queries = int(headers[QUERY_COUNT_HEADER])
+        self._samples[label].append((seconds, status, queries))
+
+    def finish(self) -> None:
+        self._finished = time.perf_counter()
+
+    def summary(self) -> dict:
+        wall = (self._finished or time.perf_counter()) - self._started
+        endpoints = {}
+        for label, samples in sorted(self._samples.items()):
+            latencies = sorted(sample[0] * 1000 for sample in samples)
+            query_counts = [sample[2] for sample in samples if sample[2] is not None]
+            endpoints[label] = {
+                "requests": len(samples),
+                "errors": sum(1 for sample in samples if sample[1] >= 400 or sample[1] == 0),
+                "not_modified": sum(1 for sample in samples if sample[1] == 304),
+                "throughput_rps": len(samples) / wall if wall else 0.0,
+                "p50_ms": _percentile(latencies, 50),
+                "p95_ms": _percentile(latencies, 95),
+                "p99_ms": _percentile(latencies, 99),
+                "max_ms": latencies[-1] if latencies else 0.0,
+                "queries_per_request": sum(query_counts) / len(query_counts) if query_counts else None,
+            }
+        return {"duration_s": wall, "endpoints": endpoints}
+
+
+def save(results: dict, path: str) -> None:
+    Path(path).write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+
+
+def load(path: str) -> dict | None:
+    file = Path(path)
+    if not file.exists():
+        return None
+    return json.loads(file.read_text())
+
+
+def compare(current: dict, baseline: dict, tolerance: float, min_latency_ms: float = 2.0) -> list[str]:
+    """Regressions of `current` against `baseline`, as human-readable lines.
+
+    Latency and throughput are noisy, so they only count beyond `tolerance` (a fraction) and, for latency,
+    an absolute floor. Query counts are deterministic, so any growth beyond rounding is flagged.
+    """
+    regressions = []
+    for scenario, result in current["scenarios"].items():
+        base_endpoints = baseline.get("scenarios", {}).get(scenario, {}).get("endpoints", {})
+        for label, stats in result["endpoints"].items():
+            base = base_endpoints.get(label)
+            if base is None:
+                continue
+            where = f"{scenario} {label}"
+            for key in ("p95_ms", "p99_ms"):
+                if stats[key] > base[key] * (1 + tolerance) and stats[key] - base[key] > min_latency_ms:
+                    regressions.append(f"{where}: {key} {base[key]:.1f} -> {stats[key]:.1f}")
+            if stats["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+                regressions.append(
+                    f"{where}: throughput {base['throughput_rps']:.1f} -> {stats['throughput_rps']:.1f} req/s"
+                )
+            if stats["queries_per_request"] is not None and base.get("queries_per_request") is not None:
+                if stats["queries_per_request"] > base["queries_per_request"] + 0.5:
+                    regressions.append(
+                        f"{where}: queries/request {base['queries_per_request']:.2f} -> "
+                        f"{stats['queries_per_request']:.2f}"
+                    )
+            if stats["errors"] > base["errors"]:
+                regressions.append(f"{where}: errors {base['errors']} -> {stats['errors']}")
+    return regressions
+
+
+def render(results: dict) -> str:
+    lines = []
+    header = f"{'endpoint':<48} {'reqs':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'q/req':>6}"
+    for scenario, result in results["scenarios"].items():
+        lines.append(f"\n[{scenario}] {result['duration_s']:.1f}s")
+        lines.append(header)
+        for label, stats in result["endpoints"].items():
+            qpr = stats["queries_per_request"]
+            lines.append(
+                f"{label:<48} {stats['requests']:>7} {stats['errors']:>5} {stats['throughput_rps']:>8.1f} "
+                f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f} "
+                f"{'-' if qpr is None else f'{qpr:.2f}':>6}"
+            )
+    return "\n".join(lines)
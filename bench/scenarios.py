@@ -0,0 +1,209 @@
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+from bench.report import Recorder
+
+CALLBACK_TOKEN_HEADER = "X-Callback-Token"
+
+
+async def _timed(client: httpx.AsyncClient, recorder: Recorder, label: str, method: str, url: str, **kwargs):
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError:
+        recorder.record(label, time.perf_counter() - started, 0)
+        return None
+    recorder.record(label, time.perf_counter() - started, response.status_code, response.headers)
+    return response
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> dict:
+    response = await client.post("/auth/login", json={"username": username, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['token']}"}
+
+
+def _service_line(index: int, tenants: int) -> str:
+    return json.dumps(
+        {
+            "name": f"bench-svc-{index}",
+            "repo_url": f"https://example.invalid/bench/svc-{index}.git",
+            "owner_team": f"team-{index % 25}",
+            "runtime": "go" if index % 2 else "python",
+            "tier": ("gold", "silver", "bronze")[index % 3],
+            "environments": ["dev", "prod"],
+            "tenant": f"tenant-{index % tenants}",
+            "observability_enabled": index % 4 == 0,
+        }
+    )
+
+
+async def seed_services(client: httpx.AsyncClient, admin: dict, start: int, stop: int, tenants: int = 50) -> None:
+    """Create services [start, stop) through the NDJSON bulk endpoint."""
+    chunk = 5000
+    for offset in range(start, stop, chunk):
+        body = "\n".join(_service_line(index, tenants) for index in range(offset, min(offset + chunk, stop)))
+        response = await client.post("/services:bulk", content=body.encode(), headers=admin, timeout=300)
+        response.raise_for_status()
+        if response.json()["failed"]:
+            raise RuntimeError(f"Seeding failed: {response.json()['errors'][:3]}")
+
+
+async def _until(deadline: float, worker):
+    while time.perf_counter() < deadline:
+        await worker()
+
+
+async def catalog(client: httpx.AsyncClient, viewer: dict, service_count: int, duration: float, concurrency: int):
+    """Browsing mix: 70% service detail, 30% list pages at random cursors, revalidating with ETags like a browser."""
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+
+    def worker_factory():
+        etags: dict[str, str] = {}
+
+        async def one():
+            if random.random() < 0.7:
+                label, url = "GET /services/{id}", f"/services/{random.randint(1, service_count)}"
+            else:
+                label = "GET /services?limit=100"
+                url = f"/services?limit=100&cursor={random.randint(0, max(service_count - 100, 0))}"
+            headers = dict(viewer)
+            if url in etags:
+                headers["If-None-Match"] = etags[url]
+            response = await _timed(client, recorder, label, "GET", url, headers=headers)
+            if response is not None and "etag" in response.headers:
+                etags[url] = response.headers["etag"]
+
+        return one
+
+    await asyncio.gather(*(_until(deadline, worker_factory()) for _ in range(concurrency)))
+    recorder.finish()
+    return recorder
+
+
+def _search_term(service_count: int) -> str:
+    index = random.randint(0, max(service_count - 1, 0))
+    return random.choice(
+        (
+            f"bench-svc-{index}",  # exact name
+            f"svc-{str(index)[:3]}",  # prefix shared by many services
+            f"team-{index % 25}",
+            f"tenat-{index % 50}",  # typo: fuzzy match only
+        )
+    )
+
+
+async def search(client: httpx.AsyncClient, viewer: dict, service_count: int, duration: float, concurrency: int):
+    """Catalog search with a mix of exact, prefix, team and misspelled tenant terms."""
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+
+    async def one():
+        await _timed(
+            client, recorder, "GET /services/search", "GET", "/services/search",
+            params={"q": _search_term(service_count)}, headers=viewer,
+        )
+
+    await asyncio.gather(*(_until(deadline, one) for _ in range(concurrency)))
+    recorder.finish()
+    return recorder
+
+
+async def polling(
+    client: httpx.AsyncClient, viewer: dict, service_ids: list[int], duration: float, viewers: int, interval: float
+):
+    """N open portal tabs, each polling one service's provisioning and deploy status every `interval` seconds."""
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+
+    async def viewer_loop():
+        service_id = random.choice(service_ids)
+        await asyncio.sleep(random.uniform(0, interval))
+        while time.perf_counter() < deadline:
+            tick = time.perf_counter()
+            await asyncio.gather(
+                _timed(
+                    client, recorder, "GET /services/{id}/actions/status", "GET",
+                    f"/services/{service_id}/actions/status", headers=viewer,
+                ),
+                _timed(
+                    client, recorder, "GET /services/{id}/actions/deploy/status", "GET",
+                    f"/services/{service_id}/actions/deploy/status", headers=viewer,
+                ),
+            )
+            await asyncio.sleep(max(interval - (time.perf_counter() - tick), 0))
+
+    await asyncio.gather(*(viewer_loop() for _ in range(viewers)))
+    recorder.finish()
+    return recorder
+
+
+async def deploy_burst(client: httpx.AsyncClient, developer: dict, service_count: int, burst: int):
+    """`burst` simultaneous deploy clicks on distinct services.
+
+    Returns the recorder, the deployed service ids and the created deployment ids.
+    """
+    recorder = Recorder()
+    service_ids = random.sample(range(1, service_count + 1), min(burst, service_count))
+    responses = await asyncio.gather(
+        *(
+            _timed(
+                client, recorder, "POST /services/{id}/actions/deploy", "POST",
+                f"/services/{service_id}/actions/deploy", json={"environment": "dev"}, headers=developer,
+            )
+            for service_id in service_ids
+        )
+    )
+    recorder.finish()
+    accepted = [
+        (service_id, r.json()["deployment_id"])
+        for service_id, r in zip(service_ids, responses)
+        if r is not None and r.status_code == 202
+    ]
+    return recorder, [service_id for service_id, _ in accepted], [deployment_id for _, deployment_id in accepted]
+
+
+async def callback_flood(
+    client: httpx.AsyncClient, token: str, deployment_ids: list[int], concurrency: int, batch_size: int
+):
+    """Deploy runners reporting back as infra/deployer/deploy.sh does: progress, then the terminal status.
+
+    The same updates are then replayed through the batch endpoint in chunks of `batch_size`.
+    """
+    recorder = Recorder()
+    headers = {CALLBACK_TOKEN_HEADER: token}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def runner(deployment_id: int):
+        async with semaphore:
+            for status, detail in (("in_progress", "Rolling out"), ("succeeded", "Deployment rollout succeeded")):
+                await _timed(
+                    client, recorder, "POST /services/deployments/callback", "POST",
+                    "/services/deployments/callback",
+                    json={"deployment_id": deployment_id, "status": status, "detail": detail}, headers=headers,
+                )
+
+    await asyncio.gather(*(runner(deployment_id) for deployment_id in deployment_ids))
+
+    updates = [
+        {"deployment_id": deployment_id, "status": status, "detail": detail}
+        for deployment_id in deployment_ids
+        for status, detail in (("in_progress", "Rolling out"), ("succeeded", "Deployment rollout succeeded"))
+    ]
+    chunks = [updates[i : i + batch_size] for i in range(0, len(updates), batch_size)]
+
+    async def batch(chunk):
+        async with semaphore:
+            await _timed(
+                client, recorder, "POST /services/deployments/callbacks:batch", "POST",
+                "/services/deployments/callbacks:batch", json=chunk, headers=headers,
+            )
+
+    await asyncio.gather(*(batch(chunk) for chunk in chunks))
+    recorder.finish()
+    return recorder
@@ -0,0 +1,86 @@
+"""Run the app for benchmarking: stub Step Functions, optional SQLite stand-in, per-request query counts.
+
+Usage: python -m bench.serve --port 8765 [--sfn-latency 0.05]
+The database comes from DB_URL/DB_ASYNC as usual; configuration must be in the environment before start.
+"""
+import argparse
+from contextvars import ContextVar
+
+QUERY_COUNT_HEADER = "x-bench-queries"
+
+_queries: ContextVar[list | None] = ContextVar("bench_queries", default=None)
+
+
+def _count_query(*_args, **_kwargs) -> None:
+    counter = _queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+class QueryCountMiddleware:
+    # Pure ASGI so the counter's context reaches the threadpool and run_sync workers that execute the queries.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        counter = [0]
+        token = _queries.set(counter)
+
+        async def send_with_count(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((QUERY_COUNT_HEADER.encode(), str(counter[0]).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_count)
+        finally:
+            _queries.reset(token)
+
+
+def build_app(sfn_latency: float, sfn_run_seconds: float):
+    from sqlalchemy import event
+
+    from app import db as app_db
+    from app.main import app
+    from app.workflows import client as workflow_client
+
+    from bench.stubs import StubStepFunctions
+
+    workflow_client._client = StubStepFunctions(sfn_latency, sfn_run_seconds)
+    # The reconciler only starts when boto3 is importable; the stub stands in for it.
+    workflow_client.available = lambda: True
+    event.listen(app_db.engine, "before_cursor_execute", _count_query)
+    if app_db.DB_ASYNC:
+        event.listen(app_db.async_engine.sync_engine, "before_cursor_execute", _count_query)
+    app.add_middleware(QueryCountMiddleware)
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--sfn-latency", type=float, default=0.05, help="seconds per stubbed Step Functions call")
+    parser.add_argument("--sfn-run-seconds", type=float, default=30.0, help="stubbed execution duration")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    # Long keep-alive, like a load balancer's pooled upstream connections; uvicorn's 5s default races the
+    # bench client reusing connections that idled through seeding.
+    uvicorn.run(
+        build_app(args.sfn_latency, args.sfn_run_seconds),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+        timeout_keep_alive=75,
+    )
+
+
+if __name__ == "__main__":
+    main()
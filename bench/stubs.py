@@ -0,0 +1,31 @@
+import threading
+import time
+import uuid
+
+from app.workflows.client import execution_arn_for
+
+
+class StubStepFunctions:
+    """Stands in for the boto3 Step Functions client: fixed latency, executions succeed after `run_seconds`."""
+
+    def __init__(self, latency: float = 0.05, run_seconds: float = 30.0):
+        self.latency = latency
+        self.run_seconds = run_seconds
+        self._started: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def start_execution(self, stateMachineArn: str, input: str, name: str | None = None) -> dict:
+        time.sleep(self.latency)
+        arn = execution_arn_for(stateMachineArn, name or uuid.uuid4().hex)
+        with self._lock:
+            self._started.setdefault(arn, time.monotonic())
+        return {"executionArn": arn}
+
+    def describe_execution(self, executionArn: str) -> dict:
+        time.sleep(self.latency)
+        with self._lock:
+            started = self._started.get(executionArn)
+        if started is None:
+            return {"executionArn": executionArn, "status": "FAILED", "error": "ExecutionDoesNotExist"}
+        status = "SUCCEEDED" if time.monotonic() - started >= self.run_seconds else "RUNNING"
+        return {"executionArn": executionArn, "status": status}
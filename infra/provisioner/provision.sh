@@ -22,7 +22,8 @@ send_callback() {
     --arg status "$status" \
     --arg detail "$detail" \
     --argjson service_id "${SERVICE_ID:-0}" \
-    '{tenant: $tenant, action: $action, status: $status, detail: $detail, service_id: $service_id}')
+    --argjson request_id "${REQUEST_ID:-null}" \
+    '{tenant: $tenant, action: $action, status: $status, detail: $detail, service_id: $service_id, request_id: $request_id}')
   curl -sS -X POST "$PROVISIONING_API_URL/provisioning/callback" \
     -H "Content-Type: application/json" \
     -H "X-Callback-Token: $PROVISIONING_CALLBACK_TOKEN" \
@@ -0,0 +1,64 @@
+import os
+import tempfile
+
+import pytest
+
+# Before any app import: app.db builds its engines from these at import time.
+os.environ["DB_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='idp-tests-')}/idp.db"
+
+from app.db import Base, SessionLocal, engine  # noqa: E402
+from app.migrations import migrate  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    migrate(engine)
+
+
+@pytest.fixture(autouse=True)
+def empty_tables():
+    yield
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    # Tenants, cached responses and tokens of rows that are gone.
+    from app.core.invalidation import resync
+
+    resync()
+
+
+@pytest.fixture
+def db():
+    with SessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+def client():
+    # No `with`: startup would start the background workers, which tests drive by hand instead.
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    return TestClient(app)
+
+
+def login(client, username: str) -> dict:
+    token = client.post("/auth/login", json={"username": username, "password": username}).json()["token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def create_service(client, headers: dict, **fields) -> dict:
+    payload = {
+        "name": "svc",
+        "repo_url": "https://git.example.com/svc",
+        "owner_team": "team",
+        "runtime": "go",
+        "tier": "gold",
+        "environments": ["dev", "prod"],
+        "tenant": "tenant",
+        **fields,
+    }
+    response = client.post("/services", json=payload, headers=headers)
+    assert response.status_code == 201, response.text
+    return response.json()
@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.auth.utils import AuthContext
+from app.workflows import admission
+
+CTX = AuthContext("dev", "developer")
+
+
+@pytest.fixture(autouse=True)
+def limits(monkeypatch):
+    monkeypatch.setattr(admission, "ACTION_RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(admission, "ACTION_RATE_LIMIT_USER", {"*": (1.0, 5.0)})
+    monkeypatch.setattr(admission, "ACTION_RATE_LIMIT_TENANT", {"gold": (1.0, 4.0), "*": (0.5, 2.0)})
+    monkeypatch.setattr(admission, "WORKFLOW_MAX_IN_FLIGHT", 0)
+    monkeypatch.setattr(admission, "buckets", admission.MemoryBuckets())
+
+
+def _services(*tenants_and_tiers):
+    return [SimpleNamespace(tenant=tenant, tier=tier) for tenant, tier in tenants_and_tiers]
+
+
+def test_batch_charges_a_token_per_service():
+    services = _services(("a", "gold"), ("b", "bronze"), ("a", "bronze"))
+    assert admission.action_buckets(CTX, services) == [
+        ("tenant", "tenant:a", 1.0, 4.0, 2),
+        ("tenant", "tenant:b", 0.5, 2.0, 1),
+        ("user", "user:dev", 1.0, 5.0, 3),
+    ]
+
+
+def test_short_bucket_rejects_the_whole_batch():
+    admission.admit(None, CTX, _services(("a", "gold"), ("a", "gold"), ("a", "gold")))
+    with pytest.raises(HTTPException) as rejected:
+        admission.admit(None, CTX, _services(("b", "gold"), ("a", "gold"), ("a", "gold")))
+    assert rejected.value.status_code == 429
+    assert rejected.value.headers["Retry-After"] == "1"
+    # The rejected batch took nothing from tenant b or the user, so this one still fits.
+    admission.admit(None, CTX, _services(("b", "gold"), ("b", "gold")))
+
+
+def test_batch_larger_than_burst_is_refused():
+    with pytest.raises(HTTPException) as rejected:
+        admission.admit(None, CTX, _services(*[("a", "bronze")] * 3))
+    assert rejected.value.status_code == 400
+    assert "tenant a" in rejected.value.detail
@@ -0,0 +1,33 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app.auth import utils
+from app.core.config import JWT_ALG, JWT_SECRET
+
+
+@pytest.fixture(autouse=True)
+def revocation_checks(monkeypatch):
+    monkeypatch.setattr(utils, "_revocation_checks", [])
+    utils._token_cache.clear()
+
+
+def _parse(token: str) -> utils.AuthContext:
+    return asyncio.run(utils.parse_token(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)))
+
+
+def test_revocation_check_applies_to_cached_tokens():
+    token = utils.create_token("dev", utils.ROLE_DEVELOPER, JWT_SECRET, JWT_ALG, 3600)
+    logged_out = set()
+    utils.register_revocation_check(lambda claims: claims["sub"] in logged_out)
+
+    assert _parse(token).username == "dev"
+    assert utils._token_cache.get(utils.token_digest(token), 0) is not None
+
+    logged_out.add("dev")
+    with pytest.raises(HTTPException) as rejected:
+        _parse(token)
+    assert rejected.value.status_code == 401
+    assert utils._token_cache.get(utils.token_digest(token), 0) is None
@@ -0,0 +1,29 @@
+import asyncio
+
+from app.core.coalescer import WriteBehindCoalescer
+
+
+def test_failed_flush_keeps_updates_under_newer_ones():
+    applied = []
+
+    def apply(items):
+        if not applied:
+            applied.append(None)
+            # A newer update for "a" arrives while the failing batch is being written.
+            coalescer.submit("a", {"status": "succeeded", "arn": None})
+            raise RuntimeError("database unavailable")
+        applied.append(items)
+
+    def merge(previous, item):
+        return {**item, "arn": item["arn"] or previous["arn"]}
+
+    coalescer = WriteBehindCoalescer("test", apply, 1.0, merge=merge)
+    coalescer.submit("a", {"status": "in_progress", "arn": "arn:1"})
+    coalescer.submit("b", {"status": "failed", "arn": None})
+
+    assert asyncio.run(coalescer.flush()) == 0
+    assert coalescer.stats()["pending"] == 2
+    assert asyncio.run(coalescer.flush()) == 2
+    assert applied[1] == [{"status": "failed", "arn": None}, {"status": "succeeded", "arn": "arn:1"}]
+    stats = coalescer.stats()
+    assert (stats["pending"], stats["requeued"], stats["flushed"]) == (0, 2, 2)
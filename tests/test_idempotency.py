@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select, update
+
+from app.idempotency.models import IdempotencyKeyModel
+from app.idempotency.service import REPLAYED_HEADER
+from app.provisioning.models import ProvisionRequestModel
+from app.workflows import admission
+from tests.conftest import create_service, login
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limits(monkeypatch):
+    monkeypatch.setattr(admission, "ACTION_RATE_LIMIT_ENABLED", False)
+
+
+@pytest.fixture
+def dev(client):
+    return login(client, "dev")
+
+
+@pytest.fixture
+def admin(client):
+    return login(client, "admin")
+
+
+def _provision(client, headers, service_id, key=None, action="provision"):
+    if key is not None:
+        headers = {**headers, "Idempotency-Key": key}
+    return client.post(f"/services/{service_id}/actions/{action}", headers=headers)
+
+
+def _requests(db) -> int:
+    return db.execute(select(func.count()).select_from(ProvisionRequestModel)).scalar_one()
+
+
+def test_retry_replays_the_stored_response(client, db, dev, admin):
+    service = create_service(client, admin)
+    first = _provision(client, dev, service["id"], key="k1")
+    assert first.status_code == 202 and REPLAYED_HEADER not in first.headers
+
+    retry = _provision(client, dev, service["id"], key="k1")
+    assert retry.status_code == 202
+    assert retry.headers[REPLAYED_HEADER] == "true"
+    assert retry.content == first.content
+    assert _requests(db) == 1
+
+
+def test_key_reused_for_another_request_is_refused(client, dev, admin):
+    one, other = create_service(client, admin, name="one"), create_service(client, admin, name="other")
+    assert _provision(client, dev, one["id"], key="k1").status_code == 202
+
+    assert _provision(client, dev, other["id"], key="k1").status_code == 422
+    assert _provision(client, dev, one["id"], key="k1", action="deprovision").status_code == 422
+    # Keys are per user: another user's identical key is a new request.
+    assert _provision(client, admin, other["id"], key="k1").status_code == 202
+
+
+def test_key_still_in_progress_conflicts(client, db, dev, admin):
+    service = create_service(client, admin)
+    now = datetime.now(timezone.utc)
+    db.add(
+        IdempotencyKeyModel(
+            principal="dev", key="k1", fingerprint="x", created_at=now, expires_at=now + timedelta(hours=1)
+        )
+    )
+    db.commit()
+
+    response = _provision(client, dev, service["id"], key="k1")
+    assert response.status_code == 409
+    assert "in progress" in response.json()["detail"]
+
+
+def test_expired_key_is_taken_over(client, db, dev, admin):
+    one, other = create_service(client, admin, name="one"), create_service(client, admin, name="other")
+    assert _provision(client, dev, one["id"], key="k1").status_code == 202
+    db.execute(update(IdempotencyKeyModel).values(expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)))
+    db.commit()
+
+    taken = _provision(client, dev, other["id"], key="k1")
+    assert taken.status_code == 202 and REPLAYED_HEADER not in taken.headers
+    assert taken.json()["service_id"] == other["id"]
+    # The key now belongs to the new request.
+    assert _provision(client, dev, other["id"], key="k1").headers[REPLAYED_HEADER] == "true"
+    assert _provision(client, dev, one["id"], key="k1").status_code == 422
+
+
+def test_same_action_joins_the_run_in_flight(client, db, dev, admin):
+    service = create_service(client, admin)
+    first = _provision(client, dev, service["id"])
+    assert first.status_code == 202 and first.json()["coalesced"] is False
+
+    joined = _provision(client, dev, service["id"])
+    assert joined.status_code == 202
+    assert joined.json()["coalesced"] is True
+    assert joined.json()["status"] == "queued"
+    assert _requests(db) == 1
+
+    other_action = _provision(client, dev, service["id"], action="deprovision")
+    assert other_action.status_code == 409
+    assert other_action.json()["detail"] == "Provisioning is already queued for this service"
+    assert _requests(db) == 1
@@ -0,0 +1,16 @@
+from app.core.metrics import _match_route, _route_label
+from app.main import app
+
+
+def _scope(method: str, path: str) -> dict:
+    return {"type": "http", "app": app, "method": method, "root_path": "", "path": path}
+
+
+def test_route_label_is_the_template_and_cached():
+    _match_route.cache_clear()
+    assert _route_label(_scope("GET", "/services/5")) == "/services/{service_id}"
+    assert _route_label(_scope("GET", "/services/5")) == "/services/{service_id}"
+    assert _match_route.cache_info().hits == 1
+    assert _route_label(_scope("POST", "/services/6/actions/deploy")) == "/services/{service_id}/actions/deploy"
+    # Anything else falls through to the frontend mount.
+    assert _route_label(_scope("GET", "/no/such/route")) == "frontend"
@@ -0,0 +1,147 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import update
+
+from app.overview.service import rebuild_overview
+from app.provisioning.models import ProvisionRequestModel
+from app.provisioning.tenants import tenant_registry
+from app.services.models import ServiceModel
+from app.workflows import backends, client as workflow_client, outbox
+from app.workflows.models import WorkflowOutboxModel
+from bench.stubs import StubStepFunctions
+
+STATE_MACHINE_ARN = "arn:aws:states:us-east-1:000000000000:stateMachine:tests-provision"
+
+
+class StubClientError(Exception):
+    """Shaped like botocore's ClientError, which is all the outbox and breaker look at."""
+
+    def __init__(self, code: str, status: int = 500):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}, "ResponseMetadata": {"HTTPStatusCode": status}}
+
+
+class FlakyStepFunctions(StubStepFunctions):
+    def __init__(self, *errors: Exception):
+        super().__init__(latency=0)
+        self.errors = list(errors)
+        self.calls = 0
+
+    def start_execution(self, stateMachineArn: str, input: str, name: str | None = None) -> dict:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return super().start_execution(stateMachineArn, input, name)
+
+
+@pytest.fixture
+def step_functions(monkeypatch):
+    def install(*errors: Exception) -> FlakyStepFunctions:
+        stub = FlakyStepFunctions(*errors)
+        monkeypatch.setattr(backends, "STEP_FUNCTION_ARN", STATE_MACHINE_ARN)
+        monkeypatch.setattr(workflow_client, "_client", stub)
+        # A fresh breaker that stays closed: these tests are about the outbox, not the breaker.
+        monkeypatch.setattr(workflow_client, "breaker", workflow_client.CircuitBreaker(1000, 60))
+        return stub
+
+    return install
+
+
+@pytest.fixture
+def queued(db):
+    tenant_registry.ensure(db, "outbox")
+    service = ServiceModel(
+        name="outboxed", repo_url="r", owner_team="team", runtime="go", tier="gold", tenant="outbox",
+        provision_status="in_progress", provision_detail="Provisioning queued",
+    )
+    db.add(service)
+    db.flush()
+    request = ProvisionRequestModel(service_id=service.id, tenant="outbox", action="provision", status="queued")
+    db.add(request)
+    db.flush()
+    row = outbox.enqueue_workflow(db, "provision", request.id)
+    rebuild_overview(db)
+    db.commit()
+    return request.id, row.id
+
+
+def _dispatch(max_attempts: int = 3) -> int:
+    return asyncio.run(outbox.OutboxDispatcher(max_attempts=max_attempts).dispatch_once())
+
+
+def _make_due(db, outbox_id: int) -> None:
+    db.execute(
+        update(WorkflowOutboxModel)
+        .where(WorkflowOutboxModel.id == outbox_id)
+        .values(next_attempt_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+    )
+    db.commit()
+
+
+def _state(db, request_id: int, outbox_id: int) -> tuple[ProvisionRequestModel, WorkflowOutboxModel]:
+    db.expire_all()
+    return db.get(ProvisionRequestModel, request_id), db.get(WorkflowOutboxModel, outbox_id)
+
+
+def _retry_in(row: WorkflowOutboxModel) -> float:
+    return (outbox._as_utc(row.next_attempt_at) - datetime.now(timezone.utc)).total_seconds()
+
+
+def test_failed_start_backs_off_then_fails(db, queued, step_functions):
+    request_id, outbox_id = queued
+    stub = step_functions(*(StubClientError("ServiceUnavailable") for _ in range(3)))
+
+    for attempt in (1, 2):
+        assert _dispatch() == 1
+        request, row = _state(db, request_id, outbox_id)
+        assert (row.status, row.attempts, request.status) == ("pending", attempt, "queued")
+        assert row.last_error == "ServiceUnavailable"
+        delay = outbox.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+        assert delay - 1 < _retry_in(row) <= delay
+        # Not due again until the backoff has passed.
+        assert _dispatch() == 0
+        _make_due(db, outbox_id)
+
+    assert _dispatch() == 1
+    request, row = _state(db, request_id, outbox_id)
+    assert (row.status, row.attempts, request.status) == ("failed", 3, "failed")
+    assert request.execution_arn is None
+    assert stub.calls == 3
+    _make_due(db, outbox_id)
+    assert _dispatch() == 0
+
+
+def test_throttled_start_keeps_its_attempts(db, queued, step_functions):
+    request_id, outbox_id = queued
+    stub = step_functions(*(StubClientError("ThrottlingException", 400) for _ in range(3)))
+
+    for _ in range(3):
+        assert _dispatch(max_attempts=1) == 1
+        request, row = _state(db, request_id, outbox_id)
+        assert (row.status, row.attempts, request.status) == ("pending", 0, "queued")
+        _make_due(db, outbox_id)
+
+    assert _dispatch(max_attempts=1) == 1
+    request, row = _state(db, request_id, outbox_id)
+    assert (row.status, row.attempts, request.status) == ("dispatched", 1, "in_progress")
+    assert request.execution_arn == workflow_client.execution_arn_for(STATE_MACHINE_ARN, row.execution_name)
+    assert stub.calls == 4
+
+
+def test_expired_lease_is_claimed_again(db, queued, step_functions):
+    request_id, outbox_id = queued
+    step_functions()
+
+    # A dispatcher claims the row and dies before recording the result.
+    [claim] = outbox._claim_batch(10)
+    assert (claim.outbox_id, claim.attempts) == (outbox_id, 1)
+    assert outbox._claim_batch(10) == []
+    assert _dispatch() == 0
+
+    _make_due(db, outbox_id)
+    assert _dispatch() == 1
+    request, row = _state(db, request_id, outbox_id)
+    assert (row.status, row.attempts, request.status) == ("dispatched", 2, "in_progress")
+    assert request.execution_arn.endswith(f":{row.execution_name}")
@@ -0,0 +1,89 @@
+import pytest
+from sqlalchemy import select
+
+from app.db import SessionLocal
+from app.overview.models import OverviewCountModel
+from app.overview.service import rebuild_overview
+from app.provisioning.models import ProvisionRequestModel
+from app.workflows import admission
+from tests.conftest import create_service, login
+
+CALLBACK_HEADERS = {"X-Callback-Token": "dev-callback-token"}
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limits(monkeypatch):
+    monkeypatch.setattr(admission, "ACTION_RATE_LIMIT_ENABLED", False)
+
+
+def _counts(db) -> dict:
+    # Incremental writes leave zero rows behind where a rebuild has none.
+    rows = db.execute(select(OverviewCountModel)).scalars()
+    return {(r.tenant, r.owner_team, r.metric, r.environment, r.bucket): r.count for r in rows if r.count}
+
+
+def _assert_matches_rebuild() -> None:
+    with SessionLocal() as db:
+        maintained = _counts(db)
+        rebuild_overview(db)
+        assert maintained == _counts(db)
+        db.rollback()
+
+
+def _provision(client, headers, service: dict, status: str) -> None:
+    with SessionLocal() as db:
+        request_id = db.execute(
+            select(ProvisionRequestModel.id).where(ProvisionRequestModel.service_id == service["id"])
+            .order_by(ProvisionRequestModel.id.desc()).limit(1)
+        ).scalar_one()
+    payload = {"service_id": service["id"], "request_id": request_id, "tenant": service["tenant"], "status": status}
+    response = client.post("/provisioning/callback", json=payload, headers=headers)
+    assert response.status_code == 200, response.text
+
+
+def _deploy(client, headers, deployment_id: int, status: str) -> None:
+    payload = {"deployment_id": deployment_id, "status": status}
+    response = client.post("/services/deployments/callback", json=payload, headers=headers)
+    assert response.status_code == 200, response.text
+
+
+def test_maintained_counters_match_a_rebuild(client):
+    admin, dev = login(client, "admin"), login(client, "dev")
+    service = create_service(client, admin, name="tracked")
+    create_service(client, admin, name="bystander", tenant="other", observability_enabled=True)
+    _assert_matches_rebuild()
+
+    assert client.post(f"/services/{service['id']}/actions/provision", headers=dev).status_code == 202
+    _assert_matches_rebuild()
+    _provision(client, CALLBACK_HEADERS, service, "in_progress")
+    _provision(client, CALLBACK_HEADERS, service, "succeeded")
+    _assert_matches_rebuild()
+
+    deployments = {}
+    for environment in ("dev", "prod"):
+        response = client.post(
+            f"/services/{service['id']}/actions/deploy", json={"environment": environment}, headers=dev
+        )
+        assert response.status_code == 202, response.text
+        deployments[environment] = response.json()["deployment_id"]
+        _assert_matches_rebuild()
+    _deploy(client, CALLBACK_HEADERS, deployments["dev"], "in_progress")
+    _deploy(client, CALLBACK_HEADERS, deployments["dev"], "succeeded")
+    _deploy(client, CALLBACK_HEADERS, deployments["prod"], "failed")
+    _assert_matches_rebuild()
+
+    # A redeploy replaces the environment's latest status; the superseded deployment's late callback must not count.
+    response = client.post(f"/services/{service['id']}/actions/deploy", json={"environment": "prod"}, headers=dev)
+    assert response.status_code == 202, response.text
+    _deploy(client, CALLBACK_HEADERS, deployments["prod"], "succeeded")
+    _assert_matches_rebuild()
+
+    moved = {**service, "owner_team": "platform", "observability_enabled": True}
+    moved = {key: value for key, value in moved.items() if key not in ("id", "provision_status", "provision_detail")}
+    assert client.put(f"/services/{service['id']}", json=moved, headers=admin).status_code == 200
+    _assert_matches_rebuild()
+
+    assert client.delete(f"/services/{service['id']}", headers=admin).status_code == 204
+    _assert_matches_rebuild()
+    with SessionLocal() as db:
+        assert {key[0] for key in _counts(db)} == {"other"}
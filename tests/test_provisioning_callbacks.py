@@ -0,0 +1,91 @@
+import pytest
+from sqlalchemy import select
+
+from app.db import SessionLocal
+from app.overview.models import OverviewCountModel
+from app.overview.service import rebuild_overview
+from app.provisioning import routes as provisioning_routes
+from app.provisioning.models import ProvisionRequestModel, TenantModel
+from app.provisioning.schemas import ProvisionCallback
+from app.provisioning.service import mark_request_started
+from app.provisioning.tenants import tenant_registry
+from app.services.models import ServiceModel
+
+
+@pytest.fixture
+def provisioning(db):
+    tenant = tenant_registry.ensure(db, "racing")
+    service = ServiceModel(
+        name="racer", repo_url="r", owner_team="team", runtime="go", tier="gold", tenant="racing",
+        provision_status="in_progress", provision_detail="Provisioning started",
+    )
+    db.add(service)
+    db.flush()
+    request = ProvisionRequestModel(service_id=service.id, tenant="racing", action="provision", status="in_progress")
+    db.add(request)
+    rebuild_overview(db)
+    db.commit()
+    return tenant, service.id, request.id
+
+
+def _callback(service_id: int, request_id: int, status: str) -> ProvisionCallback:
+    return ProvisionCallback(
+        service_id=service_id, request_id=request_id, tenant="racing", status=status, detail=f"Provisioning {status}"
+    )
+
+
+def test_racing_callbacks_both_land(db, provisioning, monkeypatch):
+    tenant, service_id, request_id = provisioning
+    lookup_many = tenant_registry.lookup_many
+
+    def lookup_then_race(session, names):
+        # The first callback has read the service; the second one commits before it writes anything.
+        monkeypatch.setattr(tenant_registry, "lookup_many", lookup_many)
+        with SessionLocal() as other:
+            result = provisioning_routes._apply_provisioning_callbacks(
+                other, [_callback(service_id, request_id, "failed")]
+            )
+        assert result.applied == 1
+        return lookup_many(session, names)
+
+    monkeypatch.setattr(tenant_registry, "lookup_many", lookup_then_race)
+    with SessionLocal() as session:
+        result = provisioning_routes._apply_provisioning_callbacks(
+            session, [_callback(service_id, request_id, "succeeded")]
+        )
+    assert result.applied == 1 and not result.errors
+
+    db.expire_all()
+    service = db.get(ServiceModel, service_id)
+    assert (service.provision_status, service.provision_detail, service.version) == (
+        "succeeded", "Provisioning succeeded", 2,
+    )
+    request = db.get(ProvisionRequestModel, request_id)
+    assert (request.status, request.version) == ("succeeded", 2)
+    tenant_row = db.get(TenantModel, tenant.id)
+    assert (tenant_row.status, tenant_row.version) == ("succeeded", 2)
+    # in_progress -> failed -> succeeded: each callback moved the counters from the status it actually replaced.
+    counts = dict(
+        db.execute(
+            select(OverviewCountModel.bucket, OverviewCountModel.count).where(
+                OverviewCountModel.tenant == "racing", OverviewCountModel.metric == "provision"
+            )
+        ).all()
+    )
+    assert {bucket: count for bucket, count in counts.items() if count} == {"succeeded": 1}
+
+
+def test_started_mark_yields_to_callback(db, provisioning):
+    _, service_id, request_id = provisioning
+    with SessionLocal() as outbox:
+        request = outbox.get(ProvisionRequestModel, request_id)
+        outbox.get(ServiceModel, service_id)
+        with SessionLocal() as other:
+            provisioning_routes._apply_provisioning_callbacks(other, [_callback(service_id, request_id, "succeeded")])
+        assert mark_request_started(outbox, request, "arn:started") is None
+        outbox.commit()
+
+    db.expire_all()
+    request = db.get(ProvisionRequestModel, request_id)
+    assert (request.status, request.execution_arn) == ("succeeded", "arn:started")
+    assert db.get(ServiceModel, service_id).provision_status == "succeeded"
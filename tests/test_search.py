@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+from app.core.config import SERVICES_SEARCH_SIMILARITY
+from app.services.search import ServiceSearchIndex, normalize_query, trigrams
+
+# Few letters and short words, so documents share trigrams heavily and rankings tie often.
+_LETTERS = "abcde"
+
+
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choice(_LETTERS) for _ in range(rng.randint(1, 6)))
+
+
+def _query_word(rng: random.Random) -> str:
+    # Words most documents share give long trigram lists, which the index probes instead of counting.
+    return rng.choice(["git", "example", "team", _word(rng), _word(rng)])
+
+
+def _fields(rng: random.Random) -> tuple[str, str, str, str]:
+    name = "-".join(_word(rng) for _ in range(rng.randint(1, 3)))
+    return name, rng.choice(["team", "ab", "cde"]), _word(rng), f"https://git.example.com/{_word(rng)}"
+
+
+def _brute_force(documents: dict[int, tuple], query: str, offset: int, limit: int) -> list[int]:
+    grams = trigrams(query)
+    if not grams:
+        return []
+    scored = []
+    for service_id, fields in documents.items():
+        shared = len(grams & trigrams(" ".join(fields)))
+        if shared >= SERVICES_SEARCH_SIMILARITY * len(grams):
+            scored.append((-shared, service_id))
+    return [service_id for _, service_id in sorted(scored)[offset : offset + limit]]
+
+
+@pytest.fixture
+def index(db):
+    index = ServiceSearchIndex(ttl=float("inf"))
+    # Loads the (empty) table once; from then on put/remove maintain it.
+    assert index.search(db, "anything", 0, 1) == []
+    return index
+
+
+def test_pruned_search_matches_brute_force(db, index):
+    rng = random.Random(1234)
+    documents: dict[int, tuple] = {}
+    for case in range(400):
+        if case % 20 == 0:
+            for service_id in list(documents):
+                index.remove(service_id)
+            documents = {service_id: _fields(rng) for service_id in range(1, rng.randint(1, 120))}
+            for service_id, fields in documents.items():
+                index.put(service_id, *fields)
+        query = normalize_query(" ".join(_query_word(rng) for _ in range(rng.randint(1, 3))))
+        offset, limit = rng.randint(0, 10), rng.randint(1, 20)
+        assert index.search(db, query, offset, limit) == _brute_force(documents, query, offset, limit), (case, query)
+
+
+def test_put_and_remove_update_results(db, index):
+    documents = {
+        1: ("billing-api", "payments", "acme", "https://git.example.com/billing"),
+        2: ("billing-worker", "payments", "acme", "https://git.example.com/worker"),
+        3: ("search", "discovery", "acme", "https://git.example.com/search"),
+    }
+    for service_id, fields in documents.items():
+        index.put(service_id, *fields)
+    assert index.search(db, "billing", 0, 10) == [1, 2]
+
+    documents[3] = ("billing-search", "discovery", "acme", "https://git.example.com/search")
+    index.put(3, *documents[3])
+    index.remove(1)
+    del documents[1]
+    documents[2] = ("ledger-worker", "payments", "acme", "https://git.example.com/ledger")
+    index.put(2, *documents[2])
+
+    assert index.search(db, "billing", 0, 10) == [3]
+    assert index.search(db, "ledger", 0, 10) == [2]
+    for query in ("billing", "worker", "acme search", "payments"):
+        assert index.search(db, query, 0, 10) == _brute_force(documents, query, 0, 10), query
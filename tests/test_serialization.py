@@ -0,0 +1,104 @@
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+
+from app.core import serialization
+from app.deploy.models import DeploymentModel
+from app.deploy.routes import _load_deploy_status
+from app.deploy.schemas import DeployStatusResponse
+from app.provisioning.routes import _view_status
+from app.provisioning.schemas import StatusResponse
+from app.services import routes as service_routes
+from app.services.models import ServiceModel
+from app.services.schemas import Service
+
+
+@pytest.fixture(params=["orjson", "json"], autouse=True)
+def encoder(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(serialization, "orjson", None)
+    elif serialization.orjson is None:
+        pytest.skip("orjson is not installed")
+
+
+@pytest.fixture(params=[None, "https://grafana.example.com/d/idp?orgId=1&var-service="])
+def dashboard(request, monkeypatch):
+    monkeypatch.setattr(service_routes, "_DASHBOARD_URL_PREFIX", request.param)
+
+
+@pytest.fixture
+def services(db):
+    rows = [
+        ServiceModel(
+            name="zahlungsdienst-ü", repo_url="https://git.example.com/zahlung", owner_team="Zahlungen – Kern",
+            runtime="go", tier="gold", environments=["dev", "prod"], tenant="münchen", observability_enabled=True,
+            provision_status="failed", provision_detail="Ресурс недоступен 🚫",
+        ),
+        ServiceModel(
+            name="plain svc", repo_url="r", owner_team="t", runtime="python", tier="bronze", environments=[],
+            tenant="t", observability_enabled=False,
+        ),
+    ]
+    db.add_all(rows)
+    db.commit()
+    return rows
+
+
+def _json_response(content) -> bytes:
+    # What the routes sent when they returned pydantic models through their response_model.
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def _service_model(row: ServiceModel) -> Service:
+    return Service(id=row.id, **service_routes._model_to_payload(row))
+
+
+def test_list_matches_service_model(db, services, dashboard):
+    body, next_cursor = service_routes._list_services(db, None, {}, None, 10)
+    assert next_cursor is None
+    assert body == _json_response([_service_model(row) for row in services])
+
+
+def test_get_matches_service_model(db, services, dashboard):
+    for row in services:
+        body = service_routes._get_service(db, row.id)
+        assert body == _json_response(_service_model(row))
+        assert body == _service_model(row).model_dump_json().encode()
+
+
+def test_service_item_from_column_row(db, services, dashboard):
+    for column_row in db.execute(select(*service_routes._SERVICE_COLUMNS)).all():
+        row = db.get(ServiceModel, column_row.id)
+        assert serialization.dumps(service_routes._service_item(column_row)) == _json_response(_service_model(row))
+
+
+@pytest.mark.parametrize("environment", [None, "prod", "dév"])
+def test_status_matches_status_response(db, services, environment):
+    for row in services:
+        expected = StatusResponse(
+            service_id=row.id,
+            environment=environment,
+            status=row.provision_status,
+            detail=row.provision_detail or f"Service healthy in {environment or 'default'}",
+        )
+        assert _view_status(db, row.id, environment) == _json_response(expected)
+
+
+@pytest.mark.parametrize("execution_arn", [None, "arn:aws:states:eu-central-1:1:execution:deploy:ü"])
+def test_deploy_status_matches_deploy_status_response(db, services, execution_arn):
+    deployment = DeploymentModel(
+        service_id=services[0].id, environment="prod", status="failed", detail="Fehlgeschlagen: „timeout“",
+        execution_arn=execution_arn,
+    )
+    db.add(deployment)
+    db.commit()
+    expected = DeployStatusResponse(
+        deployment_id=deployment.id,
+        service_id=deployment.service_id,
+        environment=deployment.environment,
+        status=deployment.status,
+        detail=deployment.detail,
+        execution_arn=deployment.execution_arn,
+    )
+    assert _load_deploy_status(db, services[0].id) == _json_response(expected)
@@ -0,0 +1,17 @@
+from app.core.static import PrecompressedStaticFiles
+
+
+def test_only_content_hashed_files_are_cached(tmp_path):
+    for name in ("index.html", "app.js", "app.3f2a9c1b.js", "assets/chunk-0e1f2a3b4c.css"):
+        path = tmp_path / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_text("body {}\n" * 50)
+    static = PrecompressedStaticFiles(str(tmp_path), max_age=600)
+
+    def cache_control(path):
+        return static._lookup(path).headers["Cache-Control"]
+
+    assert cache_control("/") == "no-cache"
+    assert cache_control("/app.js") == "no-cache"
+    assert cache_control("/app.3f2a9c1b.js") == "public, max-age=600, immutable"
+    assert cache_control("/assets/chunk-0e1f2a3b4c.css") == "public, max-age=600, immutable"